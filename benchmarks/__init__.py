@@ -0,0 +1,3 @@
+"""
+    Benchmark suite of scalc, see `python -m benchmarks --help`.
+"""
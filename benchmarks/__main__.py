@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing as t
+
+from benchmarks.scenarios import Scenario, load_scenarios
+
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.2
+
+
+def _build_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Runs scalc benchmarks and compares results with baseline.",
+    )
+    parser.add_argument(
+        "--filter",
+        default=None,
+        help="Run only scenarios which names contain given substring.",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiplier of sizes of generated inputs (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Count of measured runs of every scenario (default: %(default)s).",
+    )
+    parser.add_argument("--output", default=None, help="Write results to JSON file.")
+    parser.add_argument("--baseline", default=None, help="JSON file with baseline results.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=(
+            "Max allowed relative increase of time or peak memory over baseline"
+            " (default: %(default)s)."
+        ),
+    )
+    return parser
+
+
+def run_scenario(
+    scenario: Scenario,
+    workdir: str,
+    scale: float,
+    repeat: int,
+) -> t.Optional[t.Mapping[str, float]]:
+    """
+        Time is measured without tracing memory allocations,
+        peak memory is measured in a separate run.
+        :return: best and median time in seconds and peak memory in bytes,
+            or None if scenario is not available.
+    """
+    func = scenario.prepare(workdir, scale)
+    if func is None:
+        return None
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "time_min": min(times),
+        "time_median": statistics.median(times),
+        "peak_memory": peak_memory,
+    }
+
+
+def compare_results(
+    results: t.Mapping[str, t.Mapping[str, float]],
+    baseline: t.Mapping[str, t.Mapping[str, float]],
+    threshold: float,
+) -> t.List[str]:
+    """
+        :return: descriptions of regressions.
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline_result = baseline.get(name)
+        if baseline_result is None:
+            continue
+        for metric in ("time_min", "peak_memory"):
+            if baseline_result[metric] <= 0:
+                continue
+            ratio = result[metric] / baseline_result[metric]
+            if ratio > 1 + threshold:
+                regressions.append(f"{name}: {metric} is {ratio:.2f}x of baseline")
+    return regressions
+
+
+def main(argv: t.Sequence[str]) -> int:
+    args = _build_args_parser().parse_args(argv)
+
+    scenarios = [
+        scenario
+        for scenario in load_scenarios()
+        if args.filter is None or args.filter in scenario.name
+    ]
+
+    results = {}
+    initial_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="scalc-bench-") as workdir:
+        # scalc accepts only relative file names.
+        os.chdir(workdir)
+        try:
+            for scenario in scenarios:
+                result = run_scenario(scenario, workdir, args.scale, args.repeat)
+                if result is None:
+                    print(f"{scenario.name:<24} skipped")
+                    continue
+                results[scenario.name] = result
+                print(
+                    f"{scenario.name:<24}"
+                    f" {result['time_min'] * 1000:10.2f} ms"
+                    f" {result['peak_memory'] / 1024 ** 2:10.2f} MiB"
+                )
+        finally:
+            os.chdir(initial_dir)
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "scale": args.scale,
+                    "results": results,
+                },
+                f,
+                indent=2,
+                sort_keys=True,
+            )
+
+    if args.baseline is None:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("scale") != args.scale:
+        print(f"Baseline scale {baseline.get('scale')} differs from {args.scale}.", file=sys.stderr)
+        return 1
+
+    regressions = compare_results(results, baseline["results"], args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+"""
+    Synthetic input files for benchmarks.
+"""
+import os
+import random
+import typing as t
+
+
+def generate_values(
+    rnd: random.Random,
+    size: int,
+    density: float,
+    shared_values: t.Sequence[int] = (),
+    sortedness: float = 0.0,
+) -> t.List[int]:
+    """
+        :param size: count of unique values.
+        :param density: ratio of count of values to range of values, in (0, 1].
+        :param shared_values: values which are included into result,
+            used to control overlap of several files.
+        :param sortedness: share of values which are in ascending order,
+            1.0 - sorted values, 0.0 - shuffled values.
+    """
+    values_range = max(size, int(size / density))
+    shared_values = list(shared_values)[:size]
+    values = set(shared_values)
+    values.update(rnd.sample(range(values_range), size - len(values)))
+    while len(values) < size:
+        values.add(rnd.randrange(values_range))
+
+    values = sorted(values)
+    shuffled_indexes = [idx for idx in range(size) if rnd.random() >= sortedness]
+    shuffled_values = [values[idx] for idx in shuffled_indexes]
+    rnd.shuffle(shuffled_values)
+    for idx, value in zip(shuffled_indexes, shuffled_values):
+        values[idx] = value
+    return values
+
+
+def write_values(file_name: str, values: t.Iterable[int]):
+    with open(file_name, "w") as f:
+        f.write("".join(f"{value}\n" for value in values))
+
+
+def generate_files(
+    directory: str,
+    count: int,
+    size: int,
+    density: float = 0.1,
+    overlap: float = 0.5,
+    sortedness: float = 0.0,
+    seed: int = 0,
+    prefix: str = "f",
+) -> t.List[str]:
+    """
+        Generates `count` files with `size` unique integers each.
+        :param overlap: share of values which are common for all files, in [0, 1].
+        :return: names of generated files, relative to `directory`.
+    """
+    rnd = random.Random(seed)
+    values_range = max(size, int(size / density))
+    shared_values = rnd.sample(range(values_range), int(size * overlap))
+
+    file_names = []
+    for idx in range(count):
+        file_name = f"{prefix}{idx}.txt"
+        values = generate_values(
+            rnd=rnd,
+            size=size,
+            density=density,
+            shared_values=shared_values,
+            sortedness=sortedness,
+        )
+        write_values(os.path.join(directory, file_name), values)
+        file_names.append(file_name)
+    return file_names
@@ -0,0 +1,178 @@
+"""
+    Benchmark scenarios. Every scenario prepares its input in working directory
+    and returns a callable, which is the only measured part.
+"""
+import io
+import typing as t
+from dataclasses import dataclass
+
+from benchmarks.data import generate_files
+from scalc.compiler import Compiler
+from scalc.engines import SetEngine, load_engines
+from scalc.exceptions import SetCalcException
+from scalc.executor import Executor
+from scalc.functions import load_functions
+from scalc.output import write_text
+from scalc.tokens import TokenParser
+
+
+_FUNCTIONS_MAPPING = load_functions()
+# Engines which are compared in engine specific scenarios.
+_ENGINE_NAMES = ("set", "numpy", "bitmap")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    # Called with working directory (which is also current directory) and scale,
+    # returns measured callable or None if scenario is not available.
+    prepare: t.Callable[[str, float], t.Optional[t.Callable[[], t.Any]]]
+
+
+def _build_engine(engine_name: str) -> t.Optional[SetEngine]:
+    try:
+        return load_engines()[engine_name]()
+    except SetCalcException:
+        # E.g. optional dependency of engine is not installed.
+        return None
+
+
+def _compile(source_str: str):
+    return Compiler(
+        tokens=TokenParser(source_str=source_str).iter_tokens(),
+        functions_mapping=_FUNCTIONS_MAPPING,
+    ).compile()
+
+
+def _wide_source(file_names: t.Sequence[str], count: int) -> str:
+    args = " ".join(
+        f"[ INT {file_names[idx % len(file_names)]} {file_names[(idx + 1) % len(file_names)]} ]"
+        for idx in range(count)
+    )
+    return f"[ SUM {args} ]"
+
+
+def _deep_source(file_names: t.Sequence[str], depth: int) -> str:
+    """
+        :return: source of `depth` nested calls, e.g. `[ INT [ SUM a.txt b.txt ] c.txt ]`.
+    """
+    func_names = ("SUM", "INT", "DIF")
+    opening_parts = (f"[ {func_names[idx % 3]} " for idx in reversed(range(depth)))
+    closing_parts = (f" {file_names[(idx + 1) % len(file_names)]} ]" for idx in range(depth))
+    return "".join(opening_parts) + file_names[0] + "".join(closing_parts)
+
+
+def _scaled(value: int, scale: float) -> int:
+    return max(1, int(value * scale))
+
+
+def _prepare_tokenize_wide(workdir: str, scale: float):
+    source_str = _wide_source(["a.txt", "b.txt", "c.txt"], _scaled(20_000, scale))
+    return lambda: TokenParser(source_str=source_str).parse()
+
+
+def _prepare_compile(source_str: str):
+    tokens = TokenParser(source_str=source_str).parse()
+    return lambda: Compiler(tokens=tokens, functions_mapping=_FUNCTIONS_MAPPING).compile()
+
+
+def _prepare_compile_wide(workdir: str, scale: float):
+    return _prepare_compile(_wide_source(["a.txt", "b.txt", "c.txt"], _scaled(20_000, scale)))
+
+
+def _prepare_compile_deep(workdir: str, scale: float):
+    return _prepare_compile(_deep_source(["a.txt", "b.txt", "c.txt"], _scaled(20_000, scale)))
+
+
+def _prepare_parse(engine_name: str, sortedness: float = 0.0):
+    def prepare(workdir: str, scale: float):
+        engine = _build_engine(engine_name)
+        if engine is None:
+            return None
+        file_name, = generate_files(
+            directory=workdir,
+            count=1,
+            size=_scaled(200_000, scale),
+            sortedness=sortedness,
+            prefix=f"parse_{engine_name}_",
+        )
+        if engine.streaming:
+            return lambda: sum(1 for _ in engine.iterate(file_name))
+        return lambda: engine.load(file_name)
+
+    return prepare
+
+
+def _prepare_set_op(func_name: str, engine_name: str):
+    def prepare(workdir: str, scale: float):
+        engine = _build_engine(engine_name)
+        if engine is None:
+            return None
+        file_names = generate_files(
+            directory=workdir,
+            count=8,
+            size=_scaled(50_000, scale),
+            overlap=0.5,
+            prefix=f"op_{engine_name}_",
+        )
+        sets = [engine.load(file_name) for file_name in file_names]
+        func = _FUNCTIONS_MAPPING[func_name]
+        return lambda: func.call(args=sets)
+
+    return prepare
+
+
+def _prepare_execute(engine_name: str, build_source: t.Callable[[t.Sequence[str]], str]):
+    def prepare(workdir: str, scale: float):
+        engine = _build_engine(engine_name)
+        if engine is None:
+            return None
+        file_names = generate_files(
+            directory=workdir,
+            count=8,
+            size=_scaled(20_000, scale),
+            sortedness=1.0 if engine.streaming else 0.0,
+            prefix=f"execute_{engine_name}_",
+        )
+        root_expression = _compile(build_source(file_names))
+        executor = Executor(
+            root_expression=root_expression,
+            functions_mapping=_FUNCTIONS_MAPPING,
+            engine=engine,
+        )
+        return lambda: sum(1 for _ in executor.execute_sorted())
+
+    return prepare
+
+
+def _prepare_output_text(workdir: str, scale: float):
+    values = range(_scaled(1_000_000, scale))
+    return lambda: write_text(values, io.BytesIO())
+
+
+def load_scenarios() -> t.List[Scenario]:
+    scenarios = [
+        Scenario(name="tokenize/wide", prepare=_prepare_tokenize_wide),
+        Scenario(name="compile/wide", prepare=_prepare_compile_wide),
+        Scenario(name="compile/deep", prepare=_prepare_compile_deep),
+        Scenario(name="parse/stream", prepare=_prepare_parse("stream", sortedness=1.0)),
+        Scenario(name="parse/external", prepare=_prepare_parse("external")),
+        Scenario(name="output/text", prepare=_prepare_output_text),
+    ]
+    for engine_name in _ENGINE_NAMES:
+        scenarios.append(Scenario(name=f"parse/{engine_name}", prepare=_prepare_parse(engine_name)))
+        for func_name in _FUNCTIONS_MAPPING:
+            scenarios.append(Scenario(
+                name=f"ops/{func_name.lower()}/{engine_name}",
+                prepare=_prepare_set_op(func_name, engine_name),
+            ))
+    for engine_name in (*_ENGINE_NAMES, "stream"):
+        scenarios.append(Scenario(
+            name=f"execute/wide/{engine_name}",
+            prepare=_prepare_execute(engine_name, lambda file_names: _wide_source(file_names, 64)),
+        ))
+        scenarios.append(Scenario(
+            name=f"execute/deep/{engine_name}",
+            prepare=_prepare_execute(engine_name, lambda file_names: _deep_source(file_names, 64)),
+        ))
+    return sorted(scenarios, key=lambda scenario: scenario.name)
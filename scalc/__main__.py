@@ -1,43 +1,928 @@
+import argparse
+import json
+import math
+import os
 import sys
+import threading
+import time
+import tracemalloc
+import typing as t
 
-from scalc.expressions import Expression
+from scalc.cache import CachingEngine, FileCache, DEFAULT_CACHE_MAX_SIZE
+from scalc.bitmap import AdaptiveEngine, DEFAULT_DENSITY_THRESHOLD
+from scalc.binary import Encoding, DEFAULT_BLOCK_SIZE, FILE_EXTENSION, MAX_BLOCK_SIZE, write_binary_set
 from scalc.tokens import TokenParser
 from scalc.exceptions import SetCalcException
 from scalc.compiler import Compiler
 from scalc.executor import Executor
-from scalc.functions import load_functions, SetCalcFunc
+from scalc.explain import analyze_expression, build_plan, format_plan, plan_to_json
+from scalc.expressions import Expression, format_expression, restrict_to_file_bounds
+from scalc.optimizer import Optimizer
+from scalc.output import count_result, write_result, write_text
+from scalc.parallel import ParallelExecutor
+from scalc.partitioned import PartitionedExecutor, PartitionStrategy, build_range_partitioner
+from scalc.cluster import (
+    ClusterExecutor,
+    LocalCluster,
+    UnixWorkerServer,
+    WorkerService,
+    create_worker_server,
+    format_listening_line,
+    load_cluster_config,
+    save_cluster_config,
+)
+from scalc.prefetch import PrefetchingEngine
+from scalc.plans import PlanCache, PLANS_DIR_NAME, OPTIMIZED_PLAN_VARIANT
+from scalc.sparse_index import (
+    DEFAULT_INDEX_BLOCK_SIZE,
+    build_sparse_index,
+    save_sparse_index,
+    stored_file_bounds,
+)
+from scalc.sketch import SketchEngine, sketch_size_for_error, DEFAULT_RELATIVE_ERROR
+from scalc.watch import IncrementalEvaluator, ResultUpdate, write_update, DEFAULT_WATCH_INTERVAL
+from scalc.server import (
+    MemoryCachingEngine,
+    QueryService,
+    create_query_server,
+    DEFAULT_MAX_CACHED_SETS,
+)
+from scalc.engines import SetEngine, load_engines
+from scalc.external import ExternalSortEngine, DEFAULT_MEMORY_BUDGET
+from scalc.functions import SetCalcFunc, load_functions
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print(
-            "Invalid arguments. Programm expects exactly one argument."
-            "\nExample usage: python -m scalc \"[SUM a.txt b.txt]\"."
+_SIZE_SUFFIXES = {
+    "K": 1024,
+    "M": 1024 ** 2,
+    "G": 1024 ** 3,
+}
+
+
+def _parse_size(value: str) -> int:
+    """
+        Parses size like `512`, `64K`, `256M` or `2G` into bytes count.
+    """
+    multiplier = _SIZE_SUFFIXES.get(value[-1:].upper(), 1)
+    digits = value[:-1] if multiplier != 1 else value
+    try:
+        size = int(digits) * multiplier
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: '{value}'")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive: '{value}'")
+    return size
+
+
+def _parse_positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: '{value}'")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"value must be positive: '{value}'")
+    return number
+
+
+def _parse_block_size(value: str) -> int:
+    number = _parse_positive_int(value)
+    if number > MAX_BLOCK_SIZE:
+        raise argparse.ArgumentTypeError(f"value must not exceed {MAX_BLOCK_SIZE}: '{value}'")
+    return number
+
+
+def _add_engine_arguments(parser: argparse.ArgumentParser, engine_names: t.Iterable[str]):
+    parser.add_argument(
+        "--engine",
+        choices=sorted(engine_names),
+        default="set",
+        help="Engine used to load and represent sets (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=_parse_size,
+        default=DEFAULT_MEMORY_BUDGET,
+        help="Memory budget of 'external' engine, e.g. 512M (default: 256M).",
+    )
+    parser.add_argument(
+        "--temp-dir",
+        default=None,
+        help="Directory for sorted runs spilled by 'external' engine.",
+    )
+    parser.add_argument(
+        "--density-threshold",
+        type=float,
+        default=DEFAULT_DENSITY_THRESHOLD,
+        help=(
+            "Min density of set which 'auto' engine represents as bitmap"
+            " (default: %(default)s)."
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for persistent cache of parsed input files.",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=_parse_size,
+        default=DEFAULT_CACHE_MAX_SIZE,
+        help="Max total size of cache, least recently used entries are evicted (default: 1G).",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Read input files ahead of evaluation, at most N files at once,"
+            " so waiting for slow storage overlaps with evaluation (default: disabled)."
+        ),
+    )
+
+
+def _build_args_parser(engine_names: t.Iterable[str]) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scalc",
+        description="Sets calculator.",
+        epilog=(
+            "Example usage: python -m scalc \"[SUM a.txt b.txt]\"."
+            " Other modes are selected by the first argument:"
+            f" {', '.join(_COMMANDS)}, e.g. python -m scalc --convert --help."
+        ),
+    )
+    parser.add_argument("source_str", help="Expression to evaluate.")
+    _add_engine_arguments(parser, engine_names)
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Rewrite compiled expression into equivalent but cheaper one.",
+    )
+    parser.add_argument(
+        "--print-plan",
+        action="store_true",
+        help="Print compiled (and optimized) expression to stderr before evaluation.",
+    )
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        help="Print plan of compiled (and optimized) expression instead of evaluating it.",
+    )
+    parser.add_argument(
+        "--analyze",
+        action="store_true",
+        help=(
+            "Evaluate expression and print plan with time, memory and cardinality"
+            " of every node instead of result. Evaluation is not parallel."
+        ),
+    )
+    parser.add_argument(
+        "--plan-format",
+        choices=("text", "json"),
+        default="text",
+        help="Format of --explain and --analyze plan (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=_parse_positive_int,
+        default=1,
+        help=(
+            "Count of worker processes which load files and evaluate SUM/INT of not shared"
+            " arguments, other set operations are evaluated in threads (default: %(default)s)."
+        ),
+    )
+    parser.add_argument(
+        "--cluster",
+        default=None,
+        help=(
+            "Cluster config, see `python -m scalc --local-cluster`."
+            " Expression is evaluated by workers of cluster, partition by partition."
+        ),
+    )
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        help=(
+            "Split values of input files into given count of partitions and evaluate"
+            " the whole expression on every partition in --jobs processes (default: %(default)s)."
+        ),
+    )
+    parser.add_argument(
+        "--partition-by",
+        choices=[strategy.value for strategy in PartitionStrategy],
+        default=PartitionStrategy.RANGE.value,
+        help="Partition values by range or by hash (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print engine statistics to stderr after evaluation.",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help=(
+            "Write result to file instead of stdout."
+            " File with .sset extension is written as binary set file."
+        ),
+    )
+    output_mode = parser.add_mutually_exclusive_group()
+    output_mode.add_argument(
+        "--unsorted",
+        action="store_true",
+        help="Print result values in any order, so result is not sorted.",
+    )
+    output_mode.add_argument(
+        "--count",
+        action="store_true",
+        help="Print only count of result values.",
+    )
+    output_mode.add_argument(
+        "--diff",
+        action="store_true",
+        help=(
+            "With --watch, print changes of result instead of whole result:"
+            " removed values prefixed with '-' and added values prefixed with '+'."
+        ),
+    )
+    output_mode.add_argument(
+        "--approx",
+        action="store_true",
+        help=(
+            "Print estimated count of result values."
+            " Files are represented as theta sketches instead of sets, --engine is ignored."
+        ),
+    )
+    parser.add_argument(
+        "--relative-error",
+        type=float,
+        default=DEFAULT_RELATIVE_ERROR,
+        help="Relative standard error of --approx estimate (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Keep running and print result again whenever input files change."
+            " Only expression parts which depend on changed files are re-evaluated."
+        ),
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        help="Seconds between checks of input files in --watch mode (default: %(default)s).",
+    )
+    return parser
+
+
+def _build_convert_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scalc --convert",
+        description="Converts text file with integers into binary set file.",
+    )
+    parser.add_argument("input_file", help="Text file with one integer per line.")
+    parser.add_argument("output_file", help="Binary set file to create, e.g. a.sset.")
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Store values as delta/varint compressed blocks.",
+    )
+    parser.add_argument(
+        "--block-size",
+        type=_parse_block_size,
+        default=DEFAULT_BLOCK_SIZE,
+        help="Count of values in compressed block (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=_parse_size,
+        default=DEFAULT_MEMORY_BUDGET,
+        help="Memory budget used to sort input file (default: 256M).",
+    )
+    return parser
+
+
+def _build_index_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scalc --index",
+        description=(
+            "Builds sparse offset indexes of text files and stores them next to the files,"
+            " e.g. a.txt.sidx. Index is ignored as soon as file is changed."
+        ),
+    )
+    parser.add_argument("input_files", nargs="+", help="Text files with one integer per line.")
+    parser.add_argument(
+        "--block-size",
+        type=_parse_size,
+        default=DEFAULT_INDEX_BLOCK_SIZE,
+        help="Size of indexed block of lines, smaller blocks make seeks more precise (default: 64K).",
+    )
+    return parser
+
+
+def _build_serve_args_parser(
+    engine_names: t.Iterable[str],
+    is_batch: bool,
+) -> argparse.ArgumentParser:
+    if is_batch:
+        parser = argparse.ArgumentParser(
+            prog="python -m scalc --batch",
+            description=(
+                "Evaluates expressions read from stdin, one per line."
+                " Result of every expression is followed by an empty line."
+            ),
         )
-        exit(0)
+    else:
+        parser = argparse.ArgumentParser(
+            prog="python -m scalc --serve",
+            description=(
+                "Serves expressions on unix socket, see `python -m scalc.client`."
+            ),
+        )
+        parser.add_argument("--socket", required=True, help="Path of unix socket to listen.")
+    _add_engine_arguments(parser, engine_names)
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Rewrite compiled expressions into equivalent but cheaper ones.",
+    )
+    parser.add_argument(
+        "--max-cached-sets",
+        type=int,
+        default=DEFAULT_MAX_CACHED_SETS,
+        help="Count of loaded sets kept in memory (default: %(default)s).",
+    )
+    return parser
+
 
-    source_str = sys.argv[1]
+def _build_worker_args_parser(engine_names: t.Iterable[str]) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scalc --worker",
+        description=(
+            "Evaluates expressions sent by coordinator (python -m scalc --cluster)"
+            " against shards of input files in data directory."
+        ),
+    )
+    parser.add_argument(
+        "--listen",
+        required=True,
+        help="Address to listen, 'host:port' (port 0 picks free port) or 'unix:/path'.",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=".",
+        help="Directory with input files, shards are its subdirectories (default: %(default)s).",
+    )
+    _add_engine_arguments(parser, engine_names)
+    parser.add_argument(
+        "--max-cached-sets",
+        type=int,
+        default=DEFAULT_MAX_CACHED_SETS,
+        help="Count of loaded sets kept in memory (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--exit-on-stdin-close",
+        action="store_true",
+        help="Exit when stdin is closed, e.g. when launcher process exits.",
+    )
+    return parser
 
+
+def _parse_boundaries(value: str) -> t.List[int]:
     try:
-        token_parser = TokenParser(source_str=source_str)
-        tokens = token_parser.parse()
-        functions_mapping = load_functions()
-        compiler = Compiler(
-            tokens=tokens,
-            functions_mapping=functions_mapping,
+        boundaries = [int(boundary) for boundary in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid boundaries: '{value}'")
+    if boundaries != sorted(set(boundaries)):
+        raise argparse.ArgumentTypeError(f"boundaries must be ascending: '{value}'")
+    return boundaries
+
+
+def _build_cluster_args_parser(engine_names: t.Iterable[str]) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m scalc --local-cluster",
+        description=(
+            "Runs local worker processes over the same data directory"
+            " and writes config for python -m scalc --cluster."
+        ),
+    )
+    parser.add_argument("--config", required=True, help="Cluster config file to write.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Count of worker processes (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=".",
+        help="Directory with input files (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--boundaries",
+        type=_parse_boundaries,
+        default=None,
+        help=(
+            "Comma separated first values of value ranges except the first one, e.g. 1000,2000."
+            " By default ranges are chosen from sampled values of files in data directory,"
+            " one range per worker."
+        ),
+    )
+    parser.add_argument(
+        "--engine",
+        choices=sorted(engine_names),
+        default="set",
+        help="Engine of workers (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--max-cached-sets",
+        type=int,
+        default=DEFAULT_MAX_CACHED_SETS,
+        help="Count of loaded sets kept in memory by every worker (default: %(default)s).",
+    )
+    return parser
+
+
+def _build_engine(
+    args: argparse.Namespace,
+    engines_mapping: t.Mapping[str, t.Type[SetEngine]],
+) -> SetEngine:
+    engine_cls = engines_mapping[args.engine]
+    if issubclass(engine_cls, ExternalSortEngine):
+        engine = engine_cls(
+            memory_budget=args.memory_budget,
+            temp_dir=args.temp_dir,
         )
+    elif issubclass(engine_cls, AdaptiveEngine):
+        engine = engine_cls(density_threshold=args.density_threshold)
+    else:
+        engine = engine_cls()
 
-        root_expression = compiler.compile()
+    if args.prefetch > 0:
+        engine = PrefetchingEngine(engine=engine, max_concurrent_reads=args.prefetch)
+    if args.cache_dir is not None:
+        engine = CachingEngine(
+            engine=engine,
+            cache=FileCache(cache_dir=args.cache_dir, max_size=args.cache_size),
+        )
+    return engine
+
+
+def _build_sketch_engine(args: argparse.Namespace) -> SketchEngine:
+    cache = None
+    if args.cache_dir is not None:
+        cache = FileCache(cache_dir=args.cache_dir, max_size=args.cache_size)
+    return SketchEngine(
+        sketch_size=sketch_size_for_error(args.relative_error),
+        cache=cache,
+    )
+
+
+def _explain(
+    args: argparse.Namespace,
+    root_expression: Expression,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+    engine: SetEngine,
+    plan_cache: t.Optional[PlanCache],
+):
+    if args.analyze:
+        root_expression = analyze_expression(root_expression)
         executor = Executor(
             root_expression=root_expression,
             functions_mapping=functions_mapping,
+            engine=engine,
+        )
+        tracemalloc.start()
+        try:
+            count_result(executor)
+        finally:
+            tracemalloc.stop()
+
+    plan = build_plan(root_expression, functions_mapping)
+    if args.plan_format == "json":
+        print(json.dumps(plan_to_json(plan), indent=2))
+    else:
+        print(format_plan(plan))
+
+    if args.stats:
+        _print_stats(_collect_stats(engine, plan_cache))
+
+
+def _build_plan_cache(
+    args: argparse.Namespace,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+) -> t.Optional[PlanCache]:
+    if args.cache_dir is None:
+        return None
+    return PlanCache(
+        functions_mapping=functions_mapping,
+        cache_dir=os.path.join(args.cache_dir, PLANS_DIR_NAME),
+    )
+
+
+def _compile_plan(
+    args: argparse.Namespace,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+    plan_cache: t.Optional[PlanCache],
+) -> Expression:
+    """
+        :return: compiled (and optimized) expression, from `plan_cache` if possible.
+    """
+    variant = OPTIMIZED_PLAN_VARIANT if args.optimize else ""
+    if plan_cache is not None:
+        root_expression = plan_cache.lookup(args.source_str, variant)
+        if root_expression is not None:
+            return root_expression
+
+    compiler = Compiler(
+        tokens=TokenParser(source_str=args.source_str).iter_tokens(),
+        functions_mapping=functions_mapping,
+    )
+    root_expression = compiler.compile()
+    if args.optimize:
+        root_expression = Optimizer().optimize(root_expression)
+
+    if plan_cache is not None:
+        plan_cache.store(args.source_str, root_expression, variant)
+    return root_expression
+
+
+def _collect_stats(
+    engine: SetEngine,
+    plan_cache: t.Optional[PlanCache],
+) -> t.Mapping[str, int]:
+    stats = dict(engine.stats())
+    if plan_cache is not None:
+        stats.update(plan_cache.stats())
+    return stats
+
+
+def _print_stats(stats: t.Mapping[str, int]):
+    for name, value in stats.items():
+        print(f"{name}: {value}", file=sys.stderr)
+
+
+class _CountingOutput:
+    """
+        Binary output which counts bytes written to it,
+        so errors after partial result can be told apart.
+    """
+
+    def __init__(self, output: t.BinaryIO):
+        self._output = output
+        self.written = 0
+
+    def write(self, data: bytes) -> int:
+        self.written += len(data)
+        return self._output.write(data)
+
+
+def _write_watch_update(
+    args: argparse.Namespace,
+    evaluator: IncrementalEvaluator,
+    update: ResultUpdate,
+):
+    if args.count:
+        print(len(evaluator.result))
+        sys.stdout.flush()
+        return
+
+    sys.stdout.flush()
+    if args.diff:
+        write_update(update, sys.stdout.buffer)
+    else:
+        values = evaluator.result if args.unsorted else sorted(evaluator.result)
+        write_text(values, sys.stdout.buffer)
+    # Results of consecutive changes are separated by an empty line.
+    sys.stdout.buffer.write(b"\n")
+    sys.stdout.buffer.flush()
+
+
+def _watch(
+    args: argparse.Namespace,
+    root_expression: Expression,
+    engine: SetEngine,
+    plan_cache: t.Optional[PlanCache],
+):
+    """
+        Prints result whenever it changes, until interrupted.
+    """
+    evaluator = IncrementalEvaluator(root_expression=root_expression, engine=engine)
+    last_error = None
+    try:
+        while True:
+            try:
+                update = evaluator.refresh()
+                last_error = None
+            except SetCalcException as e:
+                # Error is printed once, until it is fixed or changed.
+                if str(e) != last_error:
+                    print(e)
+                    sys.stdout.flush()
+                last_error = str(e)
+                update = None
+
+            if update is not None:
+                _write_watch_update(args, evaluator, update)
+            time.sleep(args.watch_interval)
+    except KeyboardInterrupt:
+        pass
+
+    if args.stats:
+        _print_stats({**_collect_stats(engine, plan_cache), **evaluator.stats()})
+
+
+def convert_main(argv: t.Sequence[str]) -> int:
+    args = _build_convert_args_parser().parse_args(argv)
+
+    try:
+        engine = ExternalSortEngine(memory_budget=args.memory_budget)
+        write_binary_set(
+            file_name=args.output_file,
+            values=engine.iterate(args.input_file),
+            encoding=Encoding.DELTA_VARINT if args.compress else Encoding.RAW,
+            block_size=args.block_size,
         )
+    except SetCalcException as e:
+        print(e)
+
+    return 0
+
 
-        result = list(executor.execute())
-        result.sort()
-        for i in result:
-            print(i)
+def index_main(argv: t.Sequence[str]) -> int:
+    args = _build_index_args_parser().parse_args(argv)
 
+    try:
+        for input_file in args.input_files:
+            save_sparse_index(input_file, build_sparse_index(input_file, block_size=args.block_size))
     except SetCalcException as e:
         print(e)
 
+    return 0
+
+
+def _build_query_service(args: argparse.Namespace) -> QueryService:
+    engine = MemoryCachingEngine(
+        engine=_build_engine(args, load_engines()),
+        max_entries=args.max_cached_sets,
+    )
+    plan_cache_dir = None
+    if args.cache_dir is not None:
+        plan_cache_dir = os.path.join(args.cache_dir, PLANS_DIR_NAME)
+    return QueryService(
+        functions_mapping=load_functions(),
+        engine=engine,
+        optimize=args.optimize,
+        plan_cache_dir=plan_cache_dir,
+    )
+
+
+def batch_main(argv: t.Sequence[str]) -> int:
+    args = _build_serve_args_parser(load_engines().keys(), is_batch=True).parse_args(argv)
+    try:
+        query_service = _build_query_service(args)
+    except SetCalcException as e:
+        print(e)
+        return 0
+
+    query_service.serve_lines(sys.stdin, sys.stdout)
+    return 0
+
+
+def serve_main(argv: t.Sequence[str]) -> int:
+    args = _build_serve_args_parser(load_engines().keys(), is_batch=False).parse_args(argv)
+    try:
+        server = create_query_server(args.socket, _build_query_service(args))
+    except SetCalcException as e:
+        print(e)
+        return 0
+
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+    return 0
+
+
+def worker_main(argv: t.Sequence[str]) -> int:
+    args = _build_worker_args_parser(load_engines().keys()).parse_args(argv)
+    try:
+        worker_service = WorkerService(
+            functions_mapping=load_functions(),
+            engine=MemoryCachingEngine(
+                engine=_build_engine(args, load_engines()),
+                max_entries=args.max_cached_sets,
+            ),
+            data_dir=args.data_dir,
+        )
+        server = create_worker_server(args.listen, worker_service)
+    except SetCalcException as e:
+        print(e)
+        return 0
+
+    with server:
+        # Launcher waits for this line, see `LocalCluster`.
+        print(format_listening_line(server.address), flush=True)
+        if args.exit_on_stdin_close:
+            threading.Thread(
+                target=lambda: (sys.stdin.buffer.read(), server.shutdown()),
+                daemon=True,
+            ).start()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if isinstance(server, UnixWorkerServer):
+                os.unlink(server.server_address)
+    return 0
+
+
+def _data_file_names(data_dir: str) -> t.List[str]:
+    return sorted(
+        os.path.join(data_dir, entry_name)
+        for entry_name in os.listdir(data_dir)
+        if entry_name.endswith((".txt", FILE_EXTENSION))
+    )
+
+
+def cluster_main(argv: t.Sequence[str]) -> int:
+    args = _build_cluster_args_parser(load_engines().keys()).parse_args(argv)
+    worker_args = ["--engine", args.engine, "--max-cached-sets", str(args.max_cached_sets)]
+    try:
+        with LocalCluster(
+            data_dir=args.data_dir,
+            workers_count=args.workers,
+            worker_args=worker_args,
+        ) as cluster:
+            boundaries = args.boundaries
+            if boundaries is None:
+                partitioner = build_range_partitioner(
+                    _data_file_names(args.data_dir),
+                    partitions_count=args.workers,
+                )
+                boundaries = partitioner.boundaries
+            save_cluster_config(args.config, cluster.partitions(boundaries))
+            print(f"Workers: {', '.join(cluster.addresses)}", flush=True)
+            print(f"Cluster config is written to '{args.config}'.", flush=True)
+            try:
+                while True:
+                    time.sleep(DEFAULT_WATCH_INTERVAL)
+            except KeyboardInterrupt:
+                pass
+    except SetCalcException as e:
+        print(e)
+    return 0
+
+
+# Modes are selected by the first argument. Names of modes start with "--",
+# so they never shadow expressions, e.g. file named `index`.
+_COMMANDS = {
+    "--convert": convert_main,
+    "--index": index_main,
+    "--batch": batch_main,
+    "--serve": serve_main,
+    "--worker": worker_main,
+    "--local-cluster": cluster_main,
+}
+
+
+def main(argv: t.Sequence[str]) -> int:
+    if not argv:
+        print(
+            "Invalid arguments. Programm expects exactly one argument."
+            "\nExample usage: python -m scalc \"[SUM a.txt b.txt]\"."
+        )
+        return 0
+    if argv[0] in _COMMANDS:
+        return _COMMANDS[argv[0]](argv[1:])
+
+    engines_mapping = load_engines()
+    parser = _build_args_parser(engines_mapping.keys())
+    args = parser.parse_args(argv)
+    if args.watch and (args.approx or args.output is not None or args.explain or args.analyze):
+        parser.error("--watch can not be used with --approx, --output, --explain or --analyze")
+    if args.partitions > 1 and args.approx:
+        parser.error("--partitions can not be used with --approx")
+    if args.cluster is not None and (args.approx or args.watch or args.explain or args.analyze):
+        parser.error("--cluster can not be used with --approx, --watch, --explain or --analyze")
+    if args.diff and not args.watch:
+        parser.error("--diff can be used only with --watch")
+    if args.prefetch > 0 and (args.approx or args.jobs > 1 or args.partitions > 1):
+        parser.error("--prefetch can not be used with --approx, --jobs or --partitions")
+    if args.jobs > 1 and args.partitions <= 1 and engines_mapping[args.engine].streaming:
+        parser.error("--jobs can not be used with streaming engines, unless with --partitions")
+
+    engine = None
+    try:
+        if args.approx:
+            engine = _build_sketch_engine(args)
+        else:
+            engine = _build_engine(args, engines_mapping)
+        functions_mapping = load_functions()
+        plan_cache = _build_plan_cache(args, functions_mapping)
+        root_expression = _compile_plan(args, functions_mapping, plan_cache)
+        if not args.watch and args.cluster is None:
+            # Bounds of indexed files are valid only until files are changed, so rewritten plan is not cached.
+            root_expression = restrict_to_file_bounds(root_expression, stored_file_bounds)
+        if args.print_plan:
+            print(format_expression(root_expression, functions_mapping), file=sys.stderr)
+
+        if args.explain or args.analyze:
+            _explain(args, root_expression, functions_mapping, engine, plan_cache)
+            return 0
+
+        if args.watch:
+            _watch(args, root_expression, engine, plan_cache)
+            return 0
+
+        if args.cluster is not None:
+            executor = ClusterExecutor(
+                root_expression=root_expression,
+                functions_mapping=functions_mapping,
+                partitions=load_cluster_config(args.cluster),
+            )
+        elif args.partitions > 1:
+            if isinstance(engine, CachingEngine):
+                # Partition files are temporary, so they are not cached.
+                engine = engine.engine
+            executor = PartitionedExecutor(
+                root_expression=root_expression,
+                functions_mapping=functions_mapping,
+                engine=engine,
+                partitions=args.partitions,
+                jobs=args.jobs,
+                strategy=PartitionStrategy(args.partition_by),
+                temp_dir=args.temp_dir,
+            )
+        elif args.jobs > 1:
+            executor = ParallelExecutor(
+                root_expression=root_expression,
+                functions_mapping=functions_mapping,
+                engine=engine,
+                jobs=args.jobs,
+            )
+        else:
+            executor = Executor(
+                root_expression=root_expression,
+                functions_mapping=functions_mapping,
+                engine=engine,
+            )
+
+        if args.approx:
+            sketch = executor.execute()
+            print(len(sketch))
+            if args.stats:
+                lower_bound, upper_bound = sketch.bounds()
+                print(f"approx_lower_bound: {math.floor(lower_bound)}", file=sys.stderr)
+                print(f"approx_upper_bound: {math.ceil(upper_bound)}", file=sys.stderr)
+        elif args.count and isinstance(executor, ClusterExecutor):
+            print(executor.count())
+        elif args.count:
+            print(count_result(executor))
+        else:
+            sys.stdout.flush()
+            output = _CountingOutput(sys.stdout.buffer)
+            try:
+                write_result(
+                    executor=executor,
+                    output=output,
+                    output_file=args.output,
+                    sort=not args.unsorted,
+                )
+            except SetCalcException as e:
+                if not output.written:
+                    raise
+                # Values streamed before the error are written already,
+                # so the error must not look like a part of result.
+                sys.stdout.buffer.flush()
+                print(e, file=sys.stderr)
+                return 1
+            finally:
+                sys.stdout.buffer.flush()
+
+        if args.stats:
+            stats = dict(_collect_stats(engine, plan_cache))
+            if isinstance(executor, ClusterExecutor):
+                stats.update(executor.stats())
+            elif isinstance(executor, ParallelExecutor):
+                for name, value in executor.stats().items():
+                    stats[name] = stats.get(name, 0) + value
+            _print_stats(stats)
+
+    except SetCalcException as e:
+        print(e)
+    finally:
+        if engine is not None:
+            engine.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
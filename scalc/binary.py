@@ -0,0 +1,369 @@
+"""
+    Binary set file format.
+
+    Layout (all numbers are little-endian):
+        - header: magic, version, encoding, block size, values count, index offset;
+        - RAW encoding: sorted unique `int64` values right after header;
+        - DELTA_VARINT encoding: blocks of `block_size` values right after header.
+          First value of every block is stored in block index, other values
+          are stored as LEB128 varint encoded deltas from previous value.
+          Block index is located at `index_offset` and consists of
+          (first value: int64, payload offset: uint64) pairs.
+"""
+import array
+import bisect
+import contextlib
+import enum
+import itertools
+import mmap
+import operator
+import os
+import struct
+import sys
+import typing as t
+
+from scalc.exceptions import RuntimeException
+from scalc.parsing import open_or_raise
+
+
+MAGIC = b"SCALCSET"
+VERSION = 1
+FILE_EXTENSION = ".sset"
+
+_HEADER_STRUCT = struct.Struct("<8sBBHIQQ")
+HEADER_SIZE = _HEADER_STRUCT.size
+
+_VALUE_STRUCT = struct.Struct("<q")
+_BLOCK_INDEX_ENTRY_STRUCT = struct.Struct("<qQ")
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+_UINT64_MAX = 2 ** 64 - 1
+
+DEFAULT_BLOCK_SIZE = 4096
+# Block size is stored in header as uint32.
+MAX_BLOCK_SIZE = 2 ** 32 - 1
+
+# Count of values written by `write_binary_set` at once.
+_WRITE_CHUNK_SIZE = 64 * 1024
+
+
+class Encoding(enum.IntEnum):
+    RAW = 0
+    DELTA_VARINT = 1
+
+
+def is_binary_set_file(file_name: str) -> bool:
+    try:
+        with open(file_name, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except (FileNotFoundError, IsADirectoryError):
+        return False
+
+
+def _encode_varint(value: int, buffer: bytearray):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+class BinarySetFile:
+    """
+        Read-only memory mapped binary set file.
+        Values of RAW encoded file are accessed without parsing or copying.
+    """
+
+    def __init__(self, file_name: str):
+        self._file_name = file_name
+        with open_or_raise(file_name, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise self._invalid_file_exception()
+
+        if len(self._mmap) < HEADER_SIZE:
+            raise self._invalid_file_exception()
+
+        (
+            magic,
+            version,
+            encoding,
+            _,
+            self._block_size,
+            self._count,
+            self._index_offset,
+        ) = _HEADER_STRUCT.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION or encoding not in tuple(Encoding):
+            raise self._invalid_file_exception()
+        self._encoding = Encoding(encoding)
+        if len(self._mmap) != self._expected_size():
+            # E.g. file is truncated.
+            raise self._invalid_file_exception()
+
+    def _expected_size(self) -> t.Optional[int]:
+        """
+            :return: size of file described by header, None if header is inconsistent.
+        """
+        if self.encoding == Encoding.RAW:
+            return HEADER_SIZE + self._count * _VALUE_STRUCT.size
+        if self._block_size == 0 or self._index_offset < HEADER_SIZE:
+            return None
+        blocks_count = -(-self._count // self._block_size)
+        return self._index_offset + blocks_count * _BLOCK_INDEX_ENTRY_STRUCT.size
+
+    def __enter__(self) -> "BinarySetFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _invalid_file_exception(self) -> RuntimeException:
+        return RuntimeException(
+            reason=f"File '{self.file_name}' is not a valid binary set file.",
+        )
+
+    @property
+    def file_name(self) -> str:
+        return self._file_name
+
+    @property
+    def encoding(self) -> Encoding:
+        return self._encoding
+
+    @property
+    def block_size(self) -> int:
+        return self._block_size
+
+    @property
+    def buffer(self) -> mmap.mmap:
+        return self._mmap
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Values are still referenced by zero-copy consumers,
+            # mapping will be released together with them.
+            pass
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> t.Iterator[int]:
+        """
+            :return: iterator over sorted unique values.
+        """
+        if self.encoding == Encoding.RAW:
+            return iter(self.raw_values())
+        return self._iterate_delta_varint()
+
+    def iter_from(self, lower: int) -> t.Iterator[int]:
+        """
+            :return: iterator over sorted unique values not less than `lower`.
+                Position of `lower` is found with binary search over values of RAW encoded file
+                or over block index of DELTA_VARINT encoded file, preceding values are not read.
+        """
+        if self.encoding == Encoding.RAW:
+            values = self.raw_values()
+            return iter(values[bisect.bisect_left(values, lower):])
+        block_index = self.block_index()
+        first_block_idx = max(0, bisect.bisect_right(block_index, (lower, _UINT64_MAX)) - 1)
+        values = self._iterate_delta_varint(first_block_idx)
+        return itertools.dropwhile(lambda value: value < lower, values)
+
+    def raw_values(self) -> t.Sequence[int]:
+        """
+            :return: zero-copy view over values of RAW encoded file.
+        """
+        if self.encoding != Encoding.RAW:
+            raise RuntimeException(
+                reason=f"File '{self.file_name}' is not RAW encoded.",
+            )
+        view = memoryview(self._mmap)[HEADER_SIZE:HEADER_SIZE + self._count * _VALUE_STRUCT.size]
+        if sys.byteorder == "little":
+            return view.cast("q")
+        return [value for value, in _VALUE_STRUCT.iter_unpack(view)]
+
+    def block_index(self) -> t.Sequence[t.Tuple[int, int]]:
+        """
+            :return: (first value, payload offset) pairs of DELTA_VARINT encoded blocks.
+        """
+        blocks_count = -(-self._count // self._block_size)
+        return [
+            _BLOCK_INDEX_ENTRY_STRUCT.unpack_from(
+                self._mmap,
+                self._index_offset + idx * _BLOCK_INDEX_ENTRY_STRUCT.size,
+            )
+            for idx in range(blocks_count)
+        ]
+
+    def _iterate_delta_varint(self, first_block_idx: int = 0) -> t.Iterator[int]:
+        buffer = self._mmap
+        remaining_count = self._count - first_block_idx * self._block_size
+        for value, offset in self.block_index()[first_block_idx:]:
+            yield value
+            block_count = min(self._block_size, remaining_count) - 1
+            remaining_count -= block_count + 1
+            for _ in range(block_count):
+                delta = 0
+                shift = 0
+                while True:
+                    byte = buffer[offset]
+                    offset += 1
+                    delta |= (byte & 0x7F) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                value += delta
+                yield value
+
+
+class BinarySetWriter:
+    """
+        Writes sorted unique values to binary set file one by one.
+        Header is written on `close`, so values count is not required in advance.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        encoding: Encoding = Encoding.RAW,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        if not 0 < block_size <= MAX_BLOCK_SIZE:
+            raise RuntimeException(
+                reason=f"Block size must be in range from 1 to {MAX_BLOCK_SIZE}: {block_size}.",
+            )
+        self._file = open(file_name, "wb")
+        self._file.write(bytes(HEADER_SIZE))
+        self._encoding = encoding
+        self._block_size = block_size
+        self._block = bytearray()
+        self._block_index = []
+        self._count = 0
+        self._previous = None
+
+    def __enter__(self) -> "BinarySetWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def write(self, value: int):
+        if not _INT64_MIN <= value <= _INT64_MAX:
+            raise RuntimeException(
+                reason=f"Value {value} does not fit into int64.",
+            )
+        if self._previous is not None and value <= self._previous:
+            raise RuntimeException(
+                reason="Values of binary set file must be sorted and unique.",
+            )
+
+        if self._encoding == Encoding.RAW:
+            self._file.write(_VALUE_STRUCT.pack(value))
+        elif self._count % self._block_size == 0:
+            self._file.write(self._block)
+            self._block.clear()
+            self._block_index.append((value, self._file.tell()))
+        else:
+            _encode_varint(value - self._previous, self._block)
+
+        self._previous = value
+        self._count += 1
+
+    def write_many(self, values: t.Sequence[int]):
+        """
+            Writes sorted unique values, RAW encoded values are packed at once.
+        """
+        if self._encoding != Encoding.RAW or not values:
+            for value in values:
+                self.write(value)
+            return
+
+        if (
+            self._previous is not None and values[0] <= self._previous
+            or not all(map(operator.lt, values, itertools.islice(values, 1, None)))
+        ):
+            raise RuntimeException(
+                reason="Values of binary set file must be sorted and unique.",
+            )
+        for value in (values[0], values[-1]):
+            if not _INT64_MIN <= value <= _INT64_MAX:
+                raise RuntimeException(
+                    reason=f"Value {value} does not fit into int64.",
+                )
+
+        packed_values = array.array("q", values)
+        if sys.byteorder != "little":
+            packed_values.byteswap()
+        self._file.write(packed_values.tobytes())
+        self._previous = values[-1]
+        self._count += len(values)
+
+    def abort(self):
+        """
+            Closes file without writing header, so incomplete file is not a valid binary set file.
+        """
+        self._file.close()
+
+    def close(self):
+        self._file.write(self._block)
+        index_offset = self._file.tell()
+        for entry in self._block_index:
+            self._file.write(_BLOCK_INDEX_ENTRY_STRUCT.pack(*entry))
+
+        self._file.seek(0)
+        self._file.write(_HEADER_STRUCT.pack(
+            MAGIC,
+            VERSION,
+            self._encoding,
+            0,
+            self._block_size,
+            self._count,
+            index_offset,
+        ))
+        self._file.close()
+
+
+def write_binary_set(
+    file_name: str,
+    values: t.Iterable[int],
+    encoding: Encoding = Encoding.RAW,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> int:
+    """
+        Writes sorted unique values to binary set file.
+        File is removed if values can not be written, e.g. input file of values is missing.
+        :return: count of written values.
+    """
+    values = iter(values)
+    writer = BinarySetWriter(file_name, encoding=encoding, block_size=block_size)
+    try:
+        with writer:
+            while True:
+                chunk = list(itertools.islice(values, _WRITE_CHUNK_SIZE))
+                if not chunk:
+                    break
+                writer.write_many(chunk)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(file_name)
+        raise
+    return writer.count
+
+
+__all__ = (
+    Encoding.__name__,
+    BinarySetFile.__name__,
+    BinarySetWriter.__name__,
+    is_binary_set_file.__name__,
+    write_binary_set.__name__,
+)
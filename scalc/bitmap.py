@@ -0,0 +1,374 @@
+"""
+    Compressed bitmap (Roaring-style) sets.
+
+    Integer domain is split into chunks of 2^16 values. Every non-empty chunk is
+    stored in the most compact of three containers:
+        - `ArrayContainer` - sorted list of values, for sparse chunks;
+        - `BitmapContainer` - 2^16 bits bitmap, for dense chunks;
+        - `RunContainer` - list of (start, length) runs, for ranges.
+    Operations between containers which are not both arrays are evaluated
+    word-level on bitmaps, using python big integers as bit vectors.
+"""
+import abc
+import bisect
+import collections.abc
+import itertools
+import typing as t
+
+from scalc.binary import BinarySetFile, is_binary_set_file
+from scalc.engines import SetEngine
+from scalc.parsing import parse_int_file_or_raise
+
+
+_CHUNK_BITS = 16
+_CHUNK_SIZE = 1 << _CHUNK_BITS
+_LOW_MASK = _CHUNK_SIZE - 1
+_BITMAP_BYTES = _CHUNK_SIZE // 8
+_ARRAY_MAX_CARDINALITY = 4096
+
+_BYTE_BIT_POSITIONS = tuple(
+    tuple(position for position in range(8) if byte >> position & 1)
+    for byte in range(256)
+)
+
+_popcount = getattr(int, "bit_count", lambda bits: bin(bits).count("1"))
+
+
+def _bit_positions(bits: int) -> t.List[int]:
+    positions = []
+    for byte_idx, byte in enumerate(bits.to_bytes(_BITMAP_BYTES, "little")):
+        if byte:
+            base = byte_idx << 3
+            positions.extend(base + position for position in _BYTE_BIT_POSITIONS[byte])
+    return positions
+
+
+def _bits_from_lows(lows: t.Iterable[int]) -> int:
+    buffer = bytearray(_BITMAP_BYTES)
+    for low in lows:
+        buffer[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class Container(abc.ABC):
+    """
+        Immutable set of values of one 2^16 chunk.
+    """
+
+    @property
+    @abc.abstractmethod
+    def cardinality(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def to_bits(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def __iter__(self) -> t.Iterator[int]:
+        pass
+
+    @abc.abstractmethod
+    def __contains__(self, low: int) -> bool:
+        pass
+
+
+class ArrayContainer(Container):
+
+    __slots__ = ("_lows", )
+
+    def __init__(self, lows: t.List[int]):
+        self._lows = lows
+
+    @property
+    def lows(self) -> t.List[int]:
+        return self._lows
+
+    @property
+    def cardinality(self) -> int:
+        return len(self._lows)
+
+    def to_bits(self) -> int:
+        return _bits_from_lows(self._lows)
+
+    def __iter__(self) -> t.Iterator[int]:
+        return iter(self._lows)
+
+    def __contains__(self, low: int) -> bool:
+        idx = bisect.bisect_left(self._lows, low)
+        return idx < len(self._lows) and self._lows[idx] == low
+
+
+class BitmapContainer(Container):
+
+    __slots__ = ("_bits", "_cardinality")
+
+    def __init__(self, bits: int, cardinality: int):
+        self._bits = bits
+        self._cardinality = cardinality
+
+    @property
+    def cardinality(self) -> int:
+        return self._cardinality
+
+    def to_bits(self) -> int:
+        return self._bits
+
+    def __iter__(self) -> t.Iterator[int]:
+        return iter(_bit_positions(self._bits))
+
+    def __contains__(self, low: int) -> bool:
+        return (self._bits >> low) & 1 == 1
+
+
+class RunContainer(Container):
+
+    __slots__ = ("_starts", "_lengths", "_cardinality")
+
+    def __init__(self, starts: t.List[int], lengths: t.List[int]):
+        self._starts = starts
+        self._lengths = lengths
+        self._cardinality = sum(lengths)
+
+    @property
+    def cardinality(self) -> int:
+        return self._cardinality
+
+    def to_bits(self) -> int:
+        bits = 0
+        for start, length in zip(self._starts, self._lengths):
+            bits |= ((1 << length) - 1) << start
+        return bits
+
+    def __iter__(self) -> t.Iterator[int]:
+        for start, length in zip(self._starts, self._lengths):
+            yield from range(start, start + length)
+
+    def __contains__(self, low: int) -> bool:
+        idx = bisect.bisect_right(self._starts, low) - 1
+        return idx >= 0 and low < self._starts[idx] + self._lengths[idx]
+
+
+def _container_from_bits(bits: int) -> t.Optional[Container]:
+    """
+        :return: the most compact container for bitmap or `None` for empty bitmap.
+    """
+    cardinality = _popcount(bits)
+    if cardinality == 0:
+        return None
+
+    run_starts = bits & ~(bits << 1)
+    runs_count = _popcount(run_starts)
+    run_size = 4 * runs_count
+    array_size = 2 * cardinality if cardinality <= _ARRAY_MAX_CARDINALITY else _BITMAP_BYTES + 1
+
+    if run_size < min(array_size, _BITMAP_BYTES):
+        starts = _bit_positions(run_starts)
+        ends = _bit_positions(bits & ~(bits >> 1))
+        lengths = [end - start + 1 for start, end in zip(starts, ends)]
+        return RunContainer(starts=starts, lengths=lengths)
+    if array_size <= _BITMAP_BYTES:
+        return ArrayContainer(lows=_bit_positions(bits))
+    return BitmapContainer(bits=bits, cardinality=cardinality)
+
+
+def _container_from_sorted_lows(lows: t.List[int]) -> Container:
+    if len(lows) > _ARRAY_MAX_CARDINALITY:
+        return _container_from_bits(_bits_from_lows(lows))
+
+    runs_count = 1 + sum(1 for prev, low in zip(lows, lows[1:]) if low != prev + 1)
+    if 4 * runs_count < 2 * len(lows):
+        return _container_from_bits(_bits_from_lows(lows))
+    return ArrayContainer(lows=lows)
+
+
+def _or_containers(c1: Container, c2: Container) -> Container:
+    if isinstance(c1, ArrayContainer) and isinstance(c2, ArrayContainer):
+        lows = sorted(set(c1.lows).union(c2.lows))
+        if len(lows) <= _ARRAY_MAX_CARDINALITY:
+            return ArrayContainer(lows=lows)
+    return _container_from_bits(c1.to_bits() | c2.to_bits())
+
+
+def _and_containers(c1: Container, c2: Container) -> t.Optional[Container]:
+    if isinstance(c1, ArrayContainer) and isinstance(c2, ArrayContainer):
+        lows = sorted(set(c1.lows).intersection(c2.lows))
+        return ArrayContainer(lows=lows) if lows else None
+    return _container_from_bits(c1.to_bits() & c2.to_bits())
+
+
+def _andnot_containers(c1: Container, c2: Container) -> t.Optional[Container]:
+    if isinstance(c1, ArrayContainer) and isinstance(c2, ArrayContainer):
+        lows = sorted(set(c1.lows).difference(c2.lows))
+        return ArrayContainer(lows=lows) if lows else None
+    return _container_from_bits(c1.to_bits() & ~c2.to_bits())
+
+
+class RoaringSet(collections.abc.Set):
+    """
+        RoaringSet - immutable set of integers stored as compressed bitmap.
+    """
+
+    # Set is iterated in ascending order, see `Executor.execute_sorted`.
+    sorted_iteration = True
+
+    def __init__(self, containers: t.Mapping[int, Container]):
+        self._containers = dict(sorted(containers.items()))
+        self._len = sum(container.cardinality for container in self._containers.values())
+
+    @classmethod
+    def _from_iterable(cls, it: t.Iterable[int]) -> "RoaringSet":
+        return cls.from_sorted(sorted(set(it)))
+
+    @classmethod
+    def from_sorted(cls, values: t.Iterable[int]) -> "RoaringSet":
+        """
+            :param values: sorted unique integers.
+        """
+        containers = {}
+        for high, chunk_values in itertools.groupby(values, key=lambda value: value >> _CHUNK_BITS):
+            lows = [value & _LOW_MASK for value in chunk_values]
+            containers[high] = _container_from_sorted_lows(lows)
+        return cls(containers=containers)
+
+    @classmethod
+    def _coerce(cls, obj: t.AbstractSet[int]) -> "RoaringSet":
+        if isinstance(obj, cls):
+            return obj
+        return cls._from_iterable(obj)
+
+    @property
+    def containers(self) -> t.Mapping[int, Container]:
+        return self._containers
+
+    def __contains__(self, value) -> bool:
+        if not isinstance(value, int):
+            return False
+        container = self._containers.get(value >> _CHUNK_BITS)
+        return container is not None and (value & _LOW_MASK) in container
+
+    def __iter__(self) -> t.Iterator[int]:
+        for high, container in self._containers.items():
+            base = high << _CHUNK_BITS
+            for low in container:
+                yield base | low
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __or__(self, obj) -> "RoaringSet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        other = self._coerce(obj)
+        containers = dict(self.containers)
+        for high, container in other.containers.items():
+            if high in containers:
+                containers[high] = _or_containers(containers[high], container)
+            else:
+                containers[high] = container
+        return RoaringSet(containers=containers)
+
+    __ror__ = __or__
+
+    def __and__(self, obj) -> "RoaringSet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        other = self._coerce(obj)
+        containers = {}
+        for high, container in self.containers.items():
+            other_container = other.containers.get(high)
+            if other_container is None:
+                continue
+            result = _and_containers(container, other_container)
+            if result is not None:
+                containers[high] = result
+        return RoaringSet(containers=containers)
+
+    __rand__ = __and__
+
+    def __sub__(self, obj) -> "RoaringSet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        other = self._coerce(obj)
+        containers = {}
+        for high, container in self.containers.items():
+            other_container = other.containers.get(high)
+            if other_container is None:
+                containers[high] = container
+                continue
+            result = _andnot_containers(container, other_container)
+            if result is not None:
+                containers[high] = result
+        return RoaringSet(containers=containers)
+
+    def __rsub__(self, obj) -> "RoaringSet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return self._coerce(obj) - self
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+
+def _read_sorted_values(file_name: str) -> t.List[int]:
+    if is_binary_set_file(file_name):
+        with BinarySetFile(file_name) as set_file:
+            return list(set_file)
+
+    return sorted(set(parse_int_file_or_raise(file_name)))
+
+
+class BitmapEngine(SetEngine):
+    """
+        Engine which represents all sets as `RoaringSet` objects.
+    """
+
+    def load(self, file_name: str) -> RoaringSet:
+        return RoaringSet.from_sorted(_read_sorted_values(file_name))
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        return iter(self.load(file_name))
+
+
+DEFAULT_DENSITY_THRESHOLD = 0.05
+
+
+class AdaptiveEngine(SetEngine):
+    """
+        Engine which chooses representation per input file:
+        dense sets (count of values / values range >= `density_threshold`)
+        are represented as `RoaringSet`, other sets - as builtin `set`.
+    """
+
+    def __init__(self, density_threshold: float = DEFAULT_DENSITY_THRESHOLD):
+        self._density_threshold = density_threshold
+        self._bitmap_files_count = 0
+        self._set_files_count = 0
+
+    @property
+    def density_threshold(self) -> float:
+        return self._density_threshold
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {
+            "bitmap_files_count": self._bitmap_files_count,
+            "set_files_count": self._set_files_count,
+        }
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        values = _read_sorted_values(file_name)
+        if values:
+            density = len(values) / (values[-1] - values[0] + 1)
+            if density >= self.density_threshold:
+                self._bitmap_files_count += 1
+                return RoaringSet.from_sorted(values)
+
+        self._set_files_count += 1
+        return set(values)
+
+
+__all__ = (
+    RoaringSet.__name__,
+    BitmapEngine.__name__,
+    AdaptiveEngine.__name__,
+)
@@ -0,0 +1,274 @@
+import contextlib
+import hashlib
+import os
+import time
+import typing as t
+import uuid
+from dataclasses import dataclass, asdict
+
+from scalc.binary import BinarySetWriter, FILE_EXTENSION, is_binary_set_file
+from scalc.engines import SetEngine, EngineWrapper
+from scalc.exceptions import RuntimeException
+from scalc.restrictions import Restriction
+
+
+DEFAULT_CACHE_MAX_SIZE = 1024 ** 3
+
+_TEMP_FILE_SUFFIX = ".tmp"
+
+
+@dataclass
+class CacheStats:
+    hits_count: int = 0
+    misses_count: int = 0
+    stores_count: int = 0
+    evictions_count: int = 0
+
+
+class CacheEntryWriter:
+    """
+        Writer of cache entry. Values which can not be cached (e.g. do not fit into int64)
+        and write errors discard the entry instead of failing evaluation.
+    """
+
+    def __init__(self, temp_path: t.Optional[str]):
+        self._temp_path = temp_path
+        self._writer = None
+        if temp_path is not None:
+            with contextlib.suppress(OSError):
+                self._writer = BinarySetWriter(temp_path)
+
+    @property
+    def is_discarded(self) -> bool:
+        return self._writer is None
+
+    def write(self, value: int):
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(value)
+        except (RuntimeException, OSError):
+            self.discard()
+
+    def discard(self):
+        if self._writer is None:
+            return
+        with contextlib.suppress(OSError):
+            self._writer.abort()
+            os.unlink(self._temp_path)
+        self._writer = None
+
+    def commit(self, path: str) -> bool:
+        """
+            :return: whether entry was stored.
+        """
+        if self._writer is None:
+            return False
+        try:
+            self._writer.close()
+            os.replace(self._temp_path, path)
+        except OSError:
+            self.discard()
+            return False
+        self._writer = None
+        return True
+
+
+class FileCache:
+    """
+        Directory of parsed input files stored as binary set files.
+        Entries are keyed by (path, inode, size, mtime) of input file,
+        so changed files are never served from cache.
+        Least recently used entries are evicted when total size exceeds `max_size`.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        os.makedirs(cache_dir, exist_ok=True)
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._cache_stats = CacheStats()
+
+    @property
+    def cache_dir(self) -> str:
+        return self._cache_dir
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def cache_stats(self) -> CacheStats:
+        return self._cache_stats
+
+    def _entry_path(self, file_name: str, variant: str = "") -> t.Optional[str]:
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return None
+        identity = f"{os.path.realpath(file_name)}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        if variant:
+            identity = f"{identity}:{variant}"
+        key = hashlib.sha1(identity.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}{FILE_EXTENSION}")
+
+    def _entries(self) -> t.List[t.Tuple[str, os.stat_result]]:
+        entries = []
+        for entry_name in os.listdir(self.cache_dir):
+            if not entry_name.endswith(FILE_EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, entry_name)
+            with contextlib.suppress(FileNotFoundError):
+                entries.append((path, os.stat(path)))
+        return entries
+
+    def _touch(self, path: str):
+        """
+            Modification time of entry is its last access time for LRU.
+            Explicit time is used, because file system timestamps may be coarse.
+        """
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def size(self) -> int:
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def lookup(self, file_name: str, variant: str = "") -> t.Optional[str]:
+        """
+            :param variant: kind of entry, if something other than parsed content
+                of `file_name` is cached (e.g. its sketch).
+            :return: path to binary set file of the entry, if cached.
+        """
+        path = self._entry_path(file_name, variant)
+        if path is not None:
+            try:
+                self._touch(path)
+                self.cache_stats.hits_count += 1
+                return path
+            except FileNotFoundError:
+                pass
+
+        self.cache_stats.misses_count += 1
+        return None
+
+    def peek(self, file_name: str, variant: str = "") -> t.Optional[str]:
+        """
+            Same as `lookup`, but neither counts access nor makes entry recently used.
+        """
+        path = self._entry_path(file_name, variant)
+        if path is not None and os.path.exists(path):
+            return path
+        return None
+
+    @contextlib.contextmanager
+    def store(self, file_name: str, variant: str = "") -> t.Iterator["CacheEntryWriter"]:
+        """
+            Context manager which yields writer of sorted unique values of `file_name`.
+            Entry is stored only if block is exited without exception
+            and all values were written successfully.
+        """
+        path = self._entry_path(file_name, variant)
+        temp_path = f"{path}.{uuid.uuid4().hex}{_TEMP_FILE_SUFFIX}"
+        entry_writer = CacheEntryWriter(
+            temp_path=temp_path if path is not None else None,
+        )
+        try:
+            yield entry_writer
+        except BaseException:
+            entry_writer.discard()
+            raise
+
+        if not entry_writer.commit(path):
+            return
+        self._touch(path)
+        self.cache_stats.stores_count += 1
+        self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime_ns)
+        total_size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if total_size <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+                self.cache_stats.evictions_count += 1
+            total_size -= stat.st_size
+
+
+class CachingEngine(EngineWrapper):
+    """
+        Engine which consults `FileCache` before loading text files with wrapped engine.
+        Cached entries are binary set files, so they are loaded by wrapped engine without parsing.
+    """
+
+    def __init__(self, engine: SetEngine, cache: FileCache):
+        super().__init__(engine=engine)
+        self._cache = cache
+
+    @property
+    def cache(self) -> FileCache:
+        return self._cache
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {
+            **self.engine.stats(),
+            **{f"cache_{name}": value for name, value in asdict(self.cache.cache_stats).items()},
+            "cache_size": self.cache.size(),
+        }
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        # Cached files are loaded from cache entries, so entries are read instead.
+        self.engine.prefetch([self.cache.peek(file_name) or file_name for file_name in file_names])
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        if is_binary_set_file(file_name):
+            return self.engine.load(file_name)
+
+        cached_path = self.cache.lookup(file_name)
+        if cached_path is not None:
+            return self.engine.load(cached_path)
+
+        return self._load_and_store(file_name)
+
+    def _load_and_store(self, file_name: str) -> t.AbstractSet[int]:
+        result = self.engine.load(file_name)
+        with self.cache.store(file_name) as entry_writer:
+            for value in sorted(result):
+                if entry_writer.is_discarded:
+                    break
+                entry_writer.write(value)
+        return result
+
+    def load_restricted(self, file_name: str, restriction: Restriction) -> t.AbstractSet[int]:
+        if is_binary_set_file(file_name):
+            return self.engine.load_restricted(file_name, restriction)
+
+        cached_path = self.cache.lookup(file_name)
+        if cached_path is not None:
+            # Cache entries are sorted binary set files, so only range of entry is read.
+            return self.engine.load_restricted(cached_path, restriction)
+
+        return restriction.restrict_set(self._load_and_store(file_name))
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        if is_binary_set_file(file_name):
+            yield from self.engine.iterate(file_name)
+            return
+
+        cached_path = self.cache.lookup(file_name)
+        if cached_path is not None:
+            yield from self.engine.iterate(cached_path)
+            return
+
+        # Entry is stored only if iterator is consumed till the end.
+        with self.cache.store(file_name) as entry_writer:
+            for value in self.engine.iterate(file_name):
+                entry_writer.write(value)
+                yield value
+
+
+__all__ = (
+    CacheStats.__name__,
+    FileCache.__name__,
+    CachingEngine.__name__,
+)
@@ -0,0 +1,48 @@
+"""
+    Thin client of `python -m scalc --serve`.
+    Imports nothing from scalc, so it starts as fast as the interpreter.
+
+    Example usage: python -m scalc.client --socket /tmp/scalc.sock "[SUM a.txt b.txt]".
+"""
+import argparse
+import socket
+import sys
+import typing as t
+
+
+def query(socket_path: str, source_str: str) -> t.Iterator[str]:
+    """
+        :return: response lines of query service.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(source_str.replace("\n", " ").encode() + b"\n")
+        with sock.makefile("r") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if not line:
+                    return
+                yield line
+
+
+def main(argv: t.Sequence[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scalc.client",
+        description="Sends expression to running scalc server.",
+    )
+    parser.add_argument("source_str", help="Expression to evaluate.")
+    parser.add_argument("--socket", required=True, help="Unix socket of scalc server.")
+    args = parser.parse_args(argv)
+
+    try:
+        for line in query(args.socket, args.source_str):
+            sys.stdout.write(line)
+            sys.stdout.write("\n")
+    except OSError as e:
+        print(f"Can not connect to scalc server: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,545 @@
+"""
+    Evaluation of a single expression by several worker hosts.
+
+    Integer domain is split into partitions: every partition is a shard of input files
+    (subdirectory of data directory of worker) and a range of values. Every worker
+    evaluates the whole expression restricted to the range (see `restrict_expression`)
+    against its local shard, so files are loaded only within the range, and responds with
+    sorted values of the range. Coordinator combines sorted partial results.
+
+    Protocol is line-oriented, over TCP or unix socket, one request per connection:
+        - coordinator sends request as a single JSON line, expression is sent
+          as serialized plan, see `scalc.plans`;
+        - worker responds with sorted values (or their count) one per line,
+          followed by `END` line, or with `ERROR <reason>` line.
+    Response which is not terminated with `END` or `ERROR` line means that worker failed,
+    partition is retried by the next worker of the partition. Values which are already
+    received are not requested again.
+"""
+import concurrent.futures
+import heapq
+import itertools
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import typing as t
+from dataclasses import dataclass, asdict
+
+from scalc.engines import SetEngine
+from scalc.exceptions import SetCalcException, RuntimeException
+from scalc.executor import Executor
+from scalc.expressions import (
+    Expression,
+    LoadFromFileExpression,
+    has_limit,
+    iter_post_order,
+    restrict_expression,
+)
+from scalc.functions import SetCalcFunc
+from scalc.parsing import open_or_raise
+from scalc.partitioned import PartitionEngine
+from scalc.plans import serialize_plan, deserialize_plan
+from scalc.restrictions import Restriction
+
+
+PROTOCOL_VERSION = 1
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+_END_LINE = b"END"
+_ERROR_PREFIX = b"ERROR "
+_UNIX_ADDRESS_PREFIX = "unix:"
+# Line printed by worker as soon as it accepts connections.
+_LISTENING_PREFIX = "LISTENING "
+_RESPONSE_BUFFER_SIZE = 64 * 1024
+
+
+def parse_address(address: str) -> t.Tuple[int, t.Union[str, t.Tuple[str, int]]]:
+    """
+        :param address: `host:port` or `unix:/path/to/socket`.
+        :return: socket family and address.
+    """
+    if address.startswith(_UNIX_ADDRESS_PREFIX):
+        return socket.AF_UNIX, address[len(_UNIX_ADDRESS_PREFIX):]
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise RuntimeException(
+            reason=f"Invalid address: '{address}', expected 'host:port' or 'unix:/path'.",
+        )
+    return socket.AF_INET, (host, int(port))
+
+
+@dataclass(frozen=True)
+class ClusterPartition:
+    # Addresses of workers which hold the shard, in order of preference.
+    workers: t.Tuple[str, ...]
+    shard: str = ""
+    # Inclusive lower and exclusive upper bound of values, None if unbounded.
+    lower: t.Optional[int] = None
+    upper: t.Optional[int] = None
+
+
+def load_cluster_config(file_name: str) -> t.List[ClusterPartition]:
+    with open_or_raise(file_name) as f:
+        try:
+            config = json.load(f)
+            return [
+                ClusterPartition(
+                    workers=tuple(partition["workers"]),
+                    shard=partition.get("shard", ""),
+                    lower=partition.get("lower"),
+                    upper=partition.get("upper"),
+                )
+                for partition in config["partitions"]
+            ]
+        except (ValueError, KeyError, TypeError):
+            raise RuntimeException(
+                reason=f"File '{file_name}' is not a valid cluster config.",
+            )
+
+
+def save_cluster_config(file_name: str, partitions: t.Sequence[ClusterPartition]):
+    with open(file_name, "w") as f:
+        json.dump(
+            {
+                "partitions": [
+                    dict(asdict(partition), workers=list(partition.workers))
+                    for partition in partitions
+                ],
+            },
+            f,
+            indent=2,
+        )
+
+
+class WorkerService:
+    """
+        Evaluates expressions of coordinator against shards in `data_dir`.
+    """
+
+    def __init__(
+        self,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        engine: SetEngine,
+        data_dir: str = ".",
+    ):
+        self._functions_mapping = functions_mapping
+        self._engine = engine
+        self._data_dir = data_dir
+
+    @property
+    def engine(self) -> SetEngine:
+        return self._engine
+
+    def _shard_dir(self, shard: str) -> str:
+        if shard.startswith(".") or os.sep in shard or (os.altsep and os.altsep in shard):
+            raise RuntimeException(reason=f"Invalid shard: '{shard}'.")
+        return os.path.join(self._data_dir, shard)
+
+    @staticmethod
+    def _shard_file_name(shard_dir: str, file_name: str) -> str:
+        # File names come from network, so they must not point outside of shard.
+        normalized_file_name = os.path.normpath(file_name)
+        if (
+            os.path.isabs(normalized_file_name)
+            or normalized_file_name == os.pardir
+            or normalized_file_name.startswith(os.pardir + os.sep)
+        ):
+            raise RuntimeException(reason=f"Invalid file name: '{file_name}'.")
+        return os.path.join(shard_dir, normalized_file_name)
+
+    def respond(self, request_line: str) -> t.Iterator[bytes]:
+        """
+            :return: response lines, without line separators.
+        """
+        try:
+            try:
+                request = json.loads(request_line)
+                if request["version"] != PROTOCOL_VERSION:
+                    raise RuntimeException(
+                        reason=f"Unsupported protocol version: {request['version']}.",
+                    )
+                root_expression = deserialize_plan(request["plan"], self._functions_mapping)
+                shard_dir = self._shard_dir(request.get("shard", ""))
+                lower, upper = request.get("lower"), request.get("upper")
+                count = bool(request.get("count", False))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise RuntimeException(reason="Invalid request.")
+            if root_expression is None:
+                raise RuntimeException(reason="Invalid plan.")
+            if any(bound is not None and type(bound) is not int for bound in (lower, upper)):
+                raise RuntimeException(reason="Invalid request.")
+            restriction = Restriction(lower=lower, upper=upper)
+            if restriction.has_range:
+                # Range of partition is pushed down to loading of files,
+                # so values out of range are skipped as early as engine allows.
+                root_expression = restrict_expression(root_expression, restriction)
+
+            file_names = {
+                expression.file_name: self._shard_file_name(shard_dir, expression.file_name)
+                for expression in iter_post_order(root_expression)
+                if isinstance(expression, LoadFromFileExpression)
+            }
+            executor = Executor(
+                root_expression=root_expression,
+                functions_mapping=self._functions_mapping,
+                engine=PartitionEngine(engine=self.engine, partition_file_names=file_names),
+            )
+            values = executor.execute_sorted()
+            if count:
+                yield str(sum(1 for _ in values)).encode()
+            else:
+                yield from (str(value).encode() for value in values)
+        except SetCalcException as e:
+            yield _ERROR_PREFIX + e.reason.replace("\n", " ").encode()
+            return
+        yield _END_LINE
+
+
+class _WorkerRequestHandler(socketserver.StreamRequestHandler):
+
+    wbufsize = _RESPONSE_BUFFER_SIZE
+
+    def handle(self):
+        request_line = self.rfile.readline().decode(errors="replace")
+        for line in self.server.worker_service.respond(request_line):
+            self.wfile.write(line + b"\n")
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, server_address: t.Tuple[str, int], worker_service: WorkerService):
+        self.worker_service = worker_service
+        super().__init__(server_address, _WorkerRequestHandler)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+
+class UnixWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, worker_service: WorkerService):
+        self.worker_service = worker_service
+        super().__init__(socket_path, _WorkerRequestHandler)
+
+    @property
+    def address(self) -> str:
+        return f"{_UNIX_ADDRESS_PREFIX}{self.server_address}"
+
+
+def create_worker_server(
+    address: str,
+    worker_service: WorkerService,
+) -> t.Union[WorkerServer, UnixWorkerServer]:
+    """
+        :param address: `host:port` (port 0 picks free port) or `unix:/path/to/socket`.
+    """
+    family, server_address = parse_address(address)
+    if family == socket.AF_UNIX:
+        return UnixWorkerServer(server_address, worker_service)
+    return WorkerServer(server_address, worker_service)
+
+
+class _WorkerFailure(Exception):
+    pass
+
+
+@dataclass
+class ClusterStats:
+    requests_count: int = 0
+    worker_failures_count: int = 0
+
+
+class ClusterExecutor(Executor):
+    """
+        Coordinator: evaluates expression by workers of `partitions`, concurrently.
+        Result is identical to `Executor` result over union of all shards,
+        if every value of every shard is within range of its partition.
+    """
+
+    def __init__(
+        self,
+        root_expression: Expression,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        partitions: t.Sequence[ClusterPartition],
+        timeout: float = DEFAULT_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """
+            :param timeout: max seconds to wait for a response line of worker.
+            :param max_attempts: max count of requests of every partition,
+                workers of partition are tried in turn.
+        """
+        super().__init__(root_expression=root_expression, functions_mapping=functions_mapping)
+        if has_limit(root_expression):
+            raise RuntimeException(reason="LIMIT can not be evaluated by partitions.")
+        if not partitions or not all(partition.workers for partition in partitions):
+            raise RuntimeException(reason="Every partition of cluster must have a worker.")
+        self._partitions = list(partitions)
+        self._timeout = timeout
+        self._max_attempts = max_attempts
+        self._cluster_stats = ClusterStats()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def partitions(self) -> t.Sequence[ClusterPartition]:
+        return self._partitions
+
+    @property
+    def cluster_stats(self) -> ClusterStats:
+        return self._cluster_stats
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {f"cluster_{name}": value for name, value in asdict(self.cluster_stats).items()}
+
+    @property
+    def is_ordered(self) -> bool:
+        """
+            :return: whether ranges of partitions are ascending and disjoint,
+                so partial results can be concatenated.
+        """
+        for previous, partition in zip(self.partitions, self.partitions[1:]):
+            if previous.upper is None or partition.lower is None:
+                return False
+            if partition.lower < previous.upper:
+                return False
+        return True
+
+    def execute(self) -> t.AbstractSet[int]:
+        return set(itertools.chain.from_iterable(self._fetch_partitions(count=False)))
+
+    def execute_sorted(self) -> t.Iterator[int]:
+        results = self._fetch_partitions(count=False)
+        if self.is_ordered:
+            return itertools.chain.from_iterable(results)
+        # Partitions may overlap, so equal values of different partitions are merged.
+        return (value for value, _ in itertools.groupby(heapq.merge(*results)))
+
+    def count(self) -> int:
+        """
+            :return: count of result values, values are counted by workers.
+        """
+        if not self.is_ordered:
+            # Values of overlapping partitions may be counted several times.
+            return len(self.execute())
+        return sum(self._fetch_partitions(count=True))
+
+    def _fetch_partitions(self, count: bool) -> t.List[t.Any]:
+        plan = serialize_plan(self.root_expression, self.functions_mapping)
+        if plan is None:
+            raise RuntimeException(reason="Expression can not be sent to workers.")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.partitions)) as pool:
+            futures = [
+                pool.submit(self._fetch_partition, partition, plan, count)
+                for partition in self.partitions
+            ]
+            return [future.result() for future in futures]
+
+    def _fetch_partition(
+        self,
+        partition: ClusterPartition,
+        plan: t.Mapping[str, t.Any],
+        count: bool,
+    ) -> t.Union[int, t.List[int]]:
+        """
+            :return: sorted values or count of values of partition.
+        """
+        values = []
+        failures = []
+        for attempt in range(self._max_attempts):
+            worker = partition.workers[attempt % len(partition.workers)]
+            # Values which are already received are not requested again.
+            lower = values[-1] + 1 if values else partition.lower
+            request = {
+                "version": PROTOCOL_VERSION,
+                "plan": plan,
+                "shard": partition.shard,
+                "lower": lower,
+                "upper": partition.upper,
+                "count": count,
+            }
+            with self._stats_lock:
+                self.cluster_stats.requests_count += 1
+            try:
+                lines = self._request(worker, request)
+                if count:
+                    return int(next(lines))
+                values.extend(map(int, lines))
+                return values
+            except (OSError, ValueError, StopIteration, _WorkerFailure) as e:
+                with self._stats_lock:
+                    self.cluster_stats.worker_failures_count += 1
+                failures.append(f"{worker}: {str(e) or type(e).__name__}")
+        raise RuntimeException(
+            reason=(
+                f"Partition of shard '{partition.shard}' failed"
+                f" after {self._max_attempts} attempts ({'; '.join(failures)})."
+            ),
+        )
+
+    def _request(self, worker: str, request: t.Mapping[str, t.Any]) -> t.Iterator[bytes]:
+        """
+            :return: response lines of worker, without `END` line.
+        """
+        family, address = parse_address(worker)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self._timeout)
+            sock.connect(address)
+            sock.sendall(json.dumps(request, separators=(",", ":")).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Worker failed in the middle of line, the rest of value is lost.
+                        break
+                    line = line[:-1]
+                    if line == _END_LINE:
+                        return
+                    if line.startswith(_ERROR_PREFIX):
+                        # Errors of expression are not worker failures, they are not retried.
+                        raise RuntimeException(reason=line[len(_ERROR_PREFIX):].decode())
+                    yield line
+        raise _WorkerFailure("response is incomplete")
+
+
+class LocalCluster:
+    """
+        Runs worker processes on this host, which share `data_dir`.
+        Stand-in of real cluster, e.g. for testing.
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        workers_count: int,
+        worker_args: t.Sequence[str] = (),
+        start_timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """
+            :param worker_args: extra arguments of `python -m scalc --worker`, e.g. engine options.
+        """
+        self._data_dir = data_dir
+        self._workers_count = workers_count
+        self._worker_args = list(worker_args)
+        self._start_timeout = start_timeout
+        self._processes = []
+        self._addresses = []
+
+    @property
+    def addresses(self) -> t.Sequence[str]:
+        return self._addresses
+
+    def __enter__(self) -> "LocalCluster":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        # Workers import scalc from the same location as this process.
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        python_path = os.pathsep.join(filter(None, (package_root, os.environ.get("PYTHONPATH"))))
+        env = dict(os.environ, PYTHONPATH=python_path)
+        try:
+            for _ in range(self._workers_count):
+                process = subprocess.Popen(
+                    [
+                        sys.executable, "-m", "scalc", "--worker",
+                        "--listen", "127.0.0.1:0",
+                        "--data-dir", self._data_dir,
+                        # Workers exit with this process, even if it is killed.
+                        "--exit-on-stdin-close",
+                        *self._worker_args,
+                    ],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    env=env,
+                )
+                self._processes.append(process)
+            for process in self._processes:
+                self._addresses.append(self._wait_listening(process))
+        except BaseException:
+            self.stop()
+            raise
+
+    def _wait_listening(self, process: subprocess.Popen) -> str:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(process.stdout.readline)
+            try:
+                line = future.result(timeout=self._start_timeout).decode()
+            except concurrent.futures.TimeoutError:
+                process.kill()
+                line = ""
+        if not line.startswith(_LISTENING_PREFIX):
+            raise RuntimeException(reason="Worker process failed to start.")
+        return line[len(_LISTENING_PREFIX):].strip()
+
+    def kill(self, worker_idx: int):
+        """
+            Kills worker process, e.g. to test failures.
+        """
+        self._processes[worker_idx].kill()
+        self._processes[worker_idx].wait()
+
+    def stop(self):
+        for process in self._processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self._processes:
+            process.wait()
+            process.stdin.close()
+            process.stdout.close()
+        self._processes = []
+        self._addresses = []
+
+    def partitions(self, boundaries: t.Sequence[int], shard: str = "") -> t.List[ClusterPartition]:
+        """
+            :param boundaries: ascending first values of partitions except the first one.
+            :return: partitions of ranges between boundaries, every partition is served
+                by every worker, starting from a different one.
+        """
+        bounds = [None, *boundaries, None]
+        return [
+            ClusterPartition(
+                workers=tuple(
+                    self.addresses[(idx + shift) % len(self.addresses)]
+                    for shift in range(len(self.addresses))
+                ),
+                shard=shard,
+                lower=lower,
+                upper=upper,
+            )
+            for idx, (lower, upper) in enumerate(zip(bounds, bounds[1:]))
+        ]
+
+
+def format_listening_line(address: str) -> str:
+    return f"{_LISTENING_PREFIX}{address}"
+
+
+__all__ = (
+    ClusterPartition.__name__,
+    ClusterStats.__name__,
+    ClusterExecutor.__name__,
+    WorkerService.__name__,
+    WorkerServer.__name__,
+    UnixWorkerServer.__name__,
+    LocalCluster.__name__,
+    create_worker_server.__name__,
+    load_cluster_config.__name__,
+    save_cluster_config.__name__,
+    parse_address.__name__,
+    format_listening_line.__name__,
+)
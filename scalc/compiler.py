@@ -7,126 +7,147 @@ from scalc.expressions import (
     Expression,
     LoadFromFileExpression,
     FunctionCallExpression,
+    restrict_expression,
 )
+from scalc.restrictions import Restriction
+
+
+# Keywords which restrict result of their single argument, e.g. `[ RANGE 100 200 a.txt ]`.
+# Values of range are not less than the first number and less than the second one.
+RANGE_KEYWORD = "RANGE"
+LIMIT_KEYWORD = "LIMIT"
 
 
 class Compiler:
 
     def __init__(
         self,
-        tokens: t.Sequence[Token],
+        tokens: t.Iterable[Token],
         functions_mapping: t.Mapping[str, SetCalcFunc],
+        share_subexpressions: bool = True,
     ):
+        """
+            :param tokens: tokens of source string, e.g. lazy `TokenParser.iter_tokens`.
+            :param share_subexpressions: if set, equal subexpressions are compiled
+                into the same object, so compiled expression is a DAG.
+        """
         self._tokens = tokens
         self._functions_mapping = functions_mapping
+        self._share_subexpressions = share_subexpressions
+        self._shared_expressions: t.Dict[Expression, Expression] = {}
 
     @property
-    def tokens(self) -> t.Sequence[Token]:
+    def tokens(self) -> t.Iterable[Token]:
         return self._tokens
 
     @property
     def functions_mapping(self) -> t.Mapping[str, SetCalcFunc]:
         return self._functions_mapping
 
-    def compile(self) -> Expression:
-        root_expression, used_tokens_count = self._build_expression_from_idx(idx=0)
+    @property
+    def share_subexpressions(self) -> bool:
+        return self._share_subexpressions
 
-        if used_tokens_count < len(self.tokens):
-            raise CompileException(
-                reason="Unexpected extra tokens after root expression"
-            )
+    def compile(self) -> Expression:
+        """
+            Tokens are consumed one by one, arguments of unfinished function calls
+            are kept on explicit stack, so nesting depth is not limited by recursion limit.
+        """
+        tokens = iter(self.tokens)
+        # Unfinished function calls: function (or restriction) and already compiled arguments.
+        stack: t.List[t.Tuple[t.Union[SetCalcFunc, Restriction], t.List[Expression]]] = []
+        root_expression = None
+
+        for token in tokens:
+            if root_expression is not None:
+                raise CompileException(
+                    reason="Unexpected extra tokens after root expression"
+                )
+
+            if token.token_type == TokenType.FUNC_CALL_START:
+                stack.append((self._get_func_or_raise(tokens), []))
+                continue
+
+            if token.token_type == TokenType.FILE_NAME:
+                expression = self._share(LoadFromFileExpression(file_name=token.token_value))
+            elif token.token_type == TokenType.FUNC_CALL_END and stack:
+                func, func_args = stack.pop()
+                if len(func_args) == 0:
+                    raise CompileException(
+                        reason="Function call expects at least one argument",
+                    )
+                if isinstance(func, Restriction):
+                    if len(func_args) != 1:
+                        raise CompileException(
+                            reason=f"{RANGE_KEYWORD} and {LIMIT_KEYWORD} expect exactly one argument",
+                        )
+                    expression = restrict_expression(func_args[0], func, share=self._share)
+                else:
+                    expression = self._share(FunctionCallExpression(
+                        func=func,
+                        func_args=func_args,
+                    ))
+            else:
+                raise CompileException(
+                    reason=(
+                        f"Unexpected token. Expected {TokenType.FUNC_CALL_START}"
+                        f" or {TokenType.FILE_NAME} but received {token.token_type}"
+                    ),
+                )
+
+            if stack:
+                stack[-1][1].append(expression)
+            else:
+                root_expression = expression
+
+        if root_expression is None:
+            raise CompileException(reason="Unexpected EOF")
 
         return root_expression
 
-    def _get_token_by_idx_or_raise(self, idx: int) -> Token:
-        if len(self.tokens) < idx + 1:
-            raise CompileException(reason="Unexpected EOF")
-        return self.tokens[idx]
+    def _share(self, expression: Expression) -> Expression:
+        """
+            :return: previously compiled expression equal to `expression`, if any.
+        """
+        if not self.share_subexpressions:
+            return expression
+        return self._shared_expressions.setdefault(expression, expression)
 
-    def _get_expected_token_by_idx_or_raise(
-        self,
-        idx: int,
-        expected_types: t.AbstractSet[TokenType],
-    ):
-        token = self._get_token_by_idx_or_raise(idx=idx)
-        if token.token_type not in expected_types:
+    def _get_token_or_raise(self, tokens: t.Iterator[Token], token_type: TokenType) -> Token:
+        token = next(tokens, None)
+        if token is None:
+            raise CompileException(reason="Unexpected EOF")
+        if token.token_type != token_type:
             raise CompileException(
                 reason=(
-                    f"Unexpected token. Expected {expected_types}"
-                    f" but received {oken.token_type}"
+                    f"Unexpected token. Expected {token_type}"
+                    f" but received {token.token_type}"
                 ),
             )
         return token
 
-    def _build_func_call_expression_from_idx(
-        self,
-        idx: int,
-    ) -> t.Tuple[FunctionCallExpression, int]:
-        func_start_token = self._get_expected_token_by_idx_or_raise(
-            idx=idx,
-            expected_types={TokenType.FUNC_CALL_START},
-        )
-        used_tokens_count = 1
-
-        func_name_token = self._get_expected_token_by_idx_or_raise(
-            idx=idx + used_tokens_count,
-            expected_types={TokenType.FUNC_NAME},
-        )
-        used_tokens_count += 1
-
-        func_name = func_name_token.token_value
-        if func_name not in self.functions_mapping:
-            raise CompileException(
-                reason=f"Unknown function: {func_name}",
-            )
-        func = self.functions_mapping[func_name]
-
-        func_args = []
-        next_token = self._get_token_by_idx_or_raise(idx=idx + used_tokens_count)
-        while next_token.token_type != TokenType.FUNC_CALL_END:
-            func_arg, arg_used_tokens_count = self._build_expression_from_idx(
-                idx=idx + used_tokens_count,
-            )
-            func_args.append(func_arg)
-            used_tokens_count += arg_used_tokens_count
-            next_token = self._get_token_by_idx_or_raise(idx=idx + used_tokens_count)
-
-        if len(func_args) == 0:
-            raise CompileException(
-                reason="Function call excpects at least one argument",
-            )
-
-        used_tokens_count += 1  # For `FUNC_CALL_END` token
-        return FunctionCallExpression(
-            func=func,
-            func_args=func_args,
-        ), used_tokens_count
-
-    def _build_load_from_file_expression_from_idx(
-        self,
-        idx: int,
-    ) -> t.Tuple[LoadFromFileExpression, int]:
-        token = self._get_expected_token_by_idx_or_raise(
-            idx=idx,
-            expected_types={TokenType.FILE_NAME},
-        )
-        return LoadFromFileExpression(file_name=token.token_value), 1
-
-
-    def _build_expression_from_idx(self, idx: int) -> t.Tuple[Expression, int]:
+    def _get_func_or_raise(self, tokens: t.Iterator[Token]) -> t.Union[SetCalcFunc, Restriction]:
         """
-            :return: parsed expression, tokens count used to build expression.
+            Consumes function name token which follows `FUNC_CALL_START` token,
+            and numbers which follow `RANGE` or `LIMIT` keyword.
         """
-        first_expression_token = self._get_token_by_idx_or_raise(idx=idx)
+        func_name = self._get_token_or_raise(tokens, TokenType.FUNC_NAME).token_value
+        if func_name == RANGE_KEYWORD:
+            lower = int(self._get_token_or_raise(tokens, TokenType.NUMBER).token_value)
+            upper = int(self._get_token_or_raise(tokens, TokenType.NUMBER).token_value)
+            if lower > upper:
+                raise CompileException(
+                    reason=f"Invalid range: {lower} is greater than {upper}",
+                )
+            return Restriction(lower=lower, upper=upper)
+        if func_name == LIMIT_KEYWORD:
+            limit = int(self._get_token_or_raise(tokens, TokenType.NUMBER).token_value)
+            if limit < 0:
+                raise CompileException(reason=f"Invalid limit: {limit}")
+            return Restriction(limit=limit)
 
-        if first_expression_token.token_type == TokenType.FUNC_CALL_START:
-            return self._build_func_call_expression_from_idx(idx=idx)
-        elif first_expression_token.token_type == TokenType.FILE_NAME:
-            return self._build_load_from_file_expression_from_idx(idx=idx)
-        else:
+        if func_name not in self.functions_mapping:
             raise CompileException(
-                reason=(
-                    f"Unexpected token. Expected {TokenType.FUNC_CALL_START}"
-                    f" or {TokenType.FILE_NAME} but received {irst_expression_token.token_type}"
-                ),
+                reason=f"Unknown function: {func_name}",
             )
+        return self.functions_mapping[func_name]
@@ -0,0 +1,333 @@
+import abc
+import itertools
+import typing as t
+
+from scalc.binary import BinarySetFile, is_binary_set_file
+from scalc.exceptions import RuntimeException
+from scalc.parsing import (
+    file_identity,
+    iter_indexed_int_blocks_or_raise,
+    iter_int_blocks_or_raise,
+    parse_int_file_or_raise,
+)
+from scalc.restrictions import Restriction
+from scalc.sorted_sets import SortedListSet, is_ascending, unique_ascending
+from scalc.sparse_index import SparseIndex, load_sparse_index
+
+
+class SetEngine(abc.ABC):
+    """
+        SetEngine - strategy which defines how sets are loaded from files
+        and how they are represented in memory during evaluation.
+
+        Sets returned by engine must support `|`, `&` and `-` operators,
+        so they can be passed to any `SetCalcFunc`.
+
+        Streaming engines are evaluated with `iterate` instead of `load`,
+        so sets are never materialized.
+        Engines with `sorted_input` raise error for text files which are not sorted.
+    """
+
+    streaming = False
+    sorted_input = False
+
+    @abc.abstractmethod
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        pass
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        """
+            :return: iterator over sorted unique integers from file.
+        """
+        return iter(sorted(self.load(file_name)))
+
+    def load_restricted(self, file_name: str, restriction: Restriction) -> t.AbstractSet[int]:
+        """
+            :return: values of file which satisfy restriction. Engine may skip values
+                out of range while file is parsed, or read only range of sorted file.
+                By default, the whole set is loaded and restricted.
+        """
+        return restriction.restrict_set(self.load(file_name))
+
+    def iterate_restricted(self, file_name: str, restriction: Restriction) -> t.Iterator[int]:
+        """
+            Streaming counterpart of `load_restricted`. By default, the whole file is iterated,
+            so files which are not sorted are reported by `iterate` of engine.
+            Engines may stop reading after upper bound only for files which are known to be sorted.
+        """
+        return restriction.filter_sorted(self.iterate(file_name))
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        """
+            Hint that files will be loaded soon, in given order.
+            Engine may start reading them in background.
+        """
+
+    def stats(self) -> t.Mapping[str, int]:
+        """
+            :return: engine specific counters collected during evaluation.
+        """
+        return {}
+
+    def close(self):
+        """
+            Releases resources of engine, e.g. background threads.
+        """
+
+
+class PythonSetEngine(SetEngine):
+    """
+        Default engine. Sets are represented as builtin `set` objects,
+        sorted files are represented as `SortedListSet` objects, so they are never hashed
+        by functions whose arguments are all sorted, see `SetCalcFunc.evaluation_path`.
+
+        Order of text file is checked while it is parsed, block by block, until the first
+        value out of order. Order and sparse index of sorted file are remembered by file identity,
+        so unchanged files are not checked again, and restricted loads of sorted files
+        read only blocks of lines which may contain values of range.
+        Index stored by `python -m scalc --index` is used before file is parsed for the first time,
+        restricted loads of files whose values are known to be out of range read nothing.
+    """
+
+    def __init__(self):
+        # File name -> sparse index of text file, built when file was parsed or stored one.
+        self._file_indexes: t.Dict[str, SparseIndex] = {}
+        self._sorted_files_count = 0
+        self._unsorted_files_count = 0
+        self._seeks_count = 0
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {
+            "sorted_files_count": self._sorted_files_count,
+            "unsorted_files_count": self._unsorted_files_count,
+            "seeks_count": self._seeks_count,
+        }
+
+    def file_index(self, file_name: str) -> t.Optional[SparseIndex]:
+        """
+            :return: index of text file, None if file is not parsed yet and has no valid stored index.
+        """
+        index = self._file_indexes.get(file_name)
+        if index is not None and index.identity == file_identity(file_name):
+            return index
+        index = load_sparse_index(file_name)
+        if index is not None:
+            self._file_indexes[file_name] = index
+        else:
+            self._file_indexes.pop(file_name, None)
+        return index
+
+    def is_sorted(self, file_name: str) -> t.Optional[bool]:
+        """
+            :return: whether values of file are in ascending order, None if file is not loaded yet.
+        """
+        index = self.file_index(file_name)
+        return index.is_sorted if index is not None else None
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        return self._load(file_name, restriction=None)
+
+    def load_restricted(self, file_name: str, restriction: Restriction) -> t.AbstractSet[int]:
+        return self._load(file_name, restriction=restriction)
+
+    def _load(
+        self,
+        file_name: str,
+        restriction: t.Optional[Restriction],
+    ) -> t.AbstractSet[int]:
+        if is_binary_set_file(file_name):
+            self._sorted_files_count += 1
+            with BinarySetFile(file_name) as set_file:
+                # Values of binary set files are sorted and unique.
+                if restriction is None:
+                    return SortedListSet(values=list(set_file))
+                values = set_file
+                if restriction.lower is not None:
+                    self._seeks_count += 1
+                    values = set_file.iter_from(restriction.lower)
+                return SortedListSet(values=list(restriction.restrict_sorted(values)))
+
+        index = self.file_index(file_name)
+        if restriction is not None and index is not None and not index.may_contain(restriction):
+            self._seeks_count += 1
+            return SortedListSet(values=[])
+        if restriction is not None and index is not None and index.is_sorted:
+            self._sorted_files_count += 1
+            self._seeks_count += 1
+            offset, line_number = index.seek(restriction.lower)
+            blocks = iter_int_blocks_or_raise(file_name, offset=offset, first_line_number=line_number)
+            return SortedListSet(values=restriction.restrict_sorted_blocks(blocks))
+
+        return self._parse(file_name, restriction=restriction, index=index)
+
+    def _parse(
+        self,
+        file_name: str,
+        restriction: t.Optional[Restriction],
+        index: t.Optional[SparseIndex],
+    ) -> t.AbstractSet[int]:
+        """
+            Parses the whole text file, values out of range are skipped.
+            Index of file is built, unless file is indexed already.
+        """
+        identity = file_identity(file_name)
+        is_sorted = index.is_sorted if index is not None else None
+        blocks = []
+        count = 0
+        # Values of range, while values of file are in ascending order.
+        values = []
+        previous = None
+        # Values of files which are known to be unsorted are hashed right away.
+        result = set() if is_sorted is False else None
+        for offset, line_number, block in iter_indexed_int_blocks_or_raise(file_name):
+            count += len(block)
+            if result is None and (
+                is_sorted
+                or (previous is None or previous <= block[0]) and is_ascending(block)
+            ):
+                blocks.append((block[0], offset, line_number))
+                previous = block[-1]
+                if restriction is not None:
+                    block = restriction.value_range.restrict_sorted_list(block)
+                values.extend(block)
+                continue
+
+            if result is None:
+                # The first value out of order, values are hashed from now on.
+                result = set(values)
+                values = blocks = None
+            if restriction is not None:
+                block = filter(restriction.__contains__, block)
+            result.update(block)
+
+        if identity is not None and index is None:
+            self._file_indexes[file_name] = SparseIndex(
+                identity=identity,
+                is_sorted=result is None,
+                blocks=blocks or [],
+                # Bounds of unsorted file are not computed, so that it is not scanned twice.
+                count=count if result is None else None,
+                min_value=blocks[0][0] if blocks else None,
+                max_value=previous if blocks else None,
+            )
+        limit = restriction.limit if restriction is not None else None
+        if result is not None:
+            self._unsorted_files_count += 1
+            return result if limit is None else Restriction(limit=limit).restrict_set(result)
+        self._sorted_files_count += 1
+        return SortedListSet(values=unique_ascending(values)[:limit])
+
+
+class SortedStreamEngine(SetEngine):
+    """
+        Streaming engine for files which are already sorted in ascending order.
+        Text files are read lazily chunk by chunk, duplicates are skipped.
+    """
+
+    streaming = True
+    sorted_input = True
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        return set(self.iterate(file_name))
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        if is_binary_set_file(file_name):
+            with BinarySetFile(file_name) as set_file:
+                yield from set_file
+            return
+
+        previous = None
+        values = parse_int_file_or_raise(file_name)
+        for line_number, value in enumerate(values):
+            if previous is not None and value <= previous:
+                if value == previous:
+                    continue
+                raise RuntimeException(
+                    reason=(
+                        f"File '{file_name}' is not sorted:"
+                        f" '{value}' follows '{previous}' at line: {line_number}."
+                    ),
+                )
+            yield value
+            previous = value
+
+    def iterate_restricted(self, file_name: str, restriction: Restriction) -> t.Iterator[int]:
+        """
+            Binary set files and text files with stored sorted index (see `load_sparse_index`)
+            are read starting from lower bound of range, and only until upper bound.
+        """
+        if is_binary_set_file(file_name):
+            with BinarySetFile(file_name) as set_file:
+                values = set_file if restriction.lower is None else set_file.iter_from(restriction.lower)
+                yield from restriction.restrict_sorted(values)
+            return
+
+        index = load_sparse_index(file_name)
+        if index is None or not index.is_sorted:
+            # Order of file is checked by `iterate`, so file is read as a whole.
+            yield from super().iterate_restricted(file_name, restriction)
+            return
+        if not index.may_contain(restriction):
+            return
+        offset, line_number = index.seek(restriction.lower)
+        values = itertools.chain.from_iterable(
+            iter_int_blocks_or_raise(file_name, offset=offset, first_line_number=line_number),
+        )
+        # Values of sorted text file may be repeated.
+        yield from restriction.restrict_sorted(value for value, _ in itertools.groupby(values))
+
+
+class EngineWrapper(SetEngine):
+    """
+        Base class for engines which add behaviour (caching, prefetching, etc.)
+        on top of another engine. All calls are delegated to wrapped engine by default,
+        except restricted loads, which are restricted results of `load` and `iterate` of wrapper.
+    """
+
+    def __init__(self, engine: SetEngine):
+        self._engine = engine
+        self.streaming = engine.streaming
+        self.sorted_input = engine.sorted_input
+
+    @property
+    def engine(self) -> SetEngine:
+        return self._engine
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        return self.engine.load(file_name)
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        return self.engine.iterate(file_name)
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        self.engine.prefetch(file_names)
+
+    def stats(self) -> t.Mapping[str, int]:
+        return self.engine.stats()
+
+    def close(self):
+        self.engine.close()
+
+
+def load_engines() -> t.Mapping[str, t.Type[SetEngine]]:
+    from scalc.numpy_engine import NumpySetEngine
+    from scalc.external import ExternalSortEngine
+    from scalc.bitmap import BitmapEngine, AdaptiveEngine
+
+    return {
+        "set": PythonSetEngine,
+        "numpy": NumpySetEngine,
+        "stream": SortedStreamEngine,
+        "external": ExternalSortEngine,
+        "bitmap": BitmapEngine,
+        "auto": AdaptiveEngine,
+    }
+
+
+__all__ = (
+    SetEngine.__name__,
+    PythonSetEngine.__name__,
+    SortedStreamEngine.__name__,
+    EngineWrapper.__name__,
+    load_engines.__name__,
+)
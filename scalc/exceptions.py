@@ -1,6 +1,9 @@
 class SetCalcException(Exception):
 
     def __init__(self, reason: str):
+        # Passing `reason` to base class makes exceptions picklable,
+        # so they can be raised in worker processes.
+        super().__init__(reason)
         self._reason = reason
 
     @property
@@ -1,18 +1,49 @@
+import collections
 import typing as t
 
-from scalc.expressions import Expression
+from scalc.engines import SetEngine, PythonSetEngine
+from scalc.expressions import Expression, LoadFromFileExpression, iter_post_order
 from scalc.functions import SetCalcFunc
 
 
+class _Frame:
+
+    def __init__(self, expression: Expression):
+        self.expression = expression
+        self.args = []
+        self.next_child_idx = 0
+        self.is_short_circuited = False
+
+    @property
+    def is_done(self) -> bool:
+        return (
+            self.is_short_circuited
+            or self.next_child_idx == len(self.expression.children)
+        )
+
+    def accept(self, engine: SetEngine, arg: t.AbstractSet[int]):
+        self.args.append(arg)
+        self.next_child_idx += 1
+        if self.expression.short_circuit:
+            self.args = [self.expression.evaluate_node(engine, self.args)]
+            self.is_short_circuited = len(self.args[0]) == 0
+
+
 class Executor:
+    """
+        Evaluates expression DAG: every distinct node is evaluated once and
+        its result is released as soon as the last consumer has used it.
+    """
 
     def __init__(
         self,
         root_expression: Expression,
         functions_mapping: t.Mapping[str, SetCalcFunc],
+        engine: t.Optional[SetEngine] = None,
     ):
         self._root_expression = root_expression
         self._functions_mapping = functions_mapping
+        self._engine = engine if engine is not None else PythonSetEngine()
 
     @property
     def root_expression(self) -> Expression:
@@ -22,5 +53,66 @@ class Executor:
     def functions_mapping(self) -> t.Mapping[str, SetCalcFunc]:
         return self._functions_mapping
 
+    @property
+    def engine(self) -> SetEngine:
+        return self._engine
+
+    def prefetch(self):
+        """
+            Passes input files to `SetEngine.prefetch`, in order they are loaded.
+        """
+        self.engine.prefetch([
+            expression.file_name
+            for expression in iter_post_order(self.root_expression)
+            if isinstance(expression, LoadFromFileExpression)
+        ])
+
     def execute(self) -> t.AbstractSet[int]:
-        return self.root_expression.evaluate()
+        self.prefetch()
+        consumers_counts = collections.Counter(
+            id(child)
+            for expression in iter_post_order(self.root_expression)
+            for child in expression.children
+        )
+        results = {}
+
+        def release(expression: Expression):
+            consumers_counts[id(expression)] -= 1
+            if consumers_counts[id(expression)] == 0:
+                results.pop(id(expression), None)
+
+        # Explicit stack of (expression, evaluated args) frames instead of recursion.
+        stack = [_Frame(expression=self.root_expression)]
+        while True:
+            frame = stack[-1]
+            children = frame.expression.children
+            if not frame.is_done:
+                child = children[frame.next_child_idx]
+                if id(child) not in results:
+                    stack.append(_Frame(expression=child))
+                    continue
+                frame.accept(self.engine, results[id(child)])
+                release(child)
+                continue
+
+            stack.pop()
+            for skipped_child in children[frame.next_child_idx:]:
+                release(skipped_child)
+            result = frame.expression.evaluate_node(self.engine, frame.args)
+            if not stack:
+                return result
+            results[id(frame.expression)] = result
+
+    def execute_sorted(self) -> t.Iterator[int]:
+        """
+            :return: iterator over sorted result values.
+                Streaming engines produce it without materializing result set,
+                sets which are iterated in ascending order are not sorted again.
+        """
+        if self.engine.streaming:
+            self.prefetch()
+            return self.root_expression.iterate(self.engine)
+        result = self.execute()
+        if getattr(result, "sorted_iteration", False):
+            return iter(result)
+        return iter(sorted(result))
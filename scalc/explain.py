@@ -0,0 +1,349 @@
+"""
+    EXPLAIN and EXPLAIN ANALYZE of compiled expressions.
+
+    `analyze_expression` wraps every node of expression DAG with `AnalyzedExpression`,
+    which records metrics of the node while it is evaluated. Expressions which are
+    not wrapped are evaluated without any instrumentation.
+"""
+import time
+import tracemalloc
+import typing as t
+from dataclasses import dataclass, field
+
+from scalc.engines import SetEngine
+from scalc.expressions import (
+    Expression,
+    LoadFromFileExpression,
+    FunctionCallExpression,
+    RestrictExpression,
+    iter_post_order,
+)
+from scalc.functions import SetCalcFunc
+
+
+# Engine counters which are not deltas of a single load, e.g. total size of cache.
+_IGNORED_ENGINE_STATS = frozenset(("cache_size", ))
+_PROC_IO_PATH = "/proc/self/io"
+
+
+class _ReadBytesCounter:
+    """
+        Count of bytes read by process so far, known on Linux only.
+        Bytes read from `/proc/self/io` by the counter itself are excluded.
+    """
+
+    def __init__(self):
+        self._own_read_bytes_count = 0
+
+    def __call__(self) -> t.Optional[int]:
+        try:
+            with open(_PROC_IO_PATH) as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        read_bytes_count = None
+        for line in content.splitlines():
+            if line.startswith("rchar:"):
+                read_bytes_count = int(line.split()[1]) - self._own_read_bytes_count
+        self._own_read_bytes_count += len(content)
+        return read_bytes_count
+
+
+_read_bytes_count = _ReadBytesCounter()
+
+
+@dataclass
+class NodeMetrics:
+    calls_count: int = 0
+    # Wall time of node. Time of streaming node includes time of its children,
+    # because children are iterated by the node itself.
+    time: float = 0.0
+    output_rows: t.Optional[int] = None
+    peak_memory: t.Optional[int] = None
+    bytes_read: t.Optional[int] = None
+    engine_stats: t.Dict[str, int] = field(default_factory=dict)
+    # Algorithm of function node, see `SetCalcFunc.evaluation_path`.
+    path: t.Optional[str] = None
+
+    @property
+    def is_evaluated(self) -> bool:
+        return self.calls_count > 0
+
+
+class _AnalyzedIterator:
+
+    def __init__(self, iterator: t.Iterator[int], metrics: NodeMetrics):
+        self._iterator = iterator
+        self._metrics = metrics
+        if self._metrics.output_rows is None:
+            self._metrics.output_rows = 0
+
+    def __iter__(self) -> "_AnalyzedIterator":
+        return self
+
+    def __next__(self) -> int:
+        start = time.perf_counter()
+        try:
+            value = next(self._iterator)
+        finally:
+            self._metrics.time += time.perf_counter() - start
+        self._metrics.output_rows += 1
+        return value
+
+
+class AnalyzedExpression(Expression):
+    """
+        Expression which evaluates wrapped expression and records its `NodeMetrics`.
+    """
+
+    def __init__(self, expression: Expression, children: t.Sequence["AnalyzedExpression"]):
+        self._expression = expression
+        self._children = tuple(children)
+        self._metrics = NodeMetrics()
+
+    @property
+    def expression(self) -> Expression:
+        return self._expression
+
+    @property
+    def metrics(self) -> NodeMetrics:
+        return self._metrics
+
+    @property
+    def children(self) -> t.Sequence["AnalyzedExpression"]:
+        return self._children
+
+    @property
+    def short_circuit(self) -> bool:
+        return self.expression.short_circuit
+
+    def evaluate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.AbstractSet[int]],
+    ) -> t.AbstractSet[int]:
+        is_load = isinstance(self.expression, LoadFromFileExpression)
+        engine_stats_before = engine.stats() if is_load else None
+        read_bytes_before = _read_bytes_count()
+        memory_before = None
+        if tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak"):
+            memory_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        if isinstance(self.expression, FunctionCallExpression):
+            self.metrics.path = self.expression.func.evaluation_path(args)
+
+        start = time.perf_counter()
+        result = self.expression.evaluate_node(engine, args)
+        self.metrics.time += time.perf_counter() - start
+
+        self.metrics.calls_count += 1
+        self.metrics.output_rows = len(result)
+        if memory_before is not None:
+            _, peak_memory = tracemalloc.get_traced_memory()
+            self.metrics.peak_memory = max(self.metrics.peak_memory or 0, peak_memory - memory_before)
+        read_bytes_after = _read_bytes_count()
+        if read_bytes_before is not None and read_bytes_after is not None:
+            self.metrics.bytes_read = (
+                (self.metrics.bytes_read or 0) + read_bytes_after - read_bytes_before
+            )
+        if engine_stats_before is not None:
+            for name, value in engine.stats().items():
+                delta = value - engine_stats_before.get(name, 0)
+                if delta and name not in _IGNORED_ENGINE_STATS:
+                    self.metrics.engine_stats[name] = self.metrics.engine_stats.get(name, 0) + delta
+        return result
+
+    def iterate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.Iterator[int]],
+    ) -> t.Iterator[int]:
+        self.metrics.calls_count += 1
+        start = time.perf_counter()
+        iterator = self.expression.iterate_node(engine, args)
+        self.metrics.time += time.perf_counter() - start
+        return _AnalyzedIterator(iterator=iterator, metrics=self.metrics)
+
+
+def analyze_expression(root_expression: Expression) -> AnalyzedExpression:
+    """
+        :return: copy of expression DAG with every node wrapped with `AnalyzedExpression`.
+            Shared nodes stay shared.
+    """
+    analyzed = {}
+    for expression in iter_post_order(root_expression):
+        analyzed[id(expression)] = AnalyzedExpression(
+            expression=expression,
+            children=[analyzed[id(child)] for child in expression.children],
+        )
+    return analyzed[id(root_expression)]
+
+
+@dataclass
+class PlanNode:
+    label: str
+    children: t.List["PlanNode"]
+    # Node is shared and described (with children) at its first occurrence.
+    is_repeated: bool = False
+    metrics: t.Optional[NodeMetrics] = None
+
+
+def _node_label(expression: Expression, func_names: t.Mapping[int, str]) -> str:
+    if isinstance(expression, LoadFromFileExpression):
+        if expression.restriction is not None:
+            return f"LOAD {expression.file_name} {expression.restriction}"
+        return f"LOAD {expression.file_name}"
+    if isinstance(expression, RestrictExpression):
+        return str(expression.restriction)
+    if isinstance(expression, FunctionCallExpression):
+        label = func_names.get(id(expression.func), type(expression.func).__name__)
+        if expression.short_circuit:
+            label = f"{label} (short-circuit)"
+        return label
+    return type(expression).__name__
+
+
+def build_plan(
+    root_expression: Expression,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+) -> PlanNode:
+    """
+        :param root_expression: compiled or analyzed expression.
+    """
+    func_names = {id(func): name for name, func in functions_mapping.items()}
+    described_ids = set()
+
+    def build(expression: Expression) -> PlanNode:
+        metrics = None
+        if isinstance(expression, AnalyzedExpression):
+            metrics = expression.metrics
+            expression = expression.expression
+        node = PlanNode(label=_node_label(expression, func_names), children=[], metrics=metrics)
+        if id(expression) in described_ids:
+            node.is_repeated = True
+        described_ids.add(id(expression))
+        return node
+
+    # Explicit stack, so deep expressions do not hit recursion limit.
+    # Nodes are built in pre-order, so shared node is described at its first occurrence.
+    root_node = None
+    stack = [(root_expression, None)]
+    while stack:
+        expression, parent_node = stack.pop()
+        node = build(expression)
+        if parent_node is None:
+            root_node = node
+        else:
+            parent_node.children.append(node)
+        if not node.is_repeated:
+            stack.extend((child, node) for child in reversed(expression.children))
+    return root_node
+
+
+def _format_size(size: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _input_rows(node: PlanNode) -> t.List[t.Optional[int]]:
+    """
+        :return: cardinalities of arguments of node, None for skipped arguments.
+    """
+    return [
+        child.metrics.output_rows
+        if child.metrics is not None and child.metrics.is_evaluated
+        else None
+        for child in node.children
+    ]
+
+
+def _format_metrics(node: PlanNode) -> str:
+    metrics = node.metrics
+    if not metrics.is_evaluated:
+        return "skipped"
+    parts = [f"time={metrics.time * 1000:.3f} ms"]
+    if node.children:
+        input_rows = ",".join("-" if rows is None else str(rows) for rows in _input_rows(node))
+        parts.append(f"input_rows={input_rows}")
+    parts.append(f"rows={metrics.output_rows}")
+    if metrics.path is not None:
+        parts.append(f"path={metrics.path}")
+    if metrics.calls_count > 1:
+        parts.append(f"calls={metrics.calls_count}")
+    if metrics.peak_memory is not None:
+        parts.append(f"peak_memory={_format_size(metrics.peak_memory)}")
+    if metrics.bytes_read:
+        parts.append(f"read={_format_size(metrics.bytes_read)}")
+    parts.extend(f"{name}={value}" for name, value in sorted(metrics.engine_stats.items()))
+    return " ".join(parts)
+
+
+def format_plan(root_node: PlanNode, indent: str = "  ") -> str:
+    """
+        :return: plan as indented tree, one node per line.
+    """
+    lines = []
+    stack = [(root_node, 0)]
+    while stack:
+        node, depth = stack.pop()
+        line = f"{indent * depth}{node.label}"
+        if node.is_repeated:
+            line = f"{line} (shared, see above)"
+        elif node.metrics is not None:
+            line = f"{line}  [{_format_metrics(node)}]"
+        lines.append(line)
+        for child in reversed(node.children):
+            stack.append((child, depth + 1))
+    return "\n".join(lines)
+
+
+def plan_to_json(root_node: PlanNode) -> t.Dict[str, t.Any]:
+    """
+        :return: plan as JSON serializable mapping.
+    """
+    def convert(node: PlanNode) -> t.Dict[str, t.Any]:
+        converted = {"label": node.label}
+        if node.is_repeated:
+            converted["shared"] = True
+        if node.metrics is not None and not node.is_repeated:
+            metrics = node.metrics
+            converted["evaluated"] = metrics.is_evaluated
+            if metrics.is_evaluated:
+                converted.update(
+                    calls_count=metrics.calls_count,
+                    time=metrics.time,
+                    input_rows=_input_rows(node),
+                    output_rows=metrics.output_rows,
+                    peak_memory=metrics.peak_memory,
+                    bytes_read=metrics.bytes_read,
+                    engine_stats=dict(metrics.engine_stats),
+                    path=metrics.path,
+                )
+        converted["children"] = []
+        return converted
+
+    root_json = convert(root_node)
+    stack = [(root_node, root_json)]
+    while stack:
+        node, node_json = stack.pop()
+        for child in node.children:
+            child_json = convert(child)
+            node_json["children"].append(child_json)
+            stack.append((child, child_json))
+    return root_json
+
+
+__all__ = (
+    NodeMetrics.__name__,
+    AnalyzedExpression.__name__,
+    PlanNode.__name__,
+    analyze_expression.__name__,
+    build_plan.__name__,
+    format_plan.__name__,
+    plan_to_json.__name__,
+)
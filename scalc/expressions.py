@@ -1,75 +1,180 @@
 import abc
 import typing as t
 
-from scalc.exceptions import RuntimeException
-from scalc.functions import SetCalcFunc
+from scalc.engines import SetEngine, PythonSetEngine
+from scalc.functions import SetCalcFunc, SumFunc, IntFunc, DifFunc
+from scalc.restrictions import Restriction
+
+
+# Nesting depth of streams after which stream of subexpression is materialized, see `Expression.iterate`.
+MAX_NESTED_STREAMS = 64
 
 
 class Expression(abc.ABC):
     """
         Expression - AST Node type which can be evaluated to `collections.abc.Set` type.
+        Expressions are immutable and hashable, so equal subexpressions
+        can be shared between several parents.
     """
 
+    @property
+    def children(self) -> t.Sequence["Expression"]:
+        """
+            :return: subexpressions which must be evaluated before this expression.
+        """
+        return ()
+
+    @property
+    def short_circuit(self) -> bool:
+        """
+            If set, `children` may be evaluated one by one, folding evaluated
+            ones with `evaluate_node`, and remaining children can be skipped
+            as soon as the folded result is empty.
+        """
+        return False
+
     @abc.abstractmethod
-    def evaluate(self) -> t.AbstractSet[int]:
+    def evaluate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.AbstractSet[int]],
+    ) -> t.AbstractSet[int]:
+        """
+            Evaluates expression from already evaluated children.
+            :param args: evaluated `children`, in the same order.
+        """
         pass
 
+    @abc.abstractmethod
+    def iterate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.Iterator[int]],
+    ) -> t.Iterator[int]:
+        """
+            Streaming counterpart of `evaluate_node`.
+            :param args: iterators over sorted unique integers of `children`.
+        """
+        pass
+
+    def evaluate(self, engine: t.Optional[SetEngine] = None) -> t.AbstractSet[int]:
+        """
+            :param engine: engine used to load sets from files. `PythonSetEngine` by default.
+        """
+        if engine is None:
+            engine = PythonSetEngine()
+        args = []
+        for child in self.children:
+            args.append(child.evaluate(engine))
+            if self.short_circuit:
+                args = [self.evaluate_node(engine, args)]
+                if len(args[0]) == 0:
+                    break
+        return self.evaluate_node(engine, args)
+
+    def iterate(self, engine: SetEngine) -> t.Iterator[int]:
+        """
+            Streaming evaluation. Pipeline of streams is built with explicit stack,
+            streams of subexpressions nested deeper than `MAX_NESTED_STREAMS` are materialized,
+            so values are not pulled through chains of generators which exceed recursion limit.
+            :return: iterator over sorted unique integers of evaluated set.
+        """
+        # Stack of (expression, streams of evaluated children, nesting depths of the streams).
+        stack = [(self, [], [])]
+        while True:
+            expression, args, depths = stack[-1]
+            children = expression.children
+            if len(args) < len(children):
+                stack.append((children[len(args)], [], []))
+                continue
+
+            stack.pop()
+            stream = expression.iterate_node(engine, args)
+            depth = max(depths, default=0) + 1
+            if depth >= MAX_NESTED_STREAMS:
+                stream = iter(list(stream))
+                depth = 0
+            if not stack:
+                return stream
+            stack[-1][1].append(stream)
+            stack[-1][2].append(depth)
+
 
 class LoadFromFileExpression(Expression):
 
-    def __init__(self, file_name: str):
+    def __init__(self, file_name: str, restriction: t.Optional[Restriction] = None):
+        """
+            :param restriction: restriction pushed down to loading of file, see `restrict_expression`.
+        """
         self._file_name = file_name
+        self._restriction = restriction
 
     def __eq__(self, obj) -> bool:
         if type(self) != type(obj):
             return False
-        return self.file_name == obj.file_name
+        return self.file_name == obj.file_name and self.restriction == obj.restriction
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.file_name, self.restriction))
 
     @property
     def file_name(self) -> str:
         return self._file_name
 
-    def _parse_set_or_raise(self, lines: t.Iterable[str]) -> t.AbstractSet[int]:
-        result_set = set()
-        for line_number, line in enumerate(lines):
-            try:
-                result_set.add(int(line))
-            except ValueError:
-                raise RuntimeException(
-                    reason= (
-                        f"Invalid integer: '{line}' "
-                        " in file: '{self.file_name}' at line: {line_number}."
-                    ),
-                )
-
-        return result_set
+    @property
+    def restriction(self) -> t.Optional[Restriction]:
+        return self._restriction
 
+    def evaluate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.AbstractSet[int]],
+    ) -> t.AbstractSet[int]:
+        if self.restriction is not None:
+            return engine.load_restricted(self.file_name, self.restriction)
+        return engine.load(self.file_name)
 
-    def evaluate(self) -> t.AbstractSet[int]:
-        try:
-            with open(self.file_name, "r") as f:
-                return self._parse_set_or_raise(f.readlines())
-        except FileNotFoundError:
-            raise RuntimeException(
-                reason=f"File '{self.file_name}' not found.",
-            )
+    def iterate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.Iterator[int]],
+    ) -> t.Iterator[int]:
+        if self.restriction is not None:
+            return engine.iterate_restricted(self.file_name, self.restriction)
+        return engine.iterate(self.file_name)
 
 
 class FunctionCallExpression(Expression):
 
-    def __init__(self, func: SetCalcFunc, func_args: t.Sequence[Expression]):
+    def __init__(
+        self,
+        func: SetCalcFunc,
+        func_args: t.Sequence[Expression],
+        short_circuit: bool = False,
+    ):
+        """
+            :param short_circuit: allow to skip remaining arguments as soon
+                as result is known to be empty. Has effect only for functions
+                with `short_circuit_on_empty` flag.
+        """
         self._func = func
         self._func_args = tuple(func_args)
+        self._short_circuit = short_circuit and func.short_circuit_on_empty
+        # Children hashes are cached too, so hash of deep tree is computed once.
+        self._hash = hash((type(self), self._func, self._func_args, self._short_circuit))
 
     def __eq__(self, obj) -> bool:
         if type(self) != type(obj):
             return False
 
-        if self.func != obj.func:
+        if self.func != obj.func or self.short_circuit != obj.short_circuit:
             return False
 
         return self.func_args == obj.func_args
 
+    def __hash__(self) -> int:
+        return self._hash
+
     @property
     def func(self) -> SetCalcFunc:
         return self._func
@@ -78,6 +183,341 @@ class FunctionCallExpression(Expression):
     def func_args(self) -> t.Sequence[Expression]:
         return self._func_args
 
-    def evaluate(self) -> t.AbstractSet[int]:
-        evaluated_args = [arg.evaluate() for arg in self.func_args]
-        return self.func.call(args=evaluated_args)
+    @property
+    def children(self) -> t.Sequence[Expression]:
+        return self.func_args
+
+    @property
+    def short_circuit(self) -> bool:
+        return self._short_circuit
+
+    def evaluate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.AbstractSet[int]],
+    ) -> t.AbstractSet[int]:
+        return self.func.call(args=args)
+
+    def iterate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.Iterator[int]],
+    ) -> t.Iterator[int]:
+        return self.func.merge(args=args)
+
+
+class RestrictExpression(Expression):
+    """
+        Restriction of result of expression which can not be pushed down to loading of files,
+        e.g. `LIMIT` of intersection.
+    """
+
+    def __init__(self, restriction: Restriction, arg: Expression):
+        self._restriction = restriction
+        self._arg = arg
+        self._hash = hash((type(self), self._restriction, self._arg))
+
+    def __eq__(self, obj) -> bool:
+        if type(self) != type(obj):
+            return False
+        return self.restriction == obj.restriction and self.arg == obj.arg
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    @property
+    def restriction(self) -> Restriction:
+        return self._restriction
+
+    @property
+    def arg(self) -> Expression:
+        return self._arg
+
+    @property
+    def children(self) -> t.Sequence[Expression]:
+        return (self.arg, )
+
+    def evaluate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.AbstractSet[int]],
+    ) -> t.AbstractSet[int]:
+        return self.restriction.restrict_set(args[0])
+
+    def iterate_node(
+        self,
+        engine: SetEngine,
+        args: t.Sequence[t.Iterator[int]],
+    ) -> t.Iterator[int]:
+        # Argument is read as a whole, so that unsorted files are reported by streaming engines.
+        return self.restriction.filter_sorted(args[0])
+
+
+def _args_restriction(
+    expression: Expression,
+    restriction: Restriction,
+) -> t.Optional[Restriction]:
+    """
+        :return: restriction of arguments of expression which is equal to restriction of its result,
+            None if restriction can not be pushed down to arguments.
+    """
+    if not isinstance(expression, FunctionCallExpression):
+        return None
+    if isinstance(expression.func, SumFunc):
+        # The smallest values of union are the smallest values of its arguments.
+        return restriction
+    if isinstance(expression.func, (IntFunc, DifFunc)) and restriction.has_range:
+        return restriction.value_range
+    return None
+
+
+def restrict_expression(
+    root_expression: Expression,
+    restriction: Restriction,
+    share: t.Callable[[Expression], Expression] = lambda expression: expression,
+) -> Expression:
+    """
+        Pushes restriction down through SUM, INT and DIF calls to loading of files:
+        range of values restricts every argument of these functions, limit restricts
+        arguments of SUM only. Restriction of any other node is evaluated after the node.
+        :param share: returns previously created expression equal to given one, see `Compiler`.
+        :return: expression equal to `root_expression` restricted with `restriction`.
+    """
+    # (id of expression, restriction) -> restricted expression.
+    restricted = {}
+    root_key = (id(root_expression), restriction)
+    stack = [(root_expression, restriction, False)]
+    while stack:
+        expression, restriction, args_restricted = stack.pop()
+        key = (id(expression), restriction)
+        if key in restricted:
+            continue
+        args_restriction = _args_restriction(expression, restriction)
+
+        if isinstance(expression, LoadFromFileExpression):
+            load_restriction = (
+                expression.restriction.then(restriction)
+                if expression.restriction is not None
+                else restriction
+            )
+            if load_restriction is not None:
+                restricted[key] = share(LoadFromFileExpression(
+                    file_name=expression.file_name,
+                    restriction=load_restriction,
+                ))
+            else:
+                restricted[key] = share(RestrictExpression(restriction=restriction, arg=expression))
+        elif isinstance(expression, RestrictExpression) and (
+            expression.restriction.then(restriction) is not None
+        ):
+            combined = expression.restriction.then(restriction)
+            if not args_restricted:
+                stack.append((expression, restriction, True))
+                stack.append((expression.arg, combined, False))
+                continue
+            restricted[key] = restricted[(id(expression.arg), combined)]
+        elif args_restriction is not None:
+            if not args_restricted:
+                stack.append((expression, restriction, True))
+                for arg in reversed(expression.func_args):
+                    stack.append((arg, args_restriction, False))
+                continue
+            restricted_expression = share(FunctionCallExpression(
+                func=expression.func,
+                func_args=[restricted[(id(arg), args_restriction)] for arg in expression.func_args],
+                short_circuit=expression.short_circuit,
+            ))
+            if restriction.limit is not None:
+                # Limit is not pushed down to arguments of INT and DIF,
+                # union of limited arguments of SUM is limited again.
+                restricted_expression = share(RestrictExpression(
+                    restriction=Restriction(limit=restriction.limit),
+                    arg=restricted_expression,
+                ))
+            restricted[key] = restricted_expression
+        else:
+            restricted[key] = share(RestrictExpression(restriction=restriction, arg=expression))
+    return restricted[root_key]
+
+
+def _intersect_bounds(
+    bounds: t.Optional[t.Tuple[int, int]],
+    other: t.Optional[t.Tuple[int, int]],
+) -> t.Optional[t.Tuple[int, int]]:
+    if bounds is None or other is None:
+        return bounds if other is None else other
+    return max(bounds[0], other[0]), min(bounds[1], other[1])
+
+
+def _restriction_bounds(restriction: t.Optional[Restriction]) -> t.Optional[t.Tuple[int, int]]:
+    if restriction is None or restriction.lower is None or restriction.upper is None:
+        return None
+    return restriction.lower, restriction.upper - 1
+
+
+def _func_call_bounds(
+    expression: FunctionCallExpression,
+    args_bounds: t.Sequence[t.Optional[t.Tuple[int, int]]],
+) -> t.Optional[t.Tuple[int, int]]:
+    if isinstance(expression.func, SumFunc):
+        if not args_bounds or None in args_bounds:
+            return None
+        return min(lower for lower, _ in args_bounds), max(upper for _, upper in args_bounds)
+    if isinstance(expression.func, IntFunc):
+        bounds = None
+        for arg_bounds in args_bounds:
+            bounds = _intersect_bounds(bounds, arg_bounds)
+        return bounds
+    if isinstance(expression.func, DifFunc) and args_bounds:
+        return args_bounds[0]
+    return None
+
+
+def restrict_to_file_bounds(
+    root_expression: Expression,
+    file_bounds: t.Callable[[str], t.Optional[t.Tuple[int, int]]],
+) -> Expression:
+    """
+        Restricts arguments of INT and DIF calls to range of values which their results may have,
+        so values of arguments which can not contribute to results are not loaded,
+        e.g. arguments of INT whose ranges do not overlap are restricted to empty range.
+        Rewritten expression is valid only while files are not changed.
+        :param file_bounds: returns the smallest and the largest values of file, None if they are not known.
+    """
+    restricted = {}
+    # Id of expression -> (smallest, largest) values of its result, None if they are not known.
+    # Smallest value greater than largest one means that result is empty.
+    bounds = {}
+    shared_expressions = {}
+
+    def share(expression: Expression) -> Expression:
+        return shared_expressions.setdefault(expression, expression)
+
+    for expression in iter_post_order(root_expression):
+        restricted_expression = expression
+        if isinstance(expression, LoadFromFileExpression):
+            expression_bounds = _intersect_bounds(
+                file_bounds(expression.file_name),
+                _restriction_bounds(expression.restriction),
+            )
+        elif isinstance(expression, RestrictExpression):
+            restricted_expression = RestrictExpression(
+                restriction=expression.restriction,
+                arg=restricted[id(expression.arg)],
+            )
+            expression_bounds = _intersect_bounds(
+                bounds[id(expression.arg)],
+                _restriction_bounds(expression.restriction),
+            )
+        elif isinstance(expression, FunctionCallExpression):
+            args_bounds = [bounds[id(arg)] for arg in expression.func_args]
+            func_args = [restricted[id(arg)] for arg in expression.func_args]
+            expression_bounds = _func_call_bounds(expression, args_bounds)
+            # Arguments of SUM can not be narrowed, bounds of its result are bounds of arguments.
+            if expression_bounds is not None and isinstance(expression.func, (IntFunc, DifFunc)):
+                lower, upper = expression_bounds
+                restriction = Restriction(lower=lower, upper=max(lower, upper + 1))
+                func_args = [
+                    arg
+                    if _intersect_bounds(arg_bounds, expression_bounds) == arg_bounds
+                    else restrict_expression(arg, restriction, share=share)
+                    for arg, arg_bounds in zip(func_args, args_bounds)
+                ]
+            restricted_expression = FunctionCallExpression(
+                func=expression.func,
+                func_args=func_args,
+                short_circuit=expression.short_circuit,
+            )
+        else:
+            expression_bounds = None
+        restricted[id(expression)] = share(restricted_expression)
+        bounds[id(expression)] = expression_bounds
+    return restricted[id(root_expression)]
+
+
+def iter_post_order(root_expression: Expression) -> t.Iterator[Expression]:
+    """
+        Yields every distinct (by identity) node of expression DAG once,
+        children before parents, in evaluation order.
+    """
+    visited_ids = set()
+    stack = [(root_expression, False)]
+    while stack:
+        expression, children_visited = stack.pop()
+        if children_visited:
+            yield expression
+            continue
+        if id(expression) in visited_ids:
+            continue
+        visited_ids.add(id(expression))
+        stack.append((expression, True))
+        for child in reversed(expression.children):
+            if id(child) not in visited_ids:
+                stack.append((child, False))
+
+
+def has_limit(root_expression: Expression) -> bool:
+    """
+        :return: whether any node of expression is restricted with `LIMIT`.
+    """
+    return any(
+        isinstance(expression, (LoadFromFileExpression, RestrictExpression))
+        and expression.restriction is not None
+        and expression.restriction.limit is not None
+        for expression in iter_post_order(root_expression)
+    )
+
+
+def _format_restricted(restriction: Restriction, formatted_arg: str) -> str:
+    if restriction.has_range:
+        formatted_arg = f"[ RANGE {restriction.lower} {restriction.upper} {formatted_arg} ]"
+    if restriction.limit is not None:
+        formatted_arg = f"[ LIMIT {restriction.limit} {formatted_arg} ]"
+    return formatted_arg
+
+
+def format_expression(
+    root_expression: Expression,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+) -> str:
+    """
+        :return: source string of expression, e.g. `[ SUM a.txt [ INT b.txt c.txt ] ]`.
+    """
+    func_names = {id(func): name for name, func in functions_mapping.items()}
+    formatted = {}
+    for expression in iter_post_order(root_expression):
+        if isinstance(expression, LoadFromFileExpression):
+            formatted[id(expression)] = expression.file_name
+            if expression.restriction is not None:
+                formatted[id(expression)] = _format_restricted(
+                    expression.restriction,
+                    formatted[id(expression)],
+                )
+        elif isinstance(expression, RestrictExpression):
+            formatted[id(expression)] = _format_restricted(
+                expression.restriction,
+                formatted[id(expression.arg)],
+            )
+        elif isinstance(expression, FunctionCallExpression):
+            formatted[id(expression)] = " ".join((
+                "[",
+                func_names.get(id(expression.func), type(expression.func).__name__),
+                *(formatted[id(arg)] for arg in expression.func_args),
+                "]",
+            ))
+        else:
+            formatted[id(expression)] = f"<{type(expression).__name__}>"
+    return formatted[id(root_expression)]
+
+
+__all__ = (
+    Expression.__name__,
+    LoadFromFileExpression.__name__,
+    FunctionCallExpression.__name__,
+    RestrictExpression.__name__,
+    restrict_expression.__name__,
+    restrict_to_file_bounds.__name__,
+    has_limit.__name__,
+    iter_post_order.__name__,
+    format_expression.__name__,
+)
@@ -0,0 +1,151 @@
+import contextlib
+import os
+import tempfile
+import typing as t
+from dataclasses import dataclass, asdict
+
+from scalc.binary import BinarySetFile, is_binary_set_file
+from scalc.engines import SetEngine
+from scalc.parsing import parse_int_file_or_raise
+from scalc.merging import union_sorted
+
+
+# Rough memory cost of one python `int` stored in `set`.
+_BYTES_PER_VALUE = 64
+# Max count of runs merged at once. Larger count of runs is merged in several passes.
+_MAX_MERGE_FAN_IN = 256
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+@dataclass
+class SpillStats:
+    spilled_files_count: int = 0
+    runs_count: int = 0
+    merge_passes_count: int = 0
+    spilled_values_count: int = 0
+    spilled_bytes: int = 0
+
+
+class ExternalSortEngine(SetEngine):
+    """
+        Streaming engine for unsorted files which may not fit into memory.
+        File is read in chunks, every chunk is sorted and spilled to `temp_dir`
+        as a run, then runs are merged lazily.
+
+        `memory_budget` is shared by all streams of engine: half of it is shared by sorted files
+        which are kept in memory while they are iterated, so files which fit into the rest
+        of this half are never spilled. The other half limits chunks of spilled files,
+        which are sorted one at a time and released before their runs are merged.
+    """
+
+    streaming = True
+
+    def __init__(
+        self,
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+        temp_dir: t.Optional[str] = None,
+    ):
+        self._memory_budget = memory_budget
+        self._temp_dir = temp_dir
+        self._spill_stats = SpillStats()
+        # Count of values of files which are kept in memory by open streams.
+        self._held_values_count = 0
+
+    @property
+    def memory_budget(self) -> int:
+        return self._memory_budget
+
+    @property
+    def temp_dir(self) -> t.Optional[str]:
+        return self._temp_dir
+
+    @property
+    def spill_stats(self) -> SpillStats:
+        return self._spill_stats
+
+    def stats(self) -> t.Mapping[str, int]:
+        return asdict(self.spill_stats)
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        return set(self.iterate(file_name))
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        if is_binary_set_file(file_name):
+            # Binary set files are already sorted.
+            with BinarySetFile(file_name) as set_file:
+                yield from set_file
+            return
+
+        max_values_count = max(1, self.memory_budget // _BYTES_PER_VALUE // 2)
+        max_held_values_count = max_values_count - self._held_values_count
+        with contextlib.closing(parse_int_file_or_raise(file_name)) as values:
+            chunk = set()
+            for value in values:
+                chunk.add(value)
+                if len(chunk) > max_held_values_count:
+                    break
+            else:
+                sorted_values = sorted(chunk)
+                chunk = None
+                held_values_count = len(sorted_values)
+                self._held_values_count += held_values_count
+                try:
+                    yield from sorted_values
+                finally:
+                    self._held_values_count -= held_values_count
+                return
+
+            self.spill_stats.spilled_files_count += 1
+            with tempfile.TemporaryDirectory(prefix="scalc-", dir=self.temp_dir) as spill_dir:
+                run_paths = []
+                # Chunk read while file was expected to fit into memory may be larger than run.
+                if len(chunk) >= max_values_count:
+                    run_paths.append(self._spill_run(spill_dir, sorted(chunk)))
+                    chunk.clear()
+                for value in values:
+                    chunk.add(value)
+                    if len(chunk) >= max_values_count:
+                        run_paths.append(self._spill_run(spill_dir, sorted(chunk)))
+                        chunk.clear()
+                if chunk:
+                    run_paths.append(self._spill_run(spill_dir, sorted(chunk)))
+                    chunk.clear()
+
+                while len(run_paths) > _MAX_MERGE_FAN_IN:
+                    run_paths = self._merge_runs_pass(spill_dir, run_paths)
+
+                yield from union_sorted([self._read_run(path) for path in run_paths])
+
+    def _spill_run(self, spill_dir: str, values: t.Iterable[int]) -> str:
+        path = os.path.join(spill_dir, f"run-{self.spill_stats.runs_count}")
+        with open(path, "w") as f:
+            for value in values:
+                f.write(f"{value}\n")
+                self.spill_stats.spilled_values_count += 1
+            self.spill_stats.spilled_bytes += f.tell()
+        self.spill_stats.runs_count += 1
+        return path
+
+    def _read_run(self, path: str) -> t.Iterator[int]:
+        with open(path, "r") as f:
+            for line in f:
+                yield int(line)
+
+    def _merge_runs_pass(self, spill_dir: str, run_paths: t.Sequence[str]) -> t.List[str]:
+        self.spill_stats.merge_passes_count += 1
+        merged_run_paths = []
+        for idx in range(0, len(run_paths), _MAX_MERGE_FAN_IN):
+            group = run_paths[idx:idx + _MAX_MERGE_FAN_IN]
+            merged_run_paths.append(
+                self._spill_run(spill_dir, union_sorted([self._read_run(path) for path in group]))
+            )
+            for path in group:
+                os.unlink(path)
+        return merged_run_paths
+
+
+__all__ = (
+    SpillStats.__name__,
+    ExternalSortEngine.__name__,
+)
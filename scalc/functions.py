@@ -3,32 +3,106 @@ import functools
 import abc
 
 from scalc.exceptions import RuntimeException
+from scalc.merging import union_sorted, intersect_sorted, difference_sorted
+from scalc.sorted_sets import (
+    HASH_PATH,
+    MERGE_PATH,
+    SortedListSet,
+    union_sorted_sets,
+    intersect_sorted_sets,
+    difference_sorted_sets,
+    intersection_path,
+    difference_path,
+)
+
+
+def _all_sorted(args: t.Sequence[t.AbstractSet[int]]) -> bool:
+    return all(isinstance(arg, SortedListSet) for arg in args)
 
 
 class SetCalcFunc(abc.ABC):
 
+    # If set, function is a left fold of its arguments
+    # and its result is empty as soon as the fold of some prefix of arguments is empty.
+    # Evaluation of such function can be stopped without evaluating remaining arguments.
+    short_circuit_on_empty = False
+    # If set, function is associative and commutative, so its arguments
+    # can be reduced pairwise in any order, e.g. as a balanced tree.
+    associative = False
+
     @abc.abstractmethod
     def call(self, args: t.Sequence[t.AbstractSet[int]]) -> t.AbstractSet[int]:
         pass
 
+    def evaluation_path(self, args: t.Sequence[t.AbstractSet[int]]) -> str:
+        """
+            :return: name of algorithm which `call` uses for given arguments, for debugging.
+                Arguments which are all `SortedListSet` are merged or searched,
+                other arguments are combined with their own operators, e.g. hash sets.
+        """
+        return HASH_PATH
+
+    def merge(self, args: t.Sequence[t.Iterator[int]]) -> t.Iterator[int]:
+        """
+            Streaming counterpart of `call`.
+            :param args: iterators over sorted unique integers.
+            :return: iterator over sorted unique integers.
+        """
+        raise RuntimeException(
+            reason=f"Function {type(self).__name__} does not support streaming evaluation.",
+        )
+
 
 class SumFunc(SetCalcFunc):
 
+    associative = True
+
+    def evaluation_path(self, args: t.Sequence[t.AbstractSet[int]]) -> str:
+        return MERGE_PATH if _all_sorted(args) else HASH_PATH
+
     def call(self, args: t.Sequence[t.AbstractSet[int]]) -> t.AbstractSet[int]:
+        if _all_sorted(args):
+            return union_sorted_sets(args)
         return functools.reduce(lambda s1, s2: s1 | s2, args)
 
+    def merge(self, args: t.Sequence[t.Iterator[int]]) -> t.Iterator[int]:
+        return union_sorted(args)
+
 
 class IntFunc(SetCalcFunc):
 
+    short_circuit_on_empty = True
+    associative = True
+
+    def evaluation_path(self, args: t.Sequence[t.AbstractSet[int]]) -> str:
+        return intersection_path(args) if _all_sorted(args) else HASH_PATH
+
     def call(self, args: t.Sequence[t.AbstractSet[int]]) -> t.AbstractSet[int]:
+        if _all_sorted(args):
+            return intersect_sorted_sets(args)
         return functools.reduce(lambda s1, s2: s1 & s2, args)
 
+    def merge(self, args: t.Sequence[t.Iterator[int]]) -> t.Iterator[int]:
+        return intersect_sorted(args)
+
 
 class DifFunc(SetCalcFunc):
 
+    short_circuit_on_empty = True
+
+    def evaluation_path(self, args: t.Sequence[t.AbstractSet[int]]) -> str:
+        if len(args) > 1 and _all_sorted(args):
+            return difference_path(args[0], args[1:])
+        return HASH_PATH
+
     def call(self, args: t.Sequence[t.AbstractSet[int]]) -> t.AbstractSet[int]:
+        if len(args) > 1 and _all_sorted(args):
+            return difference_sorted_sets(args[0], args[1:])
         return functools.reduce(lambda s1, s2: s1 - s2, args)
 
+    def merge(self, args: t.Sequence[t.Iterator[int]]) -> t.Iterator[int]:
+        return difference_sorted(args[0], args[1:])
+
 
 def load_functions() -> t.Mapping[str, SetCalcFunc]:
     return {
@@ -0,0 +1,151 @@
+"""
+    Algorithms over sorted iterators of unique integers.
+    Every function consumes its input lazily and keeps only one current
+    value (or one block of values) per input iterator in memory.
+    Inputs are read to the end even if result is known earlier, so errors
+    of inputs (e.g. unsorted file) are raised regardless of their values.
+"""
+import bisect
+import collections
+import heapq
+import itertools
+import typing as t
+
+
+# Count of values buffered from every input of intersection at once.
+_BLOCK_SIZE = 1024
+
+
+def unique_sorted(iterator: t.Iterable[int]) -> t.Iterator[int]:
+    """
+        Drops consecutive duplicates from sorted iterator.
+    """
+    previous = None
+    for value in iterator:
+        if value != previous:
+            yield value
+        previous = value
+
+
+def union_sorted(iterators: t.Sequence[t.Iterable[int]]) -> t.Iterator[int]:
+    """
+        N-ary merge of sorted iterators.
+    """
+    return unique_sorted(heapq.merge(*iterators))
+
+
+def _drain(iterator: t.Iterator[int]):
+    collections.deque(iterator, maxlen=0)
+
+
+def _gallop(values: t.Sequence[int], value: int, position: int) -> int:
+    """
+        Exponential search: probes positions `position`, +1, +3, +7, ... until value
+        not less than `value` is found, then bisects the last step.
+        :return: position of the first of `values[position:]` not less than `value`.
+    """
+    step = 1
+    high = position
+    while high < len(values) and values[high] < value:
+        position = high + 1
+        high += step
+        step *= 2
+    return bisect.bisect_left(values, value, position, min(high, len(values)))
+
+
+class _BlockCursor:
+    """
+        Cursor over sorted iterator which buffers its values in blocks,
+        so runs of values are skipped by galloping search instead of one by one.
+    """
+
+    def __init__(self, iterator: t.Iterable[int]):
+        self._iterator = iter(iterator)
+        self._block = []
+        self._position = 0
+
+    def _read_block(self) -> bool:
+        self._block = list(itertools.islice(self._iterator, _BLOCK_SIZE))
+        self._position = 0
+        return bool(self._block)
+
+    def seek(self, value: int) -> t.Optional[int]:
+        """
+            Skips values less than `value`.
+            :return: current value, None if iterator is exhausted.
+        """
+        while self._position == len(self._block) or self._block[-1] < value:
+            if not self._read_block():
+                return None
+        self._position = _gallop(self._block, value, self._position)
+        return self._block[self._position]
+
+    def next(self) -> t.Optional[int]:
+        """
+            Skips current value.
+            :return: the next value, None if iterator is exhausted.
+        """
+        self._position += 1
+        if self._position == len(self._block) and not self._read_block():
+            return None
+        return self._block[self._position]
+
+    def drain(self):
+        self._block = []
+        self._position = 0
+        _drain(self._iterator)
+
+
+def intersect_sorted(iterators: t.Sequence[t.Iterable[int]]) -> t.Iterator[int]:
+    """
+        Leapfrog intersection of sorted iterators: every iterator which is
+        behind the current maximum gallops forward until it catches up.
+    """
+    cursors = [_BlockCursor(iterator) for iterator in iterators]
+    if not cursors:
+        return
+    current = [cursor.seek(-float("inf")) for cursor in cursors]
+    while None not in current:
+        high = max(current)
+        for idx, cursor in enumerate(cursors):
+            if current[idx] < high:
+                current[idx] = cursor.seek(high)
+                if current[idx] is None:
+                    break
+        else:
+            if all(value == high for value in current):
+                yield high
+                current = [cursor.next() for cursor in cursors]
+
+    for cursor in cursors:
+        cursor.drain()
+
+
+def difference_sorted(
+    iterator: t.Iterable[int],
+    subtrahends: t.Sequence[t.Iterable[int]],
+) -> t.Iterator[int]:
+    """
+        Yields values of `iterator` which are missing in all of `subtrahends`.
+    """
+    iterator = iter(iterator)
+    subtrahend = union_sorted(subtrahends)
+    subtrahend_value = next(subtrahend, None)
+    for value in iterator:
+        while subtrahend_value is not None and subtrahend_value < value:
+            subtrahend_value = next(subtrahend, None)
+        if subtrahend_value is None:
+            yield value
+            yield from iterator
+            return
+        if subtrahend_value != value:
+            yield value
+    _drain(subtrahend)
+
+
+__all__ = (
+    unique_sorted.__name__,
+    union_sorted.__name__,
+    intersect_sorted.__name__,
+    difference_sorted.__name__,
+)
@@ -0,0 +1,208 @@
+import collections.abc
+import typing as t
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from scalc.binary import BinarySetFile, Encoding, HEADER_SIZE, is_binary_set_file
+from scalc.engines import SetEngine
+from scalc.parsing import DEFAULT_CHUNK_SIZE, iter_indexed_line_blocks_or_raise, parse_int_lines_or_raise
+from scalc.exceptions import RuntimeException
+from scalc.restrictions import Restriction
+
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeException(
+            reason="Engine 'numpy' requires NumPy to be installed.",
+        )
+
+
+class SortedArraySet(collections.abc.Set):
+    """
+        SortedArraySet - immutable set of integers stored as a sorted
+        array of unique `int64` values.
+        Set operations between two `SortedArraySet` objects are evaluated
+        with vectorized NumPy kernels.
+    """
+
+    # Set is iterated in ascending order, see `Executor.execute_sorted`.
+    sorted_iteration = True
+
+    def __init__(self, values: "np.ndarray"):
+        self._values = values
+
+    @classmethod
+    def _from_iterable(cls, it: t.Iterable[int]) -> "SortedArraySet":
+        _require_numpy()
+        values = np.fromiter(it, dtype=np.int64)
+        return cls(values=np.unique(values))
+
+    @classmethod
+    def _coerce(cls, obj: t.AbstractSet[int]) -> "SortedArraySet":
+        if isinstance(obj, cls):
+            return obj
+        return cls._from_iterable(obj)
+
+    @property
+    def values(self) -> "np.ndarray":
+        return self._values
+
+    def _membership_mask(self, other: "SortedArraySet") -> "np.ndarray":
+        """
+            :return: boolean mask of `self.values` elements which are present in `other`.
+        """
+        if len(other) == 0:
+            return np.zeros(len(self), dtype=bool)
+        positions = np.searchsorted(other.values, self.values)
+        positions[positions == len(other)] = 0
+        return other.values[positions] == self.values
+
+    def __contains__(self, value) -> bool:
+        if not isinstance(value, (int, np.integer)):
+            return False
+        position = np.searchsorted(self.values, value)
+        return bool(position < len(self) and self.values[position] == value)
+
+    def __iter__(self) -> t.Iterator[int]:
+        return iter(self.values.tolist())
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __eq__(self, obj) -> bool:
+        if isinstance(obj, SortedArraySet):
+            return np.array_equal(self.values, obj.values)
+        return super().__eq__(obj)
+
+    def __or__(self, obj) -> "SortedArraySet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        other = self._coerce(obj)
+        values = np.concatenate((
+            self.values,
+            other.values[~other._membership_mask(self)],
+        ))
+        # Both parts are sorted runs, so stable sort just merges them.
+        values.sort(kind="stable")
+        return SortedArraySet(values=values)
+
+    __ror__ = __or__
+
+    def __and__(self, obj) -> "SortedArraySet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        other = self._coerce(obj)
+        if len(other) < len(self):
+            return SortedArraySet(values=other.values[other._membership_mask(self)])
+        return SortedArraySet(values=self.values[self._membership_mask(other)])
+
+    __rand__ = __and__
+
+    def __sub__(self, obj) -> "SortedArraySet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        other = self._coerce(obj)
+        return SortedArraySet(values=self.values[~self._membership_mask(other)])
+
+    def __rsub__(self, obj) -> "SortedArraySet":
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return self._coerce(obj) - self
+
+    def _position(self, bound: int) -> int:
+        """
+            :return: count of values less than `bound`.
+        """
+        if bound < _INT64_MIN:
+            return 0
+        if bound > _INT64_MAX:
+            return len(self)
+        return int(np.searchsorted(self.values, bound))
+
+    def restricted(self, restriction: Restriction) -> "SortedArraySet":
+        """
+            :return: view over values of restriction, values are never copied.
+        """
+        start = 0 if restriction.lower is None else self._position(restriction.lower)
+        end = len(self) if restriction.upper is None else max(start, self._position(restriction.upper))
+        if restriction.limit is not None:
+            end = min(end, start + restriction.limit)
+        return SortedArraySet(values=self.values[start:end])
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.values.tolist()!r})"
+
+
+class NumpySetEngine(SetEngine):
+    """
+        Engine which represents sets as `SortedArraySet` objects.
+        Text files are parsed in bulk, block by block of `chunk_size` bytes,
+        without creating python `int` per line.
+        RAW encoded binary set files are memory mapped without copying.
+    """
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        _require_numpy()
+        self._chunk_size = chunk_size
+
+    def load(self, file_name: str) -> SortedArraySet:
+        if is_binary_set_file(file_name):
+            return self._load_binary(file_name)
+
+        blocks = [
+            self._parse_block(file_name, lines, line_number)
+            for _, line_number, lines in iter_indexed_line_blocks_or_raise(file_name, self._chunk_size)
+        ]
+        if not blocks:
+            return SortedArraySet(values=np.array([], dtype=np.int64))
+        return SortedArraySet(values=np.unique(np.concatenate(blocks)))
+
+    @staticmethod
+    def _parse_block(file_name: str, lines: t.List[bytes], first_line_number: int) -> "np.ndarray":
+        try:
+            try:
+                return np.array(lines, dtype=bytes).astype(np.int64)
+            except ValueError:
+                # Re-parse line by line to report the offending line,
+                # or to parse integers which are valid only in decoded form.
+                decoded_lines = (line.decode(errors="replace") for line in lines)
+                return np.array(
+                    list(parse_int_lines_or_raise(file_name, decoded_lines, first_line_number)),
+                    dtype=np.int64,
+                )
+        except OverflowError:
+            raise RuntimeException(
+                reason=f"Integer out of int64 range in file: '{file_name}'.",
+            )
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        return iter(self.load(file_name))
+
+    def _load_binary(self, file_name: str) -> SortedArraySet:
+        set_file = BinarySetFile(file_name)
+        if set_file.encoding == Encoding.RAW:
+            # Array keeps the mapping alive, values are never copied.
+            values = np.frombuffer(
+                set_file.buffer,
+                dtype="<i8",
+                count=len(set_file),
+                offset=HEADER_SIZE,
+            )
+            return SortedArraySet(values=values)
+
+        with set_file:
+            values = np.fromiter(set_file, dtype=np.int64, count=len(set_file))
+        return SortedArraySet(values=values)
+
+
+__all__ = (
+    SortedArraySet.__name__,
+    NumpySetEngine.__name__,
+)
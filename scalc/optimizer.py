@@ -0,0 +1,144 @@
+import os
+import typing as t
+
+from scalc.expressions import (
+    Expression,
+    LoadFromFileExpression,
+    FunctionCallExpression,
+    RestrictExpression,
+    iter_post_order,
+)
+from scalc.functions import SetCalcFunc, SumFunc, IntFunc, DifFunc
+
+
+def estimate_file_size(file_name: str) -> int:
+    try:
+        return os.path.getsize(file_name)
+    except OSError:
+        # Missing file is evaluated first, so the error is raised as early as possible.
+        return 0
+
+
+def _unique(expressions: t.Iterable[Expression]) -> t.List[Expression]:
+    return list(dict.fromkeys(expressions))
+
+
+class Optimizer:
+    """
+        Rewrites compiled expression into equivalent but cheaper one:
+            - nested SUM/INT calls are flattened into single n-ary call,
+              SUM calls in subtrahends of DIF are flattened into DIF arguments;
+            - repeated arguments of SUM/INT and repeated subtrahends of DIF are removed;
+            - single argument SUM/INT calls are replaced with the argument;
+            - INT arguments are ordered by estimated size, smallest first;
+            - INT and DIF calls are short-circuited as soon as result is empty.
+    """
+
+    def __init__(
+        self,
+        size_estimator: t.Callable[[str], int] = estimate_file_size,
+    ):
+        """
+            :param size_estimator: returns estimated size of set stored in file.
+        """
+        self._size_estimator = size_estimator
+
+    def optimize(self, root_expression: Expression) -> Expression:
+        optimized = {}
+        estimated_sizes = {}
+        shared_expressions = {}
+
+        for expression in iter_post_order(root_expression):
+            if isinstance(expression, FunctionCallExpression):
+                optimized_expression = self._optimize_func_call(
+                    func=expression.func,
+                    func_args=[optimized[id(arg)] for arg in expression.func_args],
+                    estimated_sizes=estimated_sizes,
+                )
+            elif isinstance(expression, RestrictExpression):
+                optimized_expression = RestrictExpression(
+                    restriction=expression.restriction,
+                    arg=optimized[id(expression.arg)],
+                )
+            else:
+                optimized_expression = expression
+
+            optimized_expression = shared_expressions.setdefault(
+                optimized_expression,
+                optimized_expression,
+            )
+            if optimized_expression not in estimated_sizes:
+                estimated_sizes[optimized_expression] = self._estimate_size(
+                    expression=optimized_expression,
+                    estimated_sizes=estimated_sizes,
+                )
+            optimized[id(expression)] = optimized_expression
+
+        return optimized[id(root_expression)]
+
+    def _estimate_size(
+        self,
+        expression: Expression,
+        estimated_sizes: t.Mapping[Expression, int],
+    ) -> int:
+        if isinstance(expression, LoadFromFileExpression):
+            return self._size_estimator(expression.file_name)
+        if isinstance(expression, RestrictExpression):
+            return estimated_sizes[expression.arg]
+        if not isinstance(expression, FunctionCallExpression):
+            return 0
+
+        args_sizes = [estimated_sizes[arg] for arg in expression.func_args]
+        if isinstance(expression.func, SumFunc):
+            return sum(args_sizes)
+        if isinstance(expression.func, IntFunc):
+            return min(args_sizes)
+        return args_sizes[0]
+
+    def _optimize_func_call(
+        self,
+        func: SetCalcFunc,
+        func_args: t.Sequence[Expression],
+        estimated_sizes: t.Mapping[Expression, int],
+    ) -> Expression:
+        if isinstance(func, (SumFunc, IntFunc)):
+            func_args = _unique(self._flatten(func_args, type(func)))
+            if isinstance(func, IntFunc):
+                func_args.sort(key=lambda arg: estimated_sizes[arg])
+            if len(func_args) == 1:
+                return func_args[0]
+            return FunctionCallExpression(func=func, func_args=func_args, short_circuit=True)
+
+        if isinstance(func, DifFunc):
+            subtrahends = _unique(self._flatten(func_args[1:], SumFunc))
+            if not subtrahends:
+                return func_args[0]
+            return FunctionCallExpression(
+                func=func,
+                func_args=(func_args[0], *subtrahends),
+                short_circuit=True,
+            )
+
+        return FunctionCallExpression(func=func, func_args=func_args)
+
+    def _flatten(
+        self,
+        func_args: t.Sequence[Expression],
+        func_type: t.Type[SetCalcFunc],
+    ) -> t.List[Expression]:
+        """
+            Replaces calls of `func_type` functions with their arguments.
+        """
+        flattened_args = []
+        for arg in func_args:
+            if isinstance(arg, FunctionCallExpression) and isinstance(arg.func, func_type):
+                flattened_args.extend(arg.func_args)
+            else:
+                flattened_args.append(arg)
+        return flattened_args
+
+
+__all__ = (
+    Optimizer.__name__,
+    estimate_file_size.__name__,
+)
@@ -0,0 +1,92 @@
+"""
+    Output stage: writes evaluation result as text lines or binary set file.
+"""
+import itertools
+import typing as t
+
+from scalc.binary import FILE_EXTENSION, write_binary_set
+from scalc.executor import Executor
+from scalc.parsing import open_or_raise
+
+
+# Count of values formatted into one buffer.
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def iter_result(executor: Executor, sort: bool = True) -> t.Iterator[int]:
+    """
+        :param sort: if not set, values are produced in any order,
+            so result set is not sorted.
+        :return: iterator over result values.
+    """
+    if sort or executor.engine.streaming:
+        return executor.execute_sorted()
+    return iter(executor.execute())
+
+
+def count_result(executor: Executor) -> int:
+    """
+        :return: count of result values, values are never formatted.
+    """
+    if executor.engine.streaming:
+        return sum(1 for _ in executor.execute_sorted())
+    return len(executor.execute())
+
+
+def write_text(
+    values: t.Iterable[int],
+    output: t.BinaryIO,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> int:
+    """
+        Writes values one per line, formatted in large buffers.
+        If `values` raises, values produced before the error are still written.
+        :return: count of written values.
+    """
+    count = 0
+    values = iter(values)
+    while True:
+        chunk = []
+        try:
+            chunk.extend(itertools.islice(values, chunk_size))
+        finally:
+            if chunk:
+                output.write("\n".join(map(str, chunk)).encode())
+                output.write(b"\n")
+                count += len(chunk)
+        if len(chunk) < chunk_size:
+            return count
+
+
+def is_binary_output(file_name: str) -> bool:
+    return file_name.endswith(FILE_EXTENSION)
+
+
+def write_result(
+    executor: Executor,
+    output: t.BinaryIO,
+    output_file: t.Optional[str] = None,
+    sort: bool = True,
+) -> int:
+    """
+        Writes result to `output_file` if given, or to `output` otherwise.
+        Result is written as binary set file if `output_file` has `.sset` extension.
+        :return: count of written values.
+    """
+    if output_file is None:
+        return write_text(iter_result(executor, sort=sort), output)
+
+    if is_binary_output(output_file):
+        return write_binary_set(output_file, iter_result(executor, sort=True))
+
+    with open_or_raise(output_file, "wb") as f:
+        return write_text(iter_result(executor, sort=sort), f)
+
+
+__all__ = (
+    iter_result.__name__,
+    count_result.__name__,
+    write_text.__name__,
+    write_result.__name__,
+    is_binary_output.__name__,
+)
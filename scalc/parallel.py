@@ -0,0 +1,349 @@
+import collections
+import concurrent.futures
+import functools
+import os
+import typing as t
+
+from scalc.engines import SetEngine
+from scalc.executor import Executor
+from scalc.expressions import (
+    Expression,
+    LoadFromFileExpression,
+    FunctionCallExpression,
+    iter_post_order,
+)
+from scalc.functions import SetCalcFunc
+from scalc.plans import serialize_plan, deserialize_plan
+
+
+def _evaluate_leaf(expression: Expression, engine: SetEngine) -> t.AbstractSet[int]:
+    return expression.evaluate_node(engine, ())
+
+
+def _evaluate_in_worker(
+    plan: t.Union[t.Mapping[str, t.Any], Expression],
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+    engine: SetEngine,
+) -> t.Tuple[t.AbstractSet[int], t.Mapping[str, int]]:
+    """
+        Evaluates subtree with copy of engine in worker process.
+        :param plan: serialized subtree (see `serialize_plan`), so deep subtrees are not pickled
+            recursively, or subtree itself if it can not be serialized.
+        :return: result and counters of engine collected while subtree was evaluated.
+    """
+    root_expression = (
+        deserialize_plan(plan, functions_mapping)
+        if isinstance(plan, dict)
+        else plan
+    )
+    stats_before = engine.stats()
+    result = Executor(
+        root_expression=root_expression,
+        functions_mapping=functions_mapping,
+        engine=engine,
+    ).execute()
+    return result, {
+        name: value - stats_before.get(name, 0)
+        for name, value in engine.stats().items()
+    }
+
+
+def _call_func(func: SetCalcFunc, args: t.Sequence[t.AbstractSet[int]]) -> t.AbstractSet[int]:
+    return func.call(args=args)
+
+
+def _split(items: t.Sequence[Expression], count: int) -> t.List[t.Sequence[Expression]]:
+    """
+        :return: at most `count` contiguous groups of items of (almost) equal sizes.
+    """
+    count = min(count, len(items))
+    return [
+        items[idx * len(items) // count:(idx + 1) * len(items) // count]
+        for idx in range(count)
+    ]
+
+
+class _NodeState:
+
+    def __init__(self, expression: Expression):
+        self.expression = expression
+        self.remaining_args_count = len(expression.children)
+        self.args = [None] * len(expression.children)
+        self.partial_results = []
+        self.merges_in_flight_count = 0
+        self.is_done = False
+
+    @property
+    def is_tree_reducible(self) -> bool:
+        return (
+            isinstance(self.expression, FunctionCallExpression)
+            and self.expression.func.associative
+        )
+
+
+class _ParallelEvaluation:
+    """
+        Event loop of single `ParallelExecutor.execute` call.
+        Every node is scheduled as soon as all its children are evaluated,
+        arguments of associative functions are reduced pairwise as they arrive.
+
+        If `worker_pool` is set, loads and subtrees of expression are evaluated by copies of
+        engine in worker processes: arguments of SUM/INT which are not shared with other nodes
+        are split into groups, one per worker, and every group is reduced by worker as a whole,
+        so only results of groups are sent back. Other nodes are evaluated in thread pool.
+    """
+
+    def __init__(
+        self,
+        root_expression: Expression,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        engine: SetEngine,
+        thread_pool: concurrent.futures.Executor,
+        jobs: int,
+        worker_pool: t.Optional[concurrent.futures.Executor] = None,
+        worker_stats: t.Optional[t.Counter[str]] = None,
+    ):
+        """
+            :param worker_stats: engine counters of worker processes are added to it.
+        """
+        self._root_expression = root_expression
+        self._functions_mapping = functions_mapping
+        self._engine = engine
+        self._thread_pool = thread_pool
+        self._jobs = jobs
+        self._worker_pool = worker_pool
+        self._worker_stats = worker_stats if worker_stats is not None else collections.Counter()
+        self._states = {}
+        self._parents = collections.defaultdict(list)
+        # Future -> function which accepts its result.
+        self._futures = {}
+        self._result = None
+
+    def run(self) -> t.AbstractSet[int]:
+        consumers_counts = collections.Counter()
+        for expression in iter_post_order(self._root_expression):
+            self._states[id(expression)] = _NodeState(expression=expression)
+            for arg_idx, child in enumerate(expression.children):
+                self._parents[id(child)].append((expression, arg_idx))
+                consumers_counts[id(child)] += 1
+        self._schedule(consumers_counts)
+
+        try:
+            while not self._states[id(self._root_expression)].is_done:
+                done_futures, _ = concurrent.futures.wait(
+                    self._futures,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done_futures:
+                    accept = self._futures.pop(future)
+                    accept(future.result())
+        finally:
+            for future in self._futures:
+                future.cancel()
+
+        return self._result
+
+    def _schedule(self, consumers_counts: t.Mapping[int, int]):
+        """
+            Submits leaves of evaluation: loads, and groups of arguments evaluated by workers.
+        """
+        is_private = {}
+        for expression in iter_post_order(self._root_expression):
+            is_private[id(expression)] = all(
+                consumers_counts[id(child)] == 1 and is_private[id(child)]
+                for child in expression.children
+            )
+
+        visited_ids = set()
+        stack = [self._root_expression]
+        while stack:
+            expression = stack.pop()
+            if id(expression) in visited_ids:
+                continue
+            visited_ids.add(id(expression))
+            state = self._states[id(expression)]
+
+            if not expression.children:
+                self._submit_leaf(expression)
+            elif (
+                self._worker_pool is not None
+                and state.is_tree_reducible
+                and len(expression.children) > 1
+                and is_private[id(expression)]
+            ):
+                groups = _split(expression.children, self._jobs)
+                state.remaining_args_count = len(groups)
+                for group in groups:
+                    self._submit_group(state, group)
+            else:
+                stack.extend(expression.children)
+
+    def _submit_leaf(self, expression: Expression):
+        if self._worker_pool is None or not isinstance(expression, LoadFromFileExpression):
+            future = self._thread_pool.submit(_evaluate_leaf, expression, self._engine)
+            self._futures[future] = functools.partial(self._complete, expression)
+            return
+        self._submit_to_worker(expression, functools.partial(self._complete, expression))
+
+    def _submit_group(self, state: _NodeState, group: t.Sequence[Expression]):
+        expression = state.expression
+        if len(group) > 1:
+            group_expression = FunctionCallExpression(
+                func=expression.func,
+                func_args=group,
+                short_circuit=expression.short_circuit,
+            )
+        else:
+            group_expression = group[0]
+        self._submit_to_worker(group_expression, functools.partial(self._deliver, expression, 0))
+
+    def _submit_to_worker(self, expression: Expression, accept: t.Callable[[t.AbstractSet[int]], None]):
+        plan = serialize_plan(expression, self._functions_mapping)
+        future = self._worker_pool.submit(
+            _evaluate_in_worker,
+            plan if plan is not None else expression,
+            self._functions_mapping,
+            self._engine,
+        )
+
+        def accept_with_stats(result_with_stats):
+            result, stats = result_with_stats
+            self._worker_stats.update(stats)
+            accept(result)
+
+        self._futures[future] = accept_with_stats
+
+    def _complete(self, expression: Expression, result: t.AbstractSet[int]):
+        state = self._states[id(expression)]
+        if state.is_done:
+            return
+        state.is_done = True
+        state.args = state.partial_results = None
+
+        if expression is self._root_expression:
+            self._result = result
+        for parent, arg_idx in self._parents.pop(id(expression), ()):
+            self._deliver(parent, arg_idx, result)
+
+    def _deliver(self, expression: Expression, arg_idx: int, result: t.AbstractSet[int]):
+        state = self._states[id(expression)]
+        if state.is_done:
+            return
+        state.remaining_args_count -= 1
+
+        if expression.short_circuit and len(result) == 0:
+            # Empty intersection with anything is empty,
+            # empty minuend of difference gives empty difference.
+            if state.is_tree_reducible or arg_idx == 0:
+                self._complete(expression, result)
+                return
+
+        if state.is_tree_reducible:
+            self._add_partial_result(state, result)
+            return
+
+        state.args[arg_idx] = result
+        if state.remaining_args_count == 0:
+            future = self._thread_pool.submit(
+                expression.evaluate_node,
+                self._engine,
+                state.args,
+            )
+            self._futures[future] = functools.partial(self._complete, expression)
+
+    def _merge(self, state: _NodeState, result: t.AbstractSet[int]):
+        state.merges_in_flight_count -= 1
+        self._add_partial_result(state, result)
+
+    def _add_partial_result(self, state: _NodeState, result: t.AbstractSet[int]):
+        if state.is_done:
+            return
+        state.partial_results.append(result)
+        while len(state.partial_results) >= 2:
+            args = (state.partial_results.pop(), state.partial_results.pop())
+            future = self._thread_pool.submit(_call_func, state.expression.func, args)
+            self._futures[future] = functools.partial(self._merge, state)
+            state.merges_in_flight_count += 1
+
+        if state.remaining_args_count == 0 and state.merges_in_flight_count == 0:
+            self._complete(state.expression, state.partial_results[0])
+
+
+class ParallelExecutor(Executor):
+    """
+        Evaluates independent subexpressions concurrently.
+        Files are loaded (and parsed) in process pool. Arguments of SUM/INT which are
+        not shared with other nodes are reduced in process pool too, in groups (one per worker),
+        so only results of groups are sent back. Remaining set operations are evaluated
+        in thread pool. Arguments of associative functions (SUM, INT) are reduced pairwise
+        as a tree instead of a left fold.
+        Result is identical to `Executor` result.
+        Engine counters of worker processes are collected by `stats`.
+    """
+
+    def __init__(
+        self,
+        root_expression: Expression,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        engine: t.Optional[SetEngine] = None,
+        jobs: t.Optional[int] = None,
+        use_processes: bool = True,
+    ):
+        """
+            :param jobs: count of workers, count of CPUs by default.
+            :param use_processes: if not set, files are loaded and set operations are evaluated in thread pool.
+                Useful for engines which release GIL while parsing, or for slow storages.
+        """
+        super().__init__(
+            root_expression=root_expression,
+            functions_mapping=functions_mapping,
+            engine=engine,
+        )
+        self._jobs = jobs if jobs is not None else os.cpu_count() or 1
+        self._use_processes = use_processes
+        self._worker_stats = collections.Counter()
+
+    @property
+    def jobs(self) -> int:
+        return self._jobs
+
+    @property
+    def use_processes(self) -> bool:
+        return self._use_processes
+
+    def stats(self) -> t.Mapping[str, int]:
+        """
+            :return: engine counters collected in worker processes, they are not included
+                into `stats` of engine.
+        """
+        return dict(self._worker_stats)
+
+    def execute(self) -> t.AbstractSet[int]:
+        if self.jobs <= 1:
+            return super().execute()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as thread_pool:
+            if not self.use_processes:
+                return _ParallelEvaluation(
+                    root_expression=self.root_expression,
+                    functions_mapping=self.functions_mapping,
+                    engine=self.engine,
+                    thread_pool=thread_pool,
+                    jobs=self.jobs,
+                ).run()
+
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs) as worker_pool:
+                return _ParallelEvaluation(
+                    root_expression=self.root_expression,
+                    functions_mapping=self.functions_mapping,
+                    engine=self.engine,
+                    thread_pool=thread_pool,
+                    jobs=self.jobs,
+                    worker_pool=worker_pool,
+                    worker_stats=self._worker_stats,
+                ).run()
+
+
+__all__ = (
+    ParallelExecutor.__name__,
+)
@@ -0,0 +1,231 @@
+import bz2
+import gzip
+import lzma
+import os
+import typing as t
+import zlib
+
+from scalc.exceptions import RuntimeException
+
+
+# Size of block read from text file at once.
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Magic bytes of compressed text files and functions which open them for decompression.
+_COMPRESSED_FILE_OPENERS = (
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+)
+_COMPRESSION_MAGIC_SIZE = max(len(magic) for magic, _ in _COMPRESSED_FILE_OPENERS)
+# Errors raised by decompressors on corrupted or truncated data.
+_DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError)
+
+
+def parse_int_lines_or_raise(
+    file_name: str,
+    lines: t.Iterable[str],
+    first_line_number: int = 0,
+) -> t.Iterator[int]:
+    for line_number, line in enumerate(lines, start=first_line_number):
+        try:
+            yield int(line)
+        except ValueError:
+            raise RuntimeException(
+                reason=(
+                    f"Invalid integer: '{line.rstrip()}'"
+                    f" in file: '{file_name}' at line: {line_number}."
+                ),
+            )
+
+
+def _parse_int_block_or_raise(
+    file_name: str,
+    lines: t.List[bytes],
+    first_line_number: int,
+) -> t.List[int]:
+    try:
+        return list(map(int, lines))
+    except ValueError:
+        # Re-parse line by line to report the offending line,
+        # or to parse integers which are valid only in decoded form.
+        decoded_lines = (line.decode(errors="replace") for line in lines)
+        return list(parse_int_lines_or_raise(file_name, decoded_lines, first_line_number))
+
+
+def parse_int_bytes_or_raise(
+    file_name: str,
+    data: bytes,
+    first_line_number: int = 0,
+) -> t.List[int]:
+    """
+        :param data: complete lines of text file, each terminated with a line separator.
+        :return: integers of `data`, in file order.
+    """
+    if not data:
+        return []
+    return _parse_int_block_or_raise(file_name, data[:-1].split(b"\n"), first_line_number)
+
+
+def _compressed_file_opener(file_name: str) -> t.Optional[t.Callable[[t.BinaryIO], t.BinaryIO]]:
+    try:
+        with open(file_name, "rb") as f:
+            magic = f.read(_COMPRESSION_MAGIC_SIZE)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    for compression_magic, opener in _COMPRESSED_FILE_OPENERS:
+        if magic.startswith(compression_magic):
+            return opener
+    return None
+
+
+def is_compressed_file(file_name: str) -> bool:
+    """
+        :return: whether file is compressed with gzip, bz2 or xz.
+    """
+    return _compressed_file_opener(file_name) is not None
+
+
+def iter_text_chunks_or_raise(
+    file_name: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    offset: int = 0,
+) -> t.Iterator[bytes]:
+    """
+        Reads text file in binary chunks. Files compressed with gzip, bz2 or xz
+        are recognized by magic bytes and decompressed on the fly.
+        :param offset: offset of the first chunk, in decompressed data of compressed files.
+    """
+    opener = _compressed_file_opener(file_name)
+    with open_or_raise(file_name, "rb") as f:
+        if opener is None:
+            f.seek(offset)
+            yield from iter(lambda: f.read(chunk_size), b"")
+            return
+        try:
+            with opener(f) as decompressed_file:
+                # Compressed files are decompressed up to offset, but not parsed.
+                decompressed_file.seek(offset)
+                yield from iter(lambda: decompressed_file.read(chunk_size), b"")
+        except _DECOMPRESSION_ERRORS:
+            raise RuntimeException(
+                reason=f"File '{file_name}' is corrupted and can not be decompressed.",
+            )
+
+
+def iter_indexed_line_blocks_or_raise(
+    file_name: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    offset: int = 0,
+    first_line_number: int = 0,
+) -> t.Iterator[t.Tuple[int, int, t.List[bytes]]]:
+    """
+        Reads text file in large binary chunks and splits every chunk into complete lines.
+        :param offset: offset of the first line to read, see `iter_text_chunks_or_raise`.
+        :param first_line_number: number of the first line to read.
+        :return: iterator over (offset, number of the first line, lines without line separators)
+            of blocks of lines, in file order.
+    """
+    line_number = first_line_number
+    remainder = b""
+    for chunk in iter_text_chunks_or_raise(file_name, chunk_size, offset):
+        if remainder:
+            chunk = remainder + chunk
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            remainder = chunk
+            continue
+        remainder = chunk[end:]
+
+        lines = chunk[:end - 1].split(b"\n")
+        yield offset, line_number, lines
+        offset += end
+        line_number += len(lines)
+
+    if remainder:
+        yield offset, line_number, [remainder]
+
+
+def iter_indexed_int_blocks_or_raise(
+    file_name: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    offset: int = 0,
+    first_line_number: int = 0,
+) -> t.Iterator[t.Tuple[int, int, t.List[int]]]:
+    """
+        Reads text file with one integer per line in large binary chunks
+        and parses every chunk at once.
+        :return: iterator over (offset, number of the first line, integers) of blocks of lines,
+            in file order, see `iter_indexed_line_blocks_or_raise`.
+    """
+    for offset, line_number, lines in iter_indexed_line_blocks_or_raise(
+        file_name,
+        chunk_size,
+        offset,
+        first_line_number,
+    ):
+        yield offset, line_number, _parse_int_block_or_raise(file_name, lines, line_number)
+
+
+def iter_int_blocks_or_raise(
+    file_name: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    offset: int = 0,
+    first_line_number: int = 0,
+) -> t.Iterator[t.List[int]]:
+    """
+        :return: iterator over lists of integers, in file order,
+            see `iter_indexed_int_blocks_or_raise`.
+    """
+    for _, _, block in iter_indexed_int_blocks_or_raise(
+        file_name,
+        chunk_size,
+        offset,
+        first_line_number,
+    ):
+        yield block
+
+
+def parse_int_file_or_raise(
+    file_name: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> t.Iterator[int]:
+    """
+        :return: iterator over integers of text file, in file order.
+    """
+    for block in iter_int_blocks_or_raise(file_name, chunk_size):
+        yield from block
+
+
+def file_identity(file_name: str) -> t.Optional[t.Tuple[int, int, int]]:
+    """
+        :return: inode, size and modification time of file, None if file can not be accessed.
+    """
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def open_or_raise(file_name: str, mode: str = "r") -> t.IO:
+    try:
+        return open(file_name, mode)
+    except FileNotFoundError:
+        raise RuntimeException(
+            reason=f"File '{file_name}' not found.",
+        )
+
+
+__all__ = (
+    open_or_raise.__name__,
+    file_identity.__name__,
+    parse_int_bytes_or_raise.__name__,
+    parse_int_lines_or_raise.__name__,
+    is_compressed_file.__name__,
+    iter_text_chunks_or_raise.__name__,
+    iter_indexed_line_blocks_or_raise.__name__,
+    iter_indexed_int_blocks_or_raise.__name__,
+    iter_int_blocks_or_raise.__name__,
+    parse_int_file_or_raise.__name__,
+)
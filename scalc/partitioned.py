@@ -0,0 +1,506 @@
+"""
+    Data-parallel evaluation over partitions of integer domain.
+
+    SUM, INT and DIF distribute over any partition of integers, so expression
+    can be evaluated on every partition of its input files independently
+    and its result is a union of disjoint results of partitions.
+
+    Evaluation has two phases, both are run in process pool:
+        - every input file is split into byte ranges, values of every range
+          are parsed and distributed into partitions by value range or by hash;
+        - values of every partition are written as binary set files
+          and the whole expression is evaluated on them.
+    With range partitioning results of partitions are concatenated in order,
+    so sorted result is produced without sorting.
+"""
+import array
+import bisect
+import concurrent.futures
+import contextlib
+import enum
+import heapq
+import itertools
+import math
+import os
+import tempfile
+import typing as t
+
+from scalc.binary import BinarySetFile, Encoding, is_binary_set_file, write_binary_set
+from scalc.engines import SetEngine, EngineWrapper
+from scalc.exceptions import RuntimeException
+from scalc.executor import Executor
+from scalc.expressions import Expression, LoadFromFileExpression, has_limit, iter_post_order
+from scalc.functions import SetCalcFunc
+from scalc.parsing import (
+    DEFAULT_CHUNK_SIZE,
+    file_identity,
+    is_compressed_file,
+    iter_int_blocks_or_raise,
+    iter_text_chunks_or_raise,
+    open_or_raise,
+    parse_int_bytes_or_raise,
+)
+from scalc.restrictions import Restriction
+from scalc.sketch import hash_value
+
+
+# Min size of byte range of text file parsed by single task.
+DEFAULT_SPLIT_SIZE = 4 * 1024 * 1024
+
+# Range boundaries are chosen from values of blocks read at evenly spaced offsets of files.
+_SAMPLE_BLOCKS_COUNT = 32
+_SAMPLE_BLOCK_SIZE = 16 * 1024
+
+# Up to this count of range partitions values are filtered by every range, otherwise sorted.
+_MAX_FILTERED_PARTITIONS_COUNT = 8
+
+# Intermediate partition values are stored as native int64 arrays.
+_ARRAY_TYPECODE = "q"
+
+
+class PartitionStrategy(enum.Enum):
+    RANGE = "range"
+    HASH = "hash"
+
+
+class Partitioner:
+    """
+        Maps integers to partitions, by value range if `boundaries` are given or by hash otherwise.
+    """
+
+    def __init__(self, partitions_count: int, boundaries: t.Optional[t.Sequence[int]] = None):
+        """
+            :param boundaries: ascending first values of partitions except the first one.
+        """
+        if boundaries is not None and len(boundaries) != partitions_count - 1:
+            raise RuntimeException(
+                reason=(
+                    f"Expected {partitions_count - 1} partition boundaries,"
+                    f" got: {len(boundaries)}."
+                ),
+            )
+        self._partitions_count = partitions_count
+        self._boundaries = list(boundaries) if boundaries is not None else None
+
+    @property
+    def partitions_count(self) -> int:
+        return self._partitions_count
+
+    @property
+    def boundaries(self) -> t.Optional[t.Sequence[int]]:
+        return self._boundaries
+
+    @property
+    def is_ordered(self) -> bool:
+        """
+            :return: whether all values of every partition are less than values of next ones.
+        """
+        return self.boundaries is not None
+
+    def partition_of(self, value: int) -> int:
+        if self.boundaries is not None:
+            return bisect.bisect_right(self.boundaries, value)
+        return hash_value(value) % self.partitions_count
+
+    def split(self, values: t.Iterable[int]) -> t.List[t.List[int]]:
+        """
+            :return: values of every partition, in any order.
+        """
+        if self.boundaries is not None and self.partitions_count > _MAX_FILTERED_PARTITIONS_COUNT:
+            # Sorting and slicing is faster than looking up partition of every value.
+            values = sorted(values)
+            bounds = [
+                0,
+                *(bisect.bisect_left(values, boundary) for boundary in self.boundaries),
+                len(values),
+            ]
+            return [values[start:end] for start, end in zip(bounds, bounds[1:])]
+        if self.boundaries:
+            # Filtering by every range is faster than looking up partition of every value.
+            values = values if isinstance(values, list) else list(values)
+            first, last = self.boundaries[0], self.boundaries[-1]
+            return [
+                [value for value in values if value < first],
+                *(
+                    [value for value in values if lower <= value < upper]
+                    for lower, upper in zip(self.boundaries, self.boundaries[1:])
+                ),
+                [value for value in values if value >= last],
+            ]
+
+        partitions = [[] for _ in range(self.partitions_count)]
+        if self.partitions_count == 1:
+            partitions[0].extend(values)
+            return partitions
+
+        appenders = [partition.append for partition in partitions]
+        partitions_count = self.partitions_count
+        for value in values:
+            appenders[hash_value(value) % partitions_count](value)
+        return partitions
+
+
+class PartitionEngine(EngineWrapper):
+    """
+        Engine which reads partition files instead of input files.
+    """
+
+    def __init__(self, engine: SetEngine, partition_file_names: t.Mapping[str, str]):
+        """
+            :param partition_file_names: binary set file of partition of every input file.
+        """
+        super().__init__(engine=engine)
+        self._partition_file_names = dict(partition_file_names)
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        return self.engine.load(self._partition_file_names[file_name])
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        return self.engine.iterate(self._partition_file_names[file_name])
+
+    def load_restricted(self, file_name: str, restriction: Restriction) -> t.AbstractSet[int]:
+        return self.engine.load_restricted(self._partition_file_names[file_name], restriction)
+
+    def iterate_restricted(self, file_name: str, restriction: Restriction) -> t.Iterator[int]:
+        return self.engine.iterate_restricted(self._partition_file_names[file_name], restriction)
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        self.engine.prefetch([self._partition_file_names[file_name] for file_name in file_names])
+
+
+def _iter_text_split_blocks(
+    file_name: str,
+    start: int,
+    end: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> t.Iterator[t.List[int]]:
+    """
+        :return: iterator over integers of lines which start in [`start`, `end`) byte range.
+    """
+    with open_or_raise(file_name, "rb") as f:
+        if start > 0:
+            # Line which starts before `start` belongs to previous split.
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        remainder = b""
+        while position < end:
+            chunk = f.read(min(chunk_size, end - position))
+            if not chunk:
+                break
+            position += len(chunk)
+            data = remainder + chunk
+            line_end = data.rfind(b"\n") + 1
+            remainder = data[line_end:]
+            yield parse_int_bytes_or_raise(file_name, data[:line_end])
+
+        if remainder:
+            # Last line which starts before `end` belongs to this split.
+            remainder += f.readline()
+            if not remainder.endswith(b"\n"):
+                remainder += b"\n"
+            yield parse_int_bytes_or_raise(file_name, remainder)
+
+
+def _split_input(
+    file_name: str,
+    start: int,
+    end: int,
+    partitioner: Partitioner,
+    output_prefix: str,
+    check_order: bool = False,
+) -> t.Optional[t.Tuple[int, int]]:
+    """
+        Writes values of byte range of input file into one file per partition.
+        :param check_order: raise error if values of byte range are not in ascending order.
+        :return: first and last values of byte range, None if it is empty.
+    """
+    if is_binary_set_file(file_name):
+        with BinarySetFile(file_name) as set_file:
+            blocks = [list(set_file)]
+    elif is_compressed_file(file_name):
+        blocks = iter_int_blocks_or_raise(file_name)
+    else:
+        blocks = _iter_text_split_blocks(file_name, start, end)
+
+    bounds = None
+    partitions = [array.array(_ARRAY_TYPECODE) for _ in range(partitioner.partitions_count)]
+    for block in blocks:
+        if not block:
+            continue
+        if check_order and (
+            (bounds is not None and block[0] < bounds[1])
+            or any(value < previous for previous, value in zip(block, itertools.islice(block, 1, None)))
+        ):
+            raise RuntimeException(reason=f"File '{file_name}' is not sorted.")
+        bounds = (block[0] if bounds is None else bounds[0], block[-1])
+        for partition, values in zip(partitions, partitioner.split(block)):
+            try:
+                partition.extend(values)
+            except OverflowError:
+                raise RuntimeException(
+                    reason=f"File '{file_name}' contains value which does not fit into int64.",
+                )
+
+    for partition_idx, partition in enumerate(partitions):
+        with open(f"{output_prefix}.{partition_idx}", "wb") as f:
+            partition.tofile(f)
+    return bounds
+
+
+def _evaluate_partition(
+    root_expression: Expression,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+    engine: SetEngine,
+    split_prefixes: t.Mapping[str, t.Sequence[str]],
+    partition_idx: int,
+    partition_dir: str,
+) -> t.List[int]:
+    """
+        :return: sorted result values of partition.
+    """
+    partition_file_names = {}
+    for file_idx, (file_name, prefixes) in enumerate(split_prefixes.items()):
+        values = array.array(_ARRAY_TYPECODE)
+        for prefix in prefixes:
+            with open(f"{prefix}.{partition_idx}", "rb") as f:
+                values.frombytes(f.read())
+        partition_file_name = os.path.join(partition_dir, f"{file_idx}.{partition_idx}.sset")
+        write_binary_set(partition_file_name, sorted(set(values)), encoding=Encoding.RAW)
+        partition_file_names[file_name] = partition_file_name
+
+    executor = Executor(
+        root_expression=root_expression,
+        functions_mapping=functions_mapping,
+        engine=PartitionEngine(engine=engine, partition_file_names=partition_file_names),
+    )
+    return list(executor.execute_sorted())
+
+
+def _sample_values(file_name: str) -> t.List[int]:
+    """
+        :return: values of a few blocks of file, at evenly spaced offsets.
+    """
+    if is_binary_set_file(file_name):
+        with BinarySetFile(file_name) as set_file:
+            if set_file.encoding != Encoding.RAW:
+                return [value for value, _ in set_file.block_index()]
+            raw_values = set_file.raw_values()
+            step = max(1, len(raw_values) // (_SAMPLE_BLOCKS_COUNT * 64))
+            return list(raw_values[::step])
+
+    if is_compressed_file(file_name):
+        return _sample_compressed_values(file_name)
+
+    identity = file_identity(file_name)
+    if identity is None:
+        return []
+    size = identity[1]
+    blocks_count = min(_SAMPLE_BLOCKS_COUNT, math.ceil(size / _SAMPLE_BLOCK_SIZE))
+    samples = []
+    with open(file_name, "rb") as f:
+        for block_idx in range(blocks_count):
+            offset = size * block_idx // blocks_count
+            f.seek(offset)
+            data = f.read(_SAMPLE_BLOCK_SIZE)
+            if offset > 0:
+                data = data[data.find(b"\n") + 1:]
+            try:
+                samples.extend(parse_int_bytes_or_raise(file_name, data[:data.rfind(b"\n") + 1]))
+            except RuntimeException:
+                # Invalid lines are reported when whole file is parsed.
+                continue
+    return samples
+
+
+def _sample_compressed_values(file_name: str) -> t.List[int]:
+    """
+        :return: values of the beginning of compressed file, it can not be read at offsets.
+    """
+    sample_size = _SAMPLE_BLOCKS_COUNT * _SAMPLE_BLOCK_SIZE
+    data = b""
+    try:
+        with contextlib.closing(iter_text_chunks_or_raise(file_name, sample_size)) as chunks:
+            for chunk in chunks:
+                data += chunk
+                if len(data) >= sample_size:
+                    break
+        return parse_int_bytes_or_raise(file_name, data[:data.rfind(b"\n") + 1])
+    except RuntimeException:
+        # Invalid files are reported when whole file is parsed.
+        return []
+
+
+def build_range_partitioner(file_names: t.Iterable[str], partitions_count: int) -> Partitioner:
+    """
+        :return: partitioner with ranges of approximately equal counts of sampled values.
+    """
+    samples = sorted(itertools.chain.from_iterable(map(_sample_values, file_names)))
+    if not samples:
+        return Partitioner(partitions_count=1, boundaries=[])
+    boundaries = [
+        samples[len(samples) * partition_idx // partitions_count]
+        for partition_idx in range(1, partitions_count)
+    ]
+    return Partitioner(partitions_count=partitions_count, boundaries=boundaries)
+
+
+class PartitionedExecutor(Executor):
+    """
+        Evaluates the whole expression on every partition of integer domain
+        in a separate process, so expression with few large inputs uses all CPUs.
+        Input files are read directly, so engine is used only to evaluate partitions.
+        Result is identical to `Executor` result.
+    """
+
+    def __init__(
+        self,
+        root_expression: Expression,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        engine: t.Optional[SetEngine] = None,
+        partitions: t.Optional[int] = None,
+        jobs: t.Optional[int] = None,
+        strategy: PartitionStrategy = PartitionStrategy.RANGE,
+        temp_dir: t.Optional[str] = None,
+        split_size: int = DEFAULT_SPLIT_SIZE,
+    ):
+        """
+            :param partitions: count of partitions, `jobs` by default.
+            :param jobs: count of worker processes, count of CPUs by default.
+                If not greater than 1, partitions are evaluated one by one in current process.
+            :param temp_dir: directory for partition files.
+        """
+        super().__init__(
+            root_expression=root_expression,
+            functions_mapping=functions_mapping,
+            engine=engine,
+        )
+        if has_limit(root_expression):
+            raise RuntimeException(reason="LIMIT can not be evaluated by partitions.")
+        self._jobs = jobs if jobs is not None else os.cpu_count() or 1
+        self._partitions = partitions if partitions is not None else self._jobs
+        self._strategy = strategy
+        self._temp_dir = temp_dir
+        self._split_size = split_size
+
+    @property
+    def jobs(self) -> int:
+        return self._jobs
+
+    @property
+    def partitions(self) -> int:
+        return self._partitions
+
+    @property
+    def strategy(self) -> PartitionStrategy:
+        return self._strategy
+
+    def execute(self) -> t.AbstractSet[int]:
+        _, results = self._evaluate_partitions()
+        return set(itertools.chain.from_iterable(results))
+
+    def execute_sorted(self) -> t.Iterator[int]:
+        partitioner, results = self._evaluate_partitions()
+        if partitioner.is_ordered:
+            return itertools.chain.from_iterable(results)
+        return heapq.merge(*results)
+
+    def _input_file_names(self) -> t.List[str]:
+        return sorted({
+            expression.file_name
+            for expression in iter_post_order(self.root_expression)
+            if isinstance(expression, LoadFromFileExpression)
+        })
+
+    def _splits(self, file_name: str) -> t.List[t.Tuple[int, int]]:
+        identity = file_identity(file_name)
+        # Compressed files can not be split by byte ranges,
+        # every compressed file is decompressed by a single task, in parallel with other files.
+        if identity is None or is_binary_set_file(file_name) or is_compressed_file(file_name):
+            return [(0, 0)]
+        size = identity[1]
+        splits_count = max(1, min(self.jobs, size // self._split_size))
+        return [
+            (size * split_idx // splits_count, size * (split_idx + 1) // splits_count)
+            for split_idx in range(splits_count)
+        ]
+
+    def _pool(self) -> concurrent.futures.Executor:
+        if self.jobs <= 1:
+            return concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        return concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs)
+
+    def _evaluate_partitions(self) -> t.Tuple[Partitioner, t.List[t.List[int]]]:
+        file_names = self._input_file_names()
+        if self.strategy == PartitionStrategy.RANGE:
+            partitioner = build_range_partitioner(file_names, self.partitions)
+        else:
+            partitioner = Partitioner(partitions_count=self.partitions)
+
+        temp_dir_context = tempfile.TemporaryDirectory(prefix="scalc-partitions-", dir=self._temp_dir)
+        with temp_dir_context as temp_dir:
+            with self._pool() as pool:
+                split_prefixes = {}
+                split_futures = []
+                for file_idx, file_name in enumerate(file_names):
+                    split_prefixes[file_name] = []
+                    for split_idx, (start, end) in enumerate(self._splits(file_name)):
+                        prefix = os.path.join(temp_dir, f"{file_idx}.{split_idx}")
+                        split_prefixes[file_name].append(prefix)
+                        future = pool.submit(
+                            _split_input, file_name, start, end, partitioner, prefix,
+                            self.engine.sorted_input,
+                        )
+                        split_futures.append((file_name, future))
+                last_values = {}
+                for file_name, future in split_futures:
+                    try:
+                        bounds = future.result()
+                    except RuntimeException:
+                        _raise_input_error(file_name, self.engine)
+                        raise
+                    if bounds is None:
+                        continue
+                    # Splits of file are checked one by one, so their boundaries are checked here.
+                    if self.engine.sorted_input and bounds[0] < last_values.get(file_name, bounds[0]):
+                        _raise_input_error(file_name, self.engine)
+                        raise RuntimeException(reason=f"File '{file_name}' is not sorted.")
+                    last_values[file_name] = bounds[1]
+
+                partition_futures = [
+                    pool.submit(
+                        _evaluate_partition,
+                        self.root_expression,
+                        self.functions_mapping,
+                        self.engine,
+                        split_prefixes,
+                        partition_idx,
+                        temp_dir,
+                    )
+                    for partition_idx in range(partitioner.partitions_count)
+                ]
+                return partitioner, [future.result() for future in partition_futures]
+
+
+def _raise_input_error(file_name: str, engine: SetEngine):
+    """
+        Parses text file from the beginning, so invalid line is reported with its number.
+        Engines with sorted input read the file themselves, so their order error is reported.
+    """
+    if is_binary_set_file(file_name):
+        return
+    if engine.sorted_input:
+        for _ in engine.iterate(file_name):
+            pass
+        return
+    for _ in iter_int_blocks_or_raise(file_name):
+        pass
+
+
+__all__ = (
+    PartitionStrategy.__name__,
+    Partitioner.__name__,
+    PartitionEngine.__name__,
+    PartitionedExecutor.__name__,
+    build_range_partitioner.__name__,
+)
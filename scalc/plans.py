@@ -0,0 +1,253 @@
+"""
+    Serializable compiled plans and their cache.
+"""
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import typing as t
+import uuid
+from dataclasses import dataclass, asdict
+
+from scalc.expressions import (
+    Expression,
+    LoadFromFileExpression,
+    FunctionCallExpression,
+    RestrictExpression,
+    iter_post_order,
+)
+from scalc.functions import SetCalcFunc
+from scalc.restrictions import Restriction
+
+
+# Must be changed on every incompatible change of serialized plans or of compiler output.
+PLAN_FORMAT_VERSION = 2
+
+# Plans are stored in this subdirectory of cache directory of input files.
+PLANS_DIR_NAME = "plans"
+
+# Variant of cache key of optimized plans.
+OPTIMIZED_PLAN_VARIANT = "optimized"
+
+DEFAULT_MAX_CACHED_PLANS = 1024
+DEFAULT_MAX_STORED_PLANS = 16 * 1024
+
+_PLAN_FILE_EXTENSION = ".plan.json"
+_TEMP_FILE_SUFFIX = ".tmp"
+
+
+def functions_registry_version(functions_mapping: t.Mapping[str, SetCalcFunc]) -> str:
+    """
+        :return: version of functions registry, changes when names or classes of functions change.
+    """
+    registry = sorted(
+        f"{name}:{type(func).__module__}.{type(func).__qualname__}"
+        for name, func in functions_mapping.items()
+    )
+    return hashlib.sha1("\n".join(registry).encode()).hexdigest()
+
+
+def serialize_plan(
+    root_expression: Expression,
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+) -> t.Optional[t.Dict[str, t.Any]]:
+    """
+        :return: JSON serializable plan, nodes are listed in post order,
+            so shared nodes stay shared. None if plan contains unknown nodes.
+    """
+    func_names = {id(func): name for name, func in functions_mapping.items()}
+    node_idxs = {}
+    nodes = []
+    for expression in iter_post_order(root_expression):
+        if isinstance(expression, LoadFromFileExpression):
+            node = {"file_name": expression.file_name}
+            if expression.restriction is not None:
+                node["restriction"] = asdict(expression.restriction)
+        elif isinstance(expression, RestrictExpression):
+            node = {
+                "restriction": asdict(expression.restriction),
+                "arg": node_idxs[id(expression.arg)],
+            }
+        elif isinstance(expression, FunctionCallExpression) and id(expression.func) in func_names:
+            node = {
+                "func": func_names[id(expression.func)],
+                "args": [node_idxs[id(arg)] for arg in expression.func_args],
+                "short_circuit": expression.short_circuit,
+            }
+        else:
+            return None
+        node_idxs[id(expression)] = len(nodes)
+        nodes.append(node)
+    return {"version": PLAN_FORMAT_VERSION, "nodes": nodes}
+
+
+def deserialize_plan(
+    plan: t.Mapping[str, t.Any],
+    functions_mapping: t.Mapping[str, SetCalcFunc],
+) -> t.Optional[Expression]:
+    """
+        :return: root expression of serialized plan, None if plan is not valid.
+    """
+    if not isinstance(plan, dict) or plan.get("version") != PLAN_FORMAT_VERSION:
+        return None
+
+    expressions = []
+    try:
+        for node in plan["nodes"]:
+            restriction = Restriction(**node["restriction"]) if "restriction" in node else None
+            if "file_name" in node:
+                expressions.append(LoadFromFileExpression(
+                    file_name=node["file_name"],
+                    restriction=restriction,
+                ))
+                continue
+            if restriction is not None:
+                expressions.append(RestrictExpression(
+                    restriction=restriction,
+                    arg=expressions[node["arg"]],
+                ))
+                continue
+            expressions.append(FunctionCallExpression(
+                func=functions_mapping[node["func"]],
+                func_args=[expressions[arg_idx] for arg_idx in node["args"]],
+                short_circuit=node["short_circuit"],
+            ))
+    except (KeyError, IndexError, TypeError):
+        return None
+    return expressions[-1] if expressions else None
+
+
+@dataclass
+class PlanCacheStats:
+    hits_count: int = 0
+    misses_count: int = 0
+    stores_count: int = 0
+
+
+class PlanCache:
+    """
+        Cache of compiled plans, keyed by hash of source string, functions registry
+        version and `variant` (e.g. whether plan is optimized).
+        Plans are kept in memory in LRU order and, if `cache_dir` is given,
+        stored in `cache_dir` as JSON files, so they are shared between processes.
+    """
+
+    def __init__(
+        self,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        cache_dir: t.Optional[str] = None,
+        max_entries: int = DEFAULT_MAX_CACHED_PLANS,
+        max_stored_entries: int = DEFAULT_MAX_STORED_PLANS,
+    ):
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        self._functions_mapping = functions_mapping
+        self._registry_version = functions_registry_version(functions_mapping)
+        self._cache_dir = cache_dir
+        self._max_entries = max_entries
+        self._max_stored_entries = max_stored_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._cache_stats = PlanCacheStats()
+
+    @property
+    def cache_dir(self) -> t.Optional[str]:
+        return self._cache_dir
+
+    @property
+    def cache_stats(self) -> PlanCacheStats:
+        return self._cache_stats
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {f"plan_cache_{name}": value for name, value in asdict(self.cache_stats).items()}
+
+    def _key(self, source_str: str, variant: str) -> str:
+        identity = f"{PLAN_FORMAT_VERSION}:{self._registry_version}:{variant}:{source_str}"
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{_PLAN_FILE_EXTENSION}")
+
+    def lookup(self, source_str: str, variant: str = "") -> t.Optional[Expression]:
+        key = self._key(source_str, variant)
+        with self._lock:
+            plan = self._entries.get(key)
+            if plan is not None:
+                self._entries.move_to_end(key)
+                self.cache_stats.hits_count += 1
+                return plan
+
+        plan = self._load(key) if self.cache_dir is not None else None
+        with self._lock:
+            if plan is None:
+                self.cache_stats.misses_count += 1
+                return None
+            self.cache_stats.hits_count += 1
+            self._remember(key, plan)
+        return plan
+
+    def store(self, source_str: str, plan: Expression, variant: str = ""):
+        key = self._key(source_str, variant)
+        with self._lock:
+            self._remember(key, plan)
+            self.cache_stats.stores_count += 1
+        if self.cache_dir is not None:
+            self._save(key, plan)
+
+    def _remember(self, key: str, plan: Expression):
+        self._entries[key] = plan
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> t.Optional[Expression]:
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                serialized_plan = json.load(f)
+            # Modification time of stored plan is its last access time.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return deserialize_plan(serialized_plan, self._functions_mapping)
+
+    def _save(self, key: str, plan: Expression):
+        serialized_plan = serialize_plan(plan, self._functions_mapping)
+        if serialized_plan is None:
+            return
+
+        path = self._entry_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}{_TEMP_FILE_SUFFIX}"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(serialized_plan, f, separators=(",", ":"))
+            os.replace(temp_path, path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry_name in os.listdir(self.cache_dir):
+            if not entry_name.endswith(_PLAN_FILE_EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, entry_name)
+            with contextlib.suppress(FileNotFoundError):
+                entries.append((os.stat(path).st_mtime_ns, path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self._max_stored_entries)]:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+
+__all__ = (
+    PlanCacheStats.__name__,
+    PlanCache.__name__,
+    functions_registry_version.__name__,
+    serialize_plan.__name__,
+    deserialize_plan.__name__,
+)
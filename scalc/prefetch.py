@@ -0,0 +1,182 @@
+"""
+    Concurrent read-ahead of input files.
+
+    Before evaluation, `Executor` passes file names of all leaves of expression
+    to `SetEngine.prefetch`, in evaluation order. `PrefetchingEngine` reads these files
+    in a bounded thread pool, so they are in page cache when wrapped engine loads them:
+    waiting for slow (e.g. network-mounted or cold) storage overlaps with parsing
+    and set operations of files which are already read.
+"""
+import concurrent.futures
+import contextlib
+import os
+import threading
+import time
+import typing as t
+from dataclasses import dataclass, asdict
+
+from scalc.engines import SetEngine, EngineWrapper
+from scalc.exceptions import RuntimeException
+from scalc.restrictions import Restriction
+
+
+DEFAULT_MAX_CONCURRENT_READS = 4
+DEFAULT_READ_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class PrefetchStats:
+    files_count: int = 0
+    bytes_count: int = 0
+    # Count of loads of files which were read ahead successfully.
+    hits_count: int = 0
+    # Time spent by evaluation waiting for reads which were not finished yet.
+    wait_us: int = 0
+
+
+def _advise_will_need(fd: int):
+    """
+        Asks kernel to read the whole file into page cache asynchronously.
+    """
+    if hasattr(os, "posix_fadvise"):
+        with contextlib.suppress(OSError):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+
+
+class PrefetchingEngine(EngineWrapper):
+    """
+        Engine which reads files ahead of wrapped engine, at most `max_concurrent_reads`
+        files at once. Files are read in order they are prefetched, so files needed first
+        are read first. Read errors are ignored, they are reported by wrapped engine.
+
+        Every evaluation starts with `prefetch`, so finished reads of files which were not loaded
+        by previous evaluations (e.g. arguments of INT skipped after empty result) are dropped then,
+        and these files are read again.
+    """
+
+    def __init__(
+        self,
+        engine: SetEngine,
+        max_concurrent_reads: int = DEFAULT_MAX_CONCURRENT_READS,
+        chunk_size: int = DEFAULT_READ_CHUNK_SIZE,
+    ):
+        super().__init__(engine=engine)
+        if max_concurrent_reads < 1:
+            raise RuntimeException(reason="Count of concurrent reads must be positive.")
+        self._max_concurrent_reads = max_concurrent_reads
+        self._chunk_size = chunk_size
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_reads,
+            thread_name_prefix="scalc-prefetch",
+        )
+        self._lock = threading.Lock()
+        # Pending or finished reads of files which are not loaded yet,
+        # result of finished read is True if file was read successfully.
+        self._reads: t.Dict[str, concurrent.futures.Future] = {}
+        self._read_times = {}
+        self._prefetch_stats = PrefetchStats()
+        self._closed = threading.Event()
+
+    @property
+    def max_concurrent_reads(self) -> int:
+        return self._max_concurrent_reads
+
+    @property
+    def prefetch_stats(self) -> PrefetchStats:
+        return self._prefetch_stats
+
+    @property
+    def read_times(self) -> t.Mapping[str, float]:
+        """
+            :return: seconds spent reading every prefetched file.
+        """
+        return self._read_times
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {
+            **self.engine.stats(),
+            **{f"prefetch_{name}": value for name, value in asdict(self.prefetch_stats).items()},
+            **{
+                f"prefetch_read_us[{file_name}]": round(seconds * 1_000_000)
+                for file_name, seconds in self.read_times.items()
+            },
+        }
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        with self._lock:
+            if self._closed.is_set():
+                return
+            for file_name, read in list(self._reads.items()):
+                if read.done():
+                    del self._reads[file_name]
+            for file_name in file_names:
+                if file_name not in self._reads:
+                    self._reads[file_name] = self._pool.submit(self._read, file_name)
+        self.engine.prefetch(file_names)
+
+    def _read(self, file_name: str) -> bool:
+        started = time.perf_counter()
+        buffer = bytearray(self._chunk_size)
+        size = 0
+        try:
+            with open(file_name, "rb", buffering=0) as f:
+                _advise_will_need(f.fileno())
+                while not self._closed.is_set():
+                    chunk_size = f.readinto(buffer)
+                    if not chunk_size:
+                        break
+                    size += chunk_size
+        except OSError:
+            return False
+        with self._lock:
+            self._read_times[file_name] = time.perf_counter() - started
+            self.prefetch_stats.files_count += 1
+            self.prefetch_stats.bytes_count += size
+        return True
+
+    def _wait(self, file_name: str):
+        with self._lock:
+            read = self._reads.pop(file_name, None)
+        if read is None:
+            return
+        started = time.perf_counter()
+        is_read = False
+        with contextlib.suppress(concurrent.futures.CancelledError):
+            is_read = read.result()
+        with self._lock:
+            if is_read:
+                self.prefetch_stats.hits_count += 1
+            self.prefetch_stats.wait_us += round((time.perf_counter() - started) * 1_000_000)
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        self._wait(file_name)
+        return self.engine.load(file_name)
+
+    def load_restricted(self, file_name: str, restriction: Restriction) -> t.AbstractSet[int]:
+        self._wait(file_name)
+        return self.engine.load_restricted(file_name, restriction)
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        # Streams are created before evaluation, so read is awaited by the first value.
+        self._wait(file_name)
+        yield from self.engine.iterate(file_name)
+
+    def iterate_restricted(self, file_name: str, restriction: Restriction) -> t.Iterator[int]:
+        self._wait(file_name)
+        yield from self.engine.iterate_restricted(file_name, restriction)
+
+    def close(self):
+        with self._lock:
+            self._closed.set()
+            reads = list(self._reads.values())
+            self._reads.clear()
+        for read in reads:
+            read.cancel()
+        self._pool.shutdown(wait=True)
+        self.engine.close()
+
+
+__all__ = (
+    PrefetchStats.__name__,
+    PrefetchingEngine.__name__,
+)
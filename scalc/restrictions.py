@@ -0,0 +1,153 @@
+"""
+    Restrictions of sets to ranges of values, see `RANGE` and `LIMIT` of expressions.
+"""
+import bisect
+import heapq
+import itertools
+import typing as t
+from dataclasses import dataclass, replace
+
+from scalc.sorted_sets import SortedListSet, unique_ascending
+
+
+@dataclass(frozen=True)
+class Restriction:
+    """
+        Restriction - values which are not less than `lower` and less than `upper`,
+        at most `limit` smallest of them. None means that values are not restricted.
+    """
+    lower: t.Optional[int] = None
+    upper: t.Optional[int] = None
+    limit: t.Optional[int] = None
+
+    @property
+    def has_range(self) -> bool:
+        return self.lower is not None or self.upper is not None
+
+    @property
+    def value_range(self) -> "Restriction":
+        """
+            :return: restriction to the same range of values, without limit.
+        """
+        return replace(self, limit=None)
+
+    def __contains__(self, value: int) -> bool:
+        """
+            :return: whether value is in range of restriction, limit is ignored.
+        """
+        return (
+            (self.lower is None or self.lower <= value)
+            and (self.upper is None or value < self.upper)
+        )
+
+    def __str__(self) -> str:
+        parts = []
+        if self.has_range:
+            lower = "-" if self.lower is None else self.lower
+            upper = "-" if self.upper is None else self.upper
+            parts.append(f"RANGE {lower} {upper}")
+        if self.limit is not None:
+            parts.append(f"LIMIT {self.limit}")
+        return " ".join(parts)
+
+    def then(self, restriction: "Restriction") -> t.Optional["Restriction"]:
+        """
+            :return: single restriction equal to this restriction followed by `restriction`,
+                None if there is no such restriction (range follows limit).
+        """
+        if self.limit is None:
+            return Restriction(
+                lower=_max_bound(self.lower, restriction.lower),
+                upper=_min_bound(self.upper, restriction.upper),
+                limit=restriction.limit,
+            )
+        if not restriction.has_range:
+            return replace(self, limit=_min_bound(self.limit, restriction.limit))
+        return None
+
+    def restrict_set(self, values: t.AbstractSet[int]) -> t.AbstractSet[int]:
+        """
+            Sets which are stored sorted (e.g. `SortedListSet`) are restricted
+            with their own `restricted` method, without checking every value.
+        """
+        restricted = getattr(values, "restricted", None)
+        if restricted is not None:
+            return restricted(self)
+        if self.has_range:
+            values = set(filter(self.__contains__, values))
+        if self.limit is not None and len(values) > self.limit:
+            return SortedListSet(values=heapq.nsmallest(self.limit, values))
+        return values
+
+    def restrict_sorted(self, values: t.Iterable[int]) -> t.Iterator[int]:
+        """
+            :param values: sorted unique values.
+            :return: restricted values, values after upper bound are not iterated.
+        """
+        values = iter(values)
+        if self.lower is not None:
+            values = itertools.dropwhile(lambda value: value < self.lower, values)
+        if self.upper is not None:
+            values = itertools.takewhile(lambda value: value < self.upper, values)
+        if self.limit is not None:
+            values = itertools.islice(values, self.limit)
+        return values
+
+    def filter_sorted(self, values: t.Iterable[int]) -> t.Iterator[int]:
+        """
+            Counterpart of `restrict_sorted` for values whose order is not known in advance,
+            but is checked by the iterator: all values are iterated, so that values out of order
+            are reported even if they are after upper bound or limit.
+            :param values: sorted unique values.
+        """
+        count = 0
+        for value in values:
+            if value in self and (self.limit is None or count < self.limit):
+                count += 1
+                yield value
+
+    def restrict_sorted_list(self, values: t.List[int]) -> t.List[int]:
+        """
+            :param values: sorted values, possibly with duplicates.
+            :return: sorted unique restricted values, found with binary search.
+        """
+        start = 0 if self.lower is None else bisect.bisect_left(values, self.lower)
+        end = len(values) if self.upper is None else bisect.bisect_left(values, self.upper, start)
+        if start != 0 or end != len(values):
+            values = values[start:end]
+        values = unique_ascending(values)
+        if self.limit is not None and len(values) > self.limit:
+            values = values[:self.limit]
+        return values
+
+    def restrict_sorted_blocks(self, blocks: t.Iterable[t.List[int]]) -> t.List[int]:
+        """
+            :param blocks: consecutive blocks of sorted values, possibly with duplicates.
+            :return: sorted unique restricted values, blocks after upper bound are not iterated.
+        """
+        result = []
+        for block in blocks:
+            if not block:
+                continue
+            values = self.value_range.restrict_sorted_list(block)
+            if result and values and values[0] == result[-1]:
+                values = values[1:]
+            result += values
+            if self.limit is not None and len(result) >= self.limit:
+                return result[:self.limit]
+            if self.upper is not None and block[-1] >= self.upper:
+                break
+        return result
+
+
+def _max_bound(bound: t.Optional[int], other: t.Optional[int]) -> t.Optional[int]:
+    return other if bound is None else bound if other is None else max(bound, other)
+
+
+def _min_bound(bound: t.Optional[int], other: t.Optional[int]) -> t.Optional[int]:
+    return other if bound is None else bound if other is None else min(bound, other)
+
+
+__all__ = (
+    Restriction.__name__,
+)
@@ -0,0 +1,237 @@
+"""
+    Long-running query service.
+
+    Protocol is line-oriented: client sends one expression per line,
+    service responds with sorted result values, one per line, followed by
+    an empty line. Errors are sent as a single line with error message.
+"""
+import collections
+import os
+import socket
+import socketserver
+import stat
+import threading
+import typing as t
+
+from scalc.compiler import Compiler
+from scalc.engines import SetEngine, EngineWrapper
+from scalc.exceptions import RuntimeException, SetCalcException
+from scalc.executor import Executor
+from scalc.expressions import Expression
+from scalc.functions import SetCalcFunc
+from scalc.optimizer import Optimizer
+from scalc.parsing import file_identity
+from scalc.plans import PlanCache, DEFAULT_MAX_CACHED_PLANS, OPTIMIZED_PLAN_VARIANT
+from scalc.tokens import TokenParser
+
+
+DEFAULT_MAX_CACHED_SETS = 128
+
+
+class MemoryCachingEngine(EngineWrapper):
+    """
+        Engine which keeps loaded sets in memory, in LRU order.
+        Entry is invalidated when inode, size or modification time of file changes.
+    """
+
+    def __init__(self, engine: SetEngine, max_entries: int = DEFAULT_MAX_CACHED_SETS):
+        super().__init__(engine=engine)
+        self._max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_count = 0
+        self._misses_count = 0
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {
+            **self.engine.stats(),
+            "memory_cache_hits_count": self._hits_count,
+            "memory_cache_misses_count": self._misses_count,
+            "memory_cache_entries_count": len(self._entries),
+        }
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        with self._lock:
+            file_names = [
+                file_name
+                for file_name in file_names
+                if file_name not in self._entries
+                or self._entries[file_name][0] != file_identity(file_name)
+            ]
+        self.engine.prefetch(file_names)
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        identity = file_identity(file_name)
+        with self._lock:
+            entry = self._entries.get(file_name)
+            if entry is not None and entry[0] == identity:
+                self._entries.move_to_end(file_name)
+                self._hits_count += 1
+                return entry[1]
+            self._misses_count += 1
+
+        result = self.engine.load(file_name)
+        if identity is None:
+            return result
+
+        with self._lock:
+            self._entries[file_name] = (identity, result)
+            self._entries.move_to_end(file_name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+class QueryService:
+    """
+        Evaluates expressions with shared engine and keeps compiled plans in memory.
+    """
+
+    def __init__(
+        self,
+        functions_mapping: t.Mapping[str, SetCalcFunc],
+        engine: SetEngine,
+        optimize: bool = False,
+        max_cached_plans: int = DEFAULT_MAX_CACHED_PLANS,
+        plan_cache_dir: t.Optional[str] = None,
+    ):
+        """
+            :param plan_cache_dir: directory where compiled plans are stored, if given.
+        """
+        self._functions_mapping = functions_mapping
+        self._engine = engine
+        self._optimizer = Optimizer() if optimize else None
+        self._plan_cache = PlanCache(
+            functions_mapping=functions_mapping,
+            cache_dir=plan_cache_dir,
+            max_entries=max_cached_plans,
+        )
+        self._plan_variant = OPTIMIZED_PLAN_VARIANT if optimize else ""
+
+    @property
+    def engine(self) -> SetEngine:
+        return self._engine
+
+    @property
+    def plan_cache(self) -> PlanCache:
+        return self._plan_cache
+
+    def compile(self, source_str: str) -> Expression:
+        plan = self.plan_cache.lookup(source_str, self._plan_variant)
+        if plan is not None:
+            return plan
+
+        compiler = Compiler(
+            tokens=TokenParser(source_str=source_str).iter_tokens(),
+            functions_mapping=self._functions_mapping,
+        )
+        plan = compiler.compile()
+        if self._optimizer is not None:
+            plan = self._optimizer.optimize(plan)
+
+        self.plan_cache.store(source_str, plan, self._plan_variant)
+        return plan
+
+    def query(self, source_str: str) -> t.Iterator[str]:
+        """
+            :return: response lines, without line separators.
+        """
+        try:
+            executor = Executor(
+                root_expression=self.compile(source_str),
+                functions_mapping=self._functions_mapping,
+                engine=self.engine,
+            )
+            result = list(executor.execute_sorted())
+        except SetCalcException as e:
+            return iter((str(e), ))
+        return map(str, result)
+
+    def serve_lines(self, lines: t.Iterable[str], output: t.TextIO):
+        """
+            Evaluates every non-empty line of `lines` and writes response to `output`.
+        """
+        for line in lines:
+            source_str = line.strip()
+            if not source_str:
+                continue
+            for response_line in self.query(source_str):
+                output.write(response_line)
+                output.write("\n")
+            output.write("\n")
+            output.flush()
+
+
+class _QueryRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        reader = (line.decode() for line in self.rfile)
+        writer = _SocketTextWriter(self.wfile)
+        self.server.query_service.serve_lines(reader, writer)
+
+
+class _SocketTextWriter:
+
+    def __init__(self, wfile: t.BinaryIO):
+        self._wfile = wfile
+
+    def write(self, text: str):
+        self._wfile.write(text.encode())
+
+    def flush(self):
+        self._wfile.flush()
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, query_service: QueryService):
+        self.query_service = query_service
+        super().__init__(socket_path, _QueryRequestHandler)
+
+
+def _is_socket(path: str) -> bool:
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except OSError:
+        return False
+
+
+def _accepts_connections(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+        try:
+            client_socket.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def create_query_server(socket_path: str, query_service: QueryService) -> QueryServer:
+    """
+        Socket left by killed server is removed, socket of running server is not.
+    """
+    if _is_socket(socket_path):
+        if _accepts_connections(socket_path):
+            raise RuntimeException(
+                reason=f"Server is already listening on socket '{socket_path}'.",
+            )
+        os.unlink(socket_path)
+    try:
+        return QueryServer(socket_path=socket_path, query_service=query_service)
+    except OSError as e:
+        raise RuntimeException(
+            reason=f"Can not listen on socket '{socket_path}': {e.strerror}.",
+        )
+
+
+__all__ = (
+    MemoryCachingEngine.__name__,
+    QueryService.__name__,
+    QueryServer.__name__,
+    create_query_server.__name__,
+)
@@ -0,0 +1,260 @@
+"""
+    Approximate cardinality estimation with theta (k minimum values) sketches.
+
+    Sketch of a set keeps hashes of its values which are below threshold `theta`,
+    at most `sketch_size` of them. Union, intersection and difference of sketches
+    are sketches of union, intersection and difference of sets, so any expression
+    is estimated without materializing sets.
+"""
+import heapq
+import math
+import typing as t
+
+from scalc.binary import BinarySetFile, is_binary_set_file
+from scalc.cache import FileCache
+from scalc.engines import SetEngine
+from scalc.exceptions import RuntimeException
+from scalc.parsing import iter_int_blocks_or_raise
+from scalc.restrictions import Restriction
+
+
+# Hashes are 63 bit, so they can be cached as int64 values of binary set files.
+_HASH_BITS = 63
+_HASH_MASK = (1 << _HASH_BITS) - 1
+_MASK_64 = (1 << 64) - 1
+MAX_THETA = 1 << _HASH_BITS
+
+DEFAULT_RELATIVE_ERROR = 0.02
+# Count of standard deviations in error bounds, ~95% confidence.
+_BOUNDS_STD_COUNT = 2
+
+
+def hash_value(value: int) -> int:
+    """
+        splitmix64 finalizer, uniformly distributes any integers.
+    """
+    x = value & _MASK_64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK_64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK_64
+    return (x ^ (x >> 31)) & _HASH_MASK
+
+
+def sketch_size_for_error(relative_error: float) -> int:
+    """
+        :return: sketch size with relative standard error of estimated count
+            of single file not greater than `relative_error`.
+    """
+    if not 0 < relative_error < 1:
+        raise RuntimeException(
+            reason=f"Relative error must be between 0 and 1, got: {relative_error}.",
+        )
+    return math.ceil(1 / relative_error ** 2) + 2
+
+
+DEFAULT_SKETCH_SIZE = sketch_size_for_error(DEFAULT_RELATIVE_ERROR)
+
+
+class ThetaSketch:
+    """
+        ThetaSketch - immutable sketch of a set of integers.
+        Supports `|`, `&` and `-` operators, so it can be passed to any `SetCalcFunc`,
+        `len` returns rounded estimated count.
+    """
+
+    def __init__(self, hashes: t.AbstractSet[int], sketch_size: int, theta: int = MAX_THETA):
+        """
+            :param hashes: hashes of values which are less than `theta`.
+        """
+        self._hashes = frozenset(hashes)
+        self._sketch_size = sketch_size
+        self._theta = theta
+
+    @classmethod
+    def from_hashes(
+        cls,
+        hashes: t.Iterable[int],
+        sketch_size: int,
+        theta: int = MAX_THETA,
+    ) -> "ThetaSketch":
+        """
+            :return: sketch of at most `sketch_size` smallest hashes which are less than `theta`.
+        """
+        smallest = heapq.nsmallest(sketch_size + 1, {h for h in hashes if h < theta})
+        if len(smallest) <= sketch_size:
+            return cls(hashes=smallest, sketch_size=sketch_size, theta=theta)
+        return cls(hashes=smallest[:-1], sketch_size=sketch_size, theta=smallest[-1])
+
+    @property
+    def hashes(self) -> t.AbstractSet[int]:
+        return self._hashes
+
+    @property
+    def sketch_size(self) -> int:
+        return self._sketch_size
+
+    @property
+    def theta(self) -> int:
+        return self._theta
+
+    @property
+    def is_exact(self) -> bool:
+        return self.theta == MAX_THETA
+
+    def estimate(self) -> float:
+        return len(self.hashes) * MAX_THETA / self.theta
+
+    def bounds(self) -> t.Tuple[float, float]:
+        """
+            :return: lower and upper bounds of count with ~95% confidence.
+        """
+        if self.is_exact:
+            return float(len(self.hashes)), float(len(self.hashes))
+        p = self.theta / MAX_THETA
+        std = math.sqrt(max(len(self.hashes), 1) * (1 - p)) / p
+        estimate = self.estimate()
+        return (
+            max(estimate - _BOUNDS_STD_COUNT * std, float(len(self.hashes))),
+            estimate + _BOUNDS_STD_COUNT * std,
+        )
+
+    def restricted(self, restriction: Restriction) -> "ThetaSketch":
+        raise RuntimeException(
+            reason="Sketches can not be restricted after set operations.",
+        )
+
+    def __len__(self) -> int:
+        return round(self.estimate())
+
+    def _coerce(self, obj) -> "ThetaSketch":
+        if not isinstance(obj, ThetaSketch):
+            raise RuntimeException(
+                reason=f"Sketch can not be combined with {type(obj).__name__}.",
+            )
+        return obj
+
+    def __or__(self, obj) -> "ThetaSketch":
+        other = self._coerce(obj)
+        return ThetaSketch.from_hashes(
+            hashes=self.hashes | other.hashes,
+            sketch_size=min(self.sketch_size, other.sketch_size),
+            theta=min(self.theta, other.theta),
+        )
+
+    def __and__(self, obj) -> "ThetaSketch":
+        other = self._coerce(obj)
+        theta = min(self.theta, other.theta)
+        return ThetaSketch(
+            hashes={h for h in self.hashes & other.hashes if h < theta},
+            sketch_size=min(self.sketch_size, other.sketch_size),
+            theta=theta,
+        )
+
+    def __sub__(self, obj) -> "ThetaSketch":
+        other = self._coerce(obj)
+        theta = min(self.theta, other.theta)
+        return ThetaSketch(
+            hashes={h for h in self.hashes - other.hashes if h < theta},
+            sketch_size=min(self.sketch_size, other.sketch_size),
+            theta=theta,
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(estimate={self.estimate():.1f},"
+            f" retained={len(self.hashes)}, theta={self.theta})"
+        )
+
+
+class SketchEngine(SetEngine):
+    """
+        Engine which represents sets as `ThetaSketch` objects,
+        so only count of result values can be estimated.
+        Every file is read in a single pass, sketches are stored in `cache` if given.
+    """
+
+    def __init__(
+        self,
+        sketch_size: int = DEFAULT_SKETCH_SIZE,
+        cache: t.Optional[FileCache] = None,
+    ):
+        self._sketch_size = sketch_size
+        self._cache = cache
+        self._sketched_files_count = 0
+
+    @property
+    def sketch_size(self) -> int:
+        return self._sketch_size
+
+    @property
+    def cache(self) -> t.Optional[FileCache]:
+        return self._cache
+
+    @property
+    def _cache_variant(self) -> str:
+        return f"theta-{self.sketch_size}"
+
+    def stats(self) -> t.Mapping[str, int]:
+        stats = {"sketched_files_count": self._sketched_files_count}
+        if self.cache is not None:
+            stats["sketch_cache_hits_count"] = self.cache.cache_stats.hits_count
+            stats["sketch_cache_misses_count"] = self.cache.cache_stats.misses_count
+        return stats
+
+    def load(self, file_name: str) -> ThetaSketch:
+        if self.cache is None:
+            return self._sketch_file(file_name)
+
+        cached_path = self.cache.lookup(file_name, self._cache_variant)
+        if cached_path is not None:
+            with BinarySetFile(cached_path) as set_file:
+                return ThetaSketch.from_hashes(set_file, self.sketch_size)
+
+        sketch = self._sketch_file(file_name)
+        # Theta is stored as the largest hash, `from_hashes` restores it.
+        stored_hashes = sorted(sketch.hashes) + ([] if sketch.is_exact else [sketch.theta])
+        with self.cache.store(file_name, self._cache_variant) as entry_writer:
+            for h in stored_hashes:
+                entry_writer.write(h)
+        return sketch
+
+    def iterate(self, file_name: str) -> t.Iterator[int]:
+        raise RuntimeException(
+            reason="Sketches can be used only to estimate count of result values.",
+        )
+
+    def load_restricted(self, file_name: str, restriction: Restriction) -> ThetaSketch:
+        """
+            Values of range are sketched while file is parsed, restricted sketches are not cached.
+        """
+        if restriction.limit is not None:
+            raise RuntimeException(reason="Sketches can not be limited.")
+        return self._sketch_file(file_name, restriction)
+
+    def _sketch_file(
+        self,
+        file_name: str,
+        restriction: t.Optional[Restriction] = None,
+    ) -> ThetaSketch:
+        self._sketched_files_count += 1
+        if is_binary_set_file(file_name):
+            with BinarySetFile(file_name) as set_file:
+                values = set_file if restriction is None else restriction.restrict_sorted(set_file)
+                return ThetaSketch.from_hashes(map(hash_value, values), self.sketch_size)
+
+        # Only hashes below the largest retained one can get into the sketch.
+        retained = []
+        for block in iter_int_blocks_or_raise(file_name):
+            if restriction is not None:
+                block = filter(restriction.__contains__, block)
+            threshold = retained[-1] if len(retained) > self.sketch_size else MAX_THETA
+            hashes = {h for h in map(hash_value, block) if h < threshold}
+            retained = heapq.nsmallest(self.sketch_size + 1, hashes.union(retained))
+        return ThetaSketch.from_hashes(retained, self.sketch_size)
+
+
+__all__ = (
+    ThetaSketch.__name__,
+    SketchEngine.__name__,
+    hash_value.__name__,
+    sketch_size_for_error.__name__,
+)
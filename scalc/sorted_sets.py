@@ -0,0 +1,258 @@
+"""
+    Sets of integers represented as sorted lists of unique values.
+
+    Set operations of `SortedListSet` objects never hash all values of their arguments:
+        - union merges sorted runs (timsort merges runs with galloping in C);
+        - intersection and difference search values of a much smaller list
+          in a larger one with binary search, starting from position of the previous
+          value (galloping search), otherwise only the smaller side is hashed,
+          and the larger list is filtered in order.
+    Results are sorted lists again, so they are never sorted for output.
+"""
+import bisect
+import collections.abc
+import itertools
+import operator
+import typing as t
+
+
+# Names of algorithms of set operations, see `SetCalcFunc.evaluation_path`.
+HASH_PATH = "hash"
+MERGE_PATH = "merge"
+GALLOP_PATH = "gallop"
+PROBE_PATH = "probe"
+
+# Min ratio of lengths of larger and smaller lists, starting from which values
+# of smaller list are searched in larger list instead of hashing.
+GALLOP_MIN_RATIO = 4
+
+
+def is_strictly_ascending(values: t.Sequence[int]) -> bool:
+    return all(map(operator.lt, values, itertools.islice(values, 1, None)))
+
+
+def is_ascending(values: t.Sequence[int]) -> bool:
+    return all(map(operator.le, values, itertools.islice(values, 1, None)))
+
+
+def unique_ascending(values: t.List[int]) -> t.List[int]:
+    """
+        :param values: ascending values, possibly with duplicates.
+    """
+    if is_strictly_ascending(values):
+        return values
+    return [value for value, _ in itertools.groupby(values)]
+
+
+class SortedListSet(collections.abc.Set):
+    """
+        SortedListSet - immutable set of integers stored as a sorted list of unique values.
+        Operations with other set types hash values of the list.
+    """
+
+    # Set is iterated in ascending order, see `Executor.execute_sorted`.
+    sorted_iteration = True
+
+    def __init__(self, values: t.List[int]):
+        """
+            :param values: strictly ascending values, list is not copied.
+        """
+        self._values = values
+
+    @classmethod
+    def _from_iterable(cls, it: t.Iterable[int]) -> t.Set[int]:
+        return set(it)
+
+    @property
+    def values(self) -> t.List[int]:
+        return self._values
+
+    def __contains__(self, value) -> bool:
+        position = bisect.bisect_left(self.values, value)
+        return position < len(self.values) and self.values[position] == value
+
+    def __iter__(self) -> t.Iterator[int]:
+        return iter(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __eq__(self, obj) -> bool:
+        if isinstance(obj, SortedListSet):
+            return self.values == obj.values
+        return super().__eq__(obj)
+
+    def __or__(self, obj) -> t.AbstractSet[int]:
+        if isinstance(obj, SortedListSet):
+            return union_sorted_sets((self, obj))
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return set(self.values) | obj
+
+    def __ror__(self, obj) -> t.AbstractSet[int]:
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return obj | set(self.values)
+
+    def __and__(self, obj) -> t.AbstractSet[int]:
+        if isinstance(obj, SortedListSet):
+            return intersect_sorted_sets((self, obj))
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return set(self.values) & obj
+
+    def __rand__(self, obj) -> t.AbstractSet[int]:
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return obj & set(self.values)
+
+    def __sub__(self, obj) -> t.AbstractSet[int]:
+        if isinstance(obj, SortedListSet):
+            return difference_sorted_sets(self, (obj, ))
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return set(self.values) - obj
+
+    def __rsub__(self, obj) -> t.AbstractSet[int]:
+        if not isinstance(obj, collections.abc.Set):
+            return NotImplemented
+        return obj - set(self.values)
+
+    def restricted(self, restriction) -> "SortedListSet":
+        """
+            :param restriction: `Restriction`, values are found with binary search.
+        """
+        return SortedListSet(values=restriction.restrict_sorted_list(self.values))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.values!r})"
+
+
+def _is_skewed(smaller_size: int, larger_size: int) -> bool:
+    return larger_size >= GALLOP_MIN_RATIO * max(smaller_size, 1)
+
+
+def _gallop_intersection(values: t.List[int], other: t.List[int]) -> t.List[int]:
+    """
+        :return: values which are present in `other`, `other` is much larger than `values`.
+    """
+    result = []
+    position = 0
+    size = len(other)
+    for value in values:
+        position = bisect.bisect_left(other, value, position)
+        if position == size:
+            break
+        if other[position] == value:
+            result.append(value)
+    return result
+
+
+def _gallop_difference(values: t.List[int], other: t.List[int]) -> t.List[int]:
+    """
+        :return: values which are missing in `other`, `other` is much larger than `values`.
+    """
+    result = []
+    position = 0
+    size = len(other)
+    for idx, value in enumerate(values):
+        position = bisect.bisect_left(other, value, position)
+        if position == size:
+            result += values[idx:]
+            break
+        if other[position] != value:
+            result.append(value)
+    return result
+
+
+def _gallop_removal(values: t.List[int], removed: t.List[int]) -> t.List[int]:
+    """
+        :return: values which are missing in `removed`, `removed` is much smaller than `values`.
+            Runs of kept values are copied with slices.
+    """
+    result = []
+    start = 0
+    size = len(values)
+    for value in removed:
+        position = bisect.bisect_left(values, value, start)
+        if position == size:
+            break
+        if values[position] == value:
+            result += values[start:position]
+            start = position + 1
+    result += values[start:]
+    return result
+
+
+def union_sorted_sets(sets: t.Sequence[SortedListSet]) -> SortedListSet:
+    if len(sets) == 1:
+        return sets[0]
+    values = sorted(itertools.chain.from_iterable(s.values for s in sets))
+    return SortedListSet(values=[value for value, _ in itertools.groupby(values)])
+
+
+def intersection_path(sets: t.Sequence[SortedListSet]) -> str:
+    sizes = sorted(map(len, sets))
+    if len(sizes) < 2 or _is_skewed(sizes[0], sizes[1]):
+        return GALLOP_PATH
+    return PROBE_PATH
+
+
+def intersect_sorted_sets(sets: t.Sequence[SortedListSet]) -> SortedListSet:
+    """
+        Arguments are intersected from the smallest one, so intermediate results only shrink.
+    """
+    gallop = intersection_path(sets) == GALLOP_PATH
+    ordered_sets = sorted(sets, key=len)
+    values = ordered_sets[0].values
+    for other in ordered_sets[1:]:
+        if not values:
+            break
+        if gallop:
+            values = _gallop_intersection(values, other.values)
+        else:
+            values = list(filter(set(values).__contains__, other.values))
+    return SortedListSet(values=values)
+
+
+def difference_path(minuend: SortedListSet, subtrahends: t.Sequence[SortedListSet]) -> str:
+    if all(
+        _is_skewed(len(minuend), len(subtrahend)) or _is_skewed(len(subtrahend), len(minuend))
+        for subtrahend in subtrahends
+    ):
+        return GALLOP_PATH
+    return PROBE_PATH
+
+
+def difference_sorted_sets(
+    minuend: SortedListSet,
+    subtrahends: t.Sequence[SortedListSet],
+) -> SortedListSet:
+    values = minuend.values
+    if difference_path(minuend, subtrahends) == PROBE_PATH:
+        removed = set()
+        for subtrahend in subtrahends:
+            removed.update(subtrahend.values)
+        return SortedListSet(values=list(itertools.filterfalse(removed.__contains__, values)))
+
+    for subtrahend in subtrahends:
+        if not values:
+            break
+        if len(subtrahend) < len(values):
+            values = _gallop_removal(values, subtrahend.values)
+        else:
+            values = _gallop_difference(values, subtrahend.values)
+    return SortedListSet(values=values)
+
+
+__all__ = (
+    SortedListSet.__name__,
+    union_sorted_sets.__name__,
+    intersect_sorted_sets.__name__,
+    difference_sorted_sets.__name__,
+    intersection_path.__name__,
+    difference_path.__name__,
+    is_ascending.__name__,
+    is_strictly_ascending.__name__,
+    unique_ascending.__name__,
+)
@@ -0,0 +1,206 @@
+"""
+    Sparse offset indexes of text files.
+
+    Text files are parsed in large blocks of lines. Index of sorted file keeps
+    the first value and offset of every block, so values of range are read
+    starting from the block which may contain lower bound of range.
+
+    Indexes are built in memory when files are parsed, or in advance with
+    `python -m scalc --index FILE`, which stores index next to the file
+    (see `index_file_name`). Stored index is ignored as soon as size or
+    modification time of the file differs from the indexed ones.
+"""
+import bisect
+import contextlib
+import json
+import os
+import typing as t
+import uuid
+from dataclasses import dataclass, field
+
+from scalc.binary import is_binary_set_file
+from scalc.exceptions import RuntimeException
+from scalc.parsing import file_identity, iter_indexed_int_blocks_or_raise
+from scalc.restrictions import Restriction
+from scalc.sorted_sets import is_ascending
+
+
+INDEX_FILE_EXTENSION = ".sidx"
+# Version of stored index format, stored indexes of other versions are ignored.
+INDEX_FORMAT_VERSION = 1
+# Size of block of lines of stored index, smaller blocks make seeks more precise.
+DEFAULT_INDEX_BLOCK_SIZE = 64 * 1024
+
+_TEMP_FILE_SUFFIX = ".tmp"
+
+
+@dataclass
+class SparseIndex:
+    """
+        SparseIndex - order of text file and, if file is sorted, (first value, offset,
+        number of the first line) of every block of its lines, see `iter_indexed_int_blocks_or_raise`.
+        Index is valid while identity of file (see `file_identity`) is not changed.
+
+        `count` (count of lines), `min_value` and `max_value` are None if they are not known.
+    """
+    identity: t.Tuple[int, int, int]
+    is_sorted: bool
+    blocks: t.List[t.Tuple[int, int, int]] = field(default_factory=list)
+    count: t.Optional[int] = None
+    min_value: t.Optional[int] = None
+    max_value: t.Optional[int] = None
+
+    def seek(self, lower: t.Optional[int]) -> t.Tuple[int, int]:
+        """
+            :return: offset and number of the first line of the first block
+                which may contain values not less than `lower`.
+        """
+        if lower is None or not self.blocks:
+            return 0, 0
+        # The previous block may end with values equal to the first value of block.
+        block_idx = max(0, bisect.bisect_left(self.blocks, (lower, )) - 1)
+        _, offset, line_number = self.blocks[block_idx]
+        return offset, line_number
+
+    @property
+    def bounds(self) -> t.Optional[t.Tuple[int, int]]:
+        """
+            :return: the smallest and the largest values of file, None if they are not known
+                or file is empty.
+        """
+        if self.min_value is None or self.max_value is None:
+            return None
+        return self.min_value, self.max_value
+
+    def may_contain(self, restriction: Restriction) -> bool:
+        """
+            :return: False if file is known to have no values in range of restriction.
+        """
+        if self.count == 0:
+            return False
+        if self.bounds is None:
+            return True
+        return (
+            (restriction.lower is None or restriction.lower <= self.max_value)
+            and (restriction.upper is None or self.min_value < restriction.upper)
+        )
+
+
+def index_file_name(file_name: str) -> str:
+    """
+        :return: name of file which stores index of file, e.g. `a.txt.sidx`.
+    """
+    return f"{file_name}{INDEX_FILE_EXTENSION}"
+
+
+def build_sparse_index(file_name: str, block_size: int = DEFAULT_INDEX_BLOCK_SIZE) -> SparseIndex:
+    """
+        Reads the whole text file. Blocks are stored only if file is sorted.
+        :param block_size: size of block of lines, in bytes.
+    """
+    if is_binary_set_file(file_name):
+        raise RuntimeException(
+            reason=f"File '{file_name}' is a binary set file, it is indexed already.",
+        )
+    identity = file_identity(file_name)
+    blocks = []
+    count = 0
+    min_value = max_value = previous = None
+    is_sorted = True
+    for offset, line_number, block in iter_indexed_int_blocks_or_raise(file_name, chunk_size=block_size):
+        if not block:
+            continue
+        count += len(block)
+        if is_sorted and (previous is None or previous <= block[0]) and is_ascending(block):
+            blocks.append((block[0], offset, line_number))
+            previous = block[-1]
+            block_min, block_max = block[0], block[-1]
+        else:
+            is_sorted = False
+            block_min, block_max = min(block), max(block)
+        min_value = block_min if min_value is None else min(min_value, block_min)
+        max_value = block_max if max_value is None else max(max_value, block_max)
+
+    return SparseIndex(
+        identity=identity,
+        is_sorted=is_sorted,
+        blocks=blocks if is_sorted else [],
+        count=count,
+        min_value=min_value,
+        max_value=max_value,
+    )
+
+
+def save_sparse_index(file_name: str, index: SparseIndex):
+    """
+        Stores index of file next to it, see `index_file_name`.
+    """
+    _, size, mtime_ns = index.identity
+    serialized_index = {
+        "version": INDEX_FORMAT_VERSION,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "is_sorted": index.is_sorted,
+        "count": index.count,
+        "min_value": index.min_value,
+        "max_value": index.max_value,
+        "blocks": index.blocks,
+    }
+    path = index_file_name(file_name)
+    temp_path = f"{path}.{uuid.uuid4().hex}{_TEMP_FILE_SUFFIX}"
+    try:
+        with open(temp_path, "w") as f:
+            json.dump(serialized_index, f, separators=(",", ":"))
+        os.replace(temp_path, path)
+    except OSError as e:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise RuntimeException(
+            reason=f"Index of file '{file_name}' can not be written: {e.strerror}.",
+        )
+
+
+def load_sparse_index(file_name: str) -> t.Optional[SparseIndex]:
+    """
+        :return: stored index of file, None if there is no stored index,
+            it is corrupted, or file is changed since it was indexed.
+    """
+    identity = file_identity(file_name)
+    if identity is None:
+        return None
+    try:
+        with open(index_file_name(file_name)) as f:
+            serialized_index = json.load(f)
+        if (
+            serialized_index["version"] != INDEX_FORMAT_VERSION
+            or (serialized_index["size"], serialized_index["mtime_ns"]) != identity[1:]
+        ):
+            return None
+        return SparseIndex(
+            identity=identity,
+            is_sorted=serialized_index["is_sorted"],
+            blocks=[tuple(block) for block in serialized_index["blocks"]],
+            count=serialized_index["count"],
+            min_value=serialized_index["min_value"],
+            max_value=serialized_index["max_value"],
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def stored_file_bounds(file_name: str) -> t.Optional[t.Tuple[int, int]]:
+    """
+        :return: the smallest and the largest values of file, if it has valid stored index.
+    """
+    index = load_sparse_index(file_name)
+    return index.bounds if index is not None else None
+
+
+__all__ = (
+    SparseIndex.__name__,
+    index_file_name.__name__,
+    build_sparse_index.__name__,
+    save_sparse_index.__name__,
+    load_sparse_index.__name__,
+    stored_file_bounds.__name__,
+)
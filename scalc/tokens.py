@@ -11,6 +11,7 @@ class TokenType(str, enum.Enum):
     FUNC_CALL_END = "FUNC_CALL_END"
     FUNC_NAME = "FUNC_NAME"
     FILE_NAME = "FILE_NAME"
+    NUMBER = "NUMBER"
 
 
 @dataclass(frozen=True)
@@ -19,12 +20,37 @@ class Token:
     token_value: str
 
 
+_FUNC_NAME_RE = r"[A-Z][A-Z_]*"
+_FILE_NAME_RE = r"[a-z][a-z0-9_\./]*"
+_NUMBER_RE = r"-?[0-9]+"
+# Leading whitespaces are skipped, token is captured into group named after its type.
+_TOKEN_RE_PATTERN = re.compile(rf"""
+    \s*
+    (?:
+        (?P<FUNC_CALL_START>\[)
+        | (?P<FUNC_CALL_END>\])
+        | (?P<FUNC_NAME>{_FUNC_NAME_RE})(?=[\s\[\]]|\Z)
+        | (?P<FILE_NAME>{_FILE_NAME_RE})(?=[\s\[\]]|\Z)
+        | (?P<NUMBER>{_NUMBER_RE})(?=[\s\[\]]|\Z)
+    )
+""", re.VERBOSE)
+_TRAILING_SPACE_RE_PATTERN = re.compile(r"\s*\Z")
+_NON_SPACE_RE_PATTERN = re.compile(r"\s*(\S*)")
+_TOKEN_TYPES_BY_GROUP = {token_type.value: token_type for token_type in TokenType}
+
+
 class TokenParser:
+    """
+        Single pass scanner: tokens are matched one by one with single compiled regex.
+        Brackets are tokens on their own, so they need not be separated with whitespaces,
+        function names, file names and numbers must be followed by whitespace, bracket
+        or end of source.
+    """
 
     def __init__(self, source_str: str):
         self._source_str = source_str
-        self._func_name_re_pattern = re.compile(r"^[A-Z][A-Z_]*$")
-        self._file_name_re_pattern = re.compile(r"^[a-z][a-z0-9_\./]*$")
+        self._func_name_re_pattern = re.compile(f"^{_FUNC_NAME_RE}$")
+        self._file_name_re_pattern = re.compile(f"^{_FILE_NAME_RE}$")
 
     @property
     def source_str(self) -> str:
@@ -39,43 +65,36 @@ class TokenParser:
         return self._file_name_re_pattern
 
     def parse(self) -> t.Sequence[Token]:
-        tokens_values = self.source_str.split()
-        tokens = []
-
-        for token_value in tokens_values:
-            token_type = self._token_type_for_value_or_raise(token_value=token_value)
-            tokens.append(Token(
-                token_type=token_type,
-                token_value=token_value,
-            ))
-
-        return tokens
-
-    def _match_func_call_start_token(self, token_value: str) -> bool:
-        return token_value == "["
-
-    def _match_func_call_end_token(self, token_value: str) -> bool:
-        return token_value == "]"
-
-    def _match_func_name_token(self, token_value: str) -> bool:
-        return self.func_name_re_pattern.match(token_value) is not None
-
-    def _match_file_name_token(self, token_value: str) -> bool:
-        return self.file_name_re_pattern.match(token_value) is not None
-
-    def _token_type_for_value_or_raise(self, token_value: str) -> TokenType:
-        if self._match_func_call_start_token(token_value=token_value):
-            return TokenType.FUNC_CALL_START
-        elif self._match_func_call_end_token(token_value=token_value):
-            return TokenType.FUNC_CALL_END
-        elif self._match_func_name_token(token_value=token_value):
-            return TokenType.FUNC_NAME
-        elif self._match_file_name_token(token_value=token_value):
-            return TokenType.FILE_NAME
-        else:
-            raise SyntaxException(
-                reason=f"Unknown token: {token_value}",
-            )
+        return list(self.iter_tokens())
+
+    def iter_tokens(self) -> t.Iterator[Token]:
+        """
+            Lazily yields tokens of source string, `SyntaxException` is raised
+            as soon as unknown token is reached.
+        """
+        source_str = self.source_str
+        match = _TOKEN_RE_PATTERN.match
+        # Tokens are immutable, so equal tokens (brackets, repeated names) are created once.
+        tokens_by_value: t.Dict[str, Token] = {}
+        idx = 0
+        while True:
+            token_match = match(source_str, idx)
+            if token_match is None:
+                if _TRAILING_SPACE_RE_PATTERN.match(source_str, idx) is not None:
+                    return
+                unknown_token_value = _NON_SPACE_RE_PATTERN.match(source_str, idx).group(1)
+                raise SyntaxException(
+                    reason=f"Unknown token: {unknown_token_value}",
+                )
+            idx = token_match.end()
+            token_value = token_match.group(token_match.lastgroup)
+            token = tokens_by_value.get(token_value)
+            if token is None:
+                token = tokens_by_value[token_value] = Token(
+                    token_type=_TOKEN_TYPES_BY_GROUP[token_match.lastgroup],
+                    token_value=token_value,
+                )
+            yield token
 
 
 __all__ = (
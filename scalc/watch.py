@@ -0,0 +1,336 @@
+"""
+    Incremental re-evaluation of expression whose input files change.
+
+    `IncrementalEvaluator` keeps result of every node of expression DAG in memory.
+    When input files change, only nodes which depend on changed files are recomputed
+    from kept results of their children. Values appended to a text file are parsed
+    without re-reading the file and are added directly to results of the file
+    and of SUM nodes above it.
+"""
+import typing as t
+from dataclasses import dataclass
+
+from scalc.binary import is_binary_set_file
+from scalc.engines import SetEngine
+from scalc.exceptions import SetCalcException, RuntimeException
+from scalc.expressions import (
+    Expression,
+    LoadFromFileExpression,
+    FunctionCallExpression,
+    iter_post_order,
+)
+from scalc.functions import SumFunc
+from scalc.parsing import file_identity, is_compressed_file, parse_int_bytes_or_raise
+from scalc.sorted_sets import SortedListSet
+
+
+DEFAULT_WATCH_INTERVAL = 1.0
+
+# Count of last parsed bytes of file which must stay unchanged,
+# so new content of file is considered appended.
+_TAIL_SIZE = 64
+
+
+@dataclass
+class _FileState:
+    identity: t.Optional[t.Tuple[int, int, int]]
+    # Size of parsed part of file, None if appended values can not be parsed separately,
+    # e.g. file is binary set file, compressed file or its last line is not terminated.
+    parsed_size: t.Optional[int]
+    tail: bytes = b""
+
+
+@dataclass(frozen=True)
+class ResultUpdate:
+    added: t.AbstractSet[int]
+    removed: t.AbstractSet[int]
+
+    @property
+    def is_empty(self) -> bool:
+        return len(self.added) == 0 and len(self.removed) == 0
+
+
+@dataclass
+class WatchStats:
+    refreshes_count: int = 0
+    appended_files_count: int = 0
+    reloaded_files_count: int = 0
+    recomputed_nodes_count: int = 0
+
+
+def _read_tail(file_name: str, size: int) -> t.Tuple[t.Optional[int], bytes]:
+    """
+        :return: parsed size and tail of text file of given size.
+    """
+    try:
+        with open(file_name, "rb") as f:
+            f.seek(max(0, size - _TAIL_SIZE))
+            tail = f.read(size - f.tell())
+    except OSError:
+        return None, b""
+    if len(tail) != min(size, _TAIL_SIZE) or (tail and not tail.endswith(b"\n")):
+        return None, b""
+    return size, tail
+
+
+def _read_appended(
+    file_name: str,
+    state: _FileState,
+    identity: t.Tuple[int, int, int],
+) -> t.Optional[t.Tuple[t.List[int], int, bytes]]:
+    """
+        :return: values of lines appended to file since `state`, new parsed size and tail,
+            or None if file is not just appended.
+    """
+    if state.parsed_size is None or state.identity is None:
+        return None
+    inode, size, _ = identity
+    if inode != state.identity[0] or size < state.parsed_size:
+        return None
+
+    try:
+        with open(file_name, "rb") as f:
+            f.seek(state.parsed_size - len(state.tail))
+            if f.read(len(state.tail)) != state.tail:
+                return None
+            appended = f.read(size - state.parsed_size)
+    except OSError:
+        return None
+
+    # Unterminated last line is parsed when it is complete.
+    appended = appended[:appended.rfind(b"\n") + 1]
+    try:
+        values = parse_int_bytes_or_raise(file_name, appended)
+    except RuntimeException:
+        # File is reloaded, so error is reported with line number.
+        return None
+    parsed_size = state.parsed_size + len(appended)
+    tail = (state.tail + appended)[-_TAIL_SIZE:]
+    return values, parsed_size, tail
+
+
+def write_update(update: ResultUpdate, output: t.BinaryIO):
+    """
+        Writes removed values prefixed with `-`, then added values prefixed with `+`,
+        one per line, in ascending order.
+    """
+    lines = [f"-{value}\n" for value in sorted(update.removed)]
+    lines.extend(f"+{value}\n" for value in sorted(update.added))
+    output.write("".join(lines).encode())
+
+
+class IncrementalEvaluator:
+    """
+        Evaluates expression DAG and re-evaluates it when its input files change.
+        All children of every node are evaluated, so results of nodes are never skipped.
+    """
+
+    def __init__(self, root_expression: Expression, engine: SetEngine):
+        self._root_expression = root_expression
+        self._engine = engine
+        self._expressions = list(iter_post_order(root_expression))
+        self._results = {}
+        self._file_states = {}
+        # Root result of last successful evaluation, kept while expression is re-evaluated.
+        self._last_result = None
+        self._watch_stats = WatchStats()
+
+    @property
+    def root_expression(self) -> Expression:
+        return self._root_expression
+
+    @property
+    def engine(self) -> SetEngine:
+        return self._engine
+
+    @property
+    def watch_stats(self) -> WatchStats:
+        return self._watch_stats
+
+    @property
+    def result(self) -> t.Optional[t.AbstractSet[int]]:
+        """
+            :return: result of last evaluation, None if expression is not evaluated.
+        """
+        return self._results.get(id(self.root_expression))
+
+    def stats(self) -> t.Mapping[str, int]:
+        return {
+            "watch_refreshes_count": self.watch_stats.refreshes_count,
+            "watch_appended_files_count": self.watch_stats.appended_files_count,
+            "watch_reloaded_files_count": self.watch_stats.reloaded_files_count,
+            "watch_recomputed_nodes_count": self.watch_stats.recomputed_nodes_count,
+        }
+
+    def evaluate(self) -> t.AbstractSet[int]:
+        """
+            Evaluates every node of expression.
+        """
+        self._results.clear()
+        self._file_states.clear()
+        self.engine.prefetch([
+            expression.file_name
+            for expression in self._expressions
+            if isinstance(expression, LoadFromFileExpression)
+        ])
+        try:
+            for expression in self._expressions:
+                if isinstance(expression, LoadFromFileExpression):
+                    self._load(expression)
+                else:
+                    self._recompute(expression)
+        except SetCalcException:
+            self._results.clear()
+            raise
+        self._last_result = self.result
+        return self.result
+
+    def refresh(self) -> t.Optional[ResultUpdate]:
+        """
+            Re-evaluates nodes which depend on changed files.
+            If evaluation fails, expression is evaluated from scratch by next refresh.
+            :return: changes of result since last evaluation, None if result is not changed.
+                Whole result is added by the first evaluation.
+        """
+        self.watch_stats.refreshes_count += 1
+        previous_result = self._last_result
+        if self.result is None:
+            self.evaluate()
+            added = None
+        else:
+            changed_files = self._changed_files()
+            if not changed_files:
+                return None
+            try:
+                added = self._update(changed_files)
+            except SetCalcException:
+                self._results.clear()
+                raise
+            self._last_result = self.result
+
+        if previous_result is None:
+            return ResultUpdate(added=self.result, removed=frozenset())
+        if added is not None:
+            update = ResultUpdate(added=added, removed=frozenset())
+        else:
+            update = ResultUpdate(
+                added=self.result - previous_result,
+                removed=previous_result - self.result,
+            )
+        return None if update.is_empty else update
+
+    def _changed_files(self) -> t.Dict[str, t.Optional[t.List[int]]]:
+        """
+            :return: appended values of changed files, None for files which must be reloaded.
+        """
+        changed_files = {}
+        for file_name, state in self._file_states.items():
+            identity = file_identity(file_name)
+            if identity == state.identity:
+                continue
+            appended = _read_appended(file_name, state, identity) if identity is not None else None
+            if appended is None:
+                changed_files[file_name] = None
+                continue
+            values, state.parsed_size, state.tail = appended
+            state.identity = identity
+            if values:
+                self.watch_stats.appended_files_count += 1
+                changed_files[file_name] = values
+        return changed_files
+
+    def _update(
+        self,
+        changed_files: t.Mapping[str, t.Optional[t.List[int]]],
+    ) -> t.Optional[t.AbstractSet[int]]:
+        """
+            :return: values added to result, None if result is replaced.
+        """
+        # Values added to result of node, None if result of node is replaced.
+        added_values = {}
+        for expression in self._expressions:
+            if isinstance(expression, LoadFromFileExpression):
+                if expression.file_name not in changed_files:
+                    continue
+                appended_values = changed_files[expression.file_name]
+                restriction = expression.restriction
+                if appended_values is not None and restriction is not None:
+                    # Appended values may displace values of limited file, so it is reloaded.
+                    appended_values = (
+                        list(filter(restriction.__contains__, appended_values))
+                        if restriction.limit is None
+                        else None
+                    )
+                appended_values = [set(appended_values)] if appended_values is not None else None
+            else:
+                changed_children = [
+                    child for child in expression.children if id(child) in added_values
+                ]
+                if not changed_children:
+                    continue
+                appended_values = None
+                if (
+                    isinstance(expression, FunctionCallExpression)
+                    and isinstance(expression.func, SumFunc)
+                    and all(added_values[id(child)] is not None for child in changed_children)
+                ):
+                    appended_values = [added_values[id(child)] for child in changed_children]
+
+            result = self._results[id(expression)]
+            if appended_values is not None and isinstance(result, set):
+                added = set().union(*appended_values) - result
+                if added:
+                    result |= added
+                    added_values[id(expression)] = added
+                continue
+
+            if isinstance(expression, LoadFromFileExpression):
+                self._load(expression)
+            else:
+                self._recompute(expression)
+                self.watch_stats.recomputed_nodes_count += 1
+            added_values[id(expression)] = None
+
+        if id(self.root_expression) not in added_values:
+            return frozenset()
+        return added_values[id(self.root_expression)]
+
+    def _load(self, expression: LoadFromFileExpression):
+        file_name = expression.file_name
+        identity = file_identity(file_name)
+        if file_name in self._file_states:
+            self.watch_stats.reloaded_files_count += 1
+        result = expression.evaluate_node(self.engine, [])
+        if isinstance(result, SortedListSet):
+            # Values appended to file are added to result in place.
+            result = set(result)
+        self._results[id(expression)] = result
+
+        parsed_size, tail = None, b""
+        if (
+            identity is not None
+            and not is_binary_set_file(file_name)
+            and not is_compressed_file(file_name)
+        ):
+            parsed_size, tail = _read_tail(file_name, identity[1])
+        self._file_states[file_name] = _FileState(
+            identity=identity,
+            parsed_size=parsed_size,
+            tail=tail,
+        )
+
+    def _recompute(self, expression: Expression):
+        args = [self._results[id(child)] for child in expression.children]
+        result = expression.evaluate_node(self.engine, args)
+        if isinstance(result, set) and any(result is arg for arg in args):
+            # Results are updated in place, so every node owns its result.
+            result = set(result)
+        self._results[id(expression)] = result
+
+
+__all__ = (
+    ResultUpdate.__name__,
+    WatchStats.__name__,
+    IncrementalEvaluator.__name__,
+    write_update.__name__,
+)
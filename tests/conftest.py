@@ -0,0 +1,46 @@
+import typing as t
+
+import pytest
+
+from scalc.compiler import Compiler
+from scalc.engines import SetEngine
+from scalc.executor import Executor
+from scalc.expressions import Expression
+from scalc.functions import load_functions
+from scalc.tokens import TokenParser
+
+
+FUNCTIONS_MAPPING = load_functions()
+
+
+def write_values(path: str, values: t.Iterable[int]):
+    """
+        Writes text file with one value per line.
+    """
+    with open(path, "w") as f:
+        f.write("".join(f"{value}\n" for value in values))
+
+
+def compile_source(source_str: str) -> Expression:
+    return Compiler(
+        tokens=TokenParser(source_str=source_str).iter_tokens(),
+        functions_mapping=FUNCTIONS_MAPPING,
+    ).compile()
+
+
+def create_executor(source_str: str, engine: SetEngine) -> Executor:
+    return Executor(
+        root_expression=compile_source(source_str),
+        functions_mapping=FUNCTIONS_MAPPING,
+        engine=engine,
+    )
+
+
+@pytest.fixture
+def workdir(tmpdir, monkeypatch):
+    """
+        Temporary directory which is the current directory of test,
+        so files are referred by their names in expressions.
+    """
+    monkeypatch.chdir(tmpdir)
+    return tmpdir
@@ -0,0 +1,31 @@
+import json
+
+from benchmarks.__main__ import main, compare_results
+
+
+def test_benchmarks_should_write_results_and_compare_with_baseline(tmpdir):
+    output = str(tmpdir.join("results.json"))
+
+    assert main(["--filter", "set", "--scale", "0.01", "--repeat", "1", "--output", output]) == 0
+    with open(output) as f:
+        results = json.load(f)["results"]
+    assert "parse/set" in results
+    assert "ops/int/set" in results
+    assert all(result["time_min"] > 0 for result in results.values())
+
+
+def test_compare_results_should_report_regressions():
+    baseline = {
+        "a": {"time_min": 1.0, "peak_memory": 100},
+        "b": {"time_min": 1.0, "peak_memory": 100},
+    }
+    results = {
+        "a": {"time_min": 1.1, "peak_memory": 100},
+        "b": {"time_min": 1.5, "peak_memory": 200},
+        "c": {"time_min": 1.0, "peak_memory": 100},
+    }
+
+    assert compare_results(results, baseline, threshold=0.2) == [
+        "b: time_min is 1.50x of baseline",
+        "b: peak_memory is 2.00x of baseline",
+    ]
@@ -0,0 +1,132 @@
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.binary import (
+    BinarySetFile,
+    Encoding,
+    is_binary_set_file,
+    write_binary_set,
+)
+from scalc.engines import PythonSetEngine, SortedStreamEngine
+from scalc.exceptions import RuntimeException
+
+
+_VALUES = (-2 ** 63, -300, -1, 0, 1, 127, 128, 300, 70000, 2 ** 40, 2 ** 63 - 1)
+
+
+@pytest.mark.parametrize("encoding", tuple(Encoding))
+@pytest.mark.parametrize("values", (_VALUES, (), (5, )))
+def test_write_and_read_binary_set_should_return_same_values(
+    tmpdir,
+    encoding: Encoding,
+    values: t.Sequence[int],
+):
+    file_name = str(tmpdir.join("a.sset"))
+    assert write_binary_set(file_name, values, encoding=encoding, block_size=3) == len(values)
+
+    assert is_binary_set_file(file_name)
+    with BinarySetFile(file_name) as set_file:
+        assert set_file.encoding == encoding
+        assert len(set_file) == len(values)
+        assert list(set_file) == list(values)
+
+
+@pytest.mark.parametrize(
+    "values",
+    (
+        (1, 3, 2),
+        (1, 1),
+        (2 ** 63, ),
+    ),
+)
+def test_write_binary_set_with_invalid_values_should_raise(tmpdir, values: t.Sequence[int]):
+    with pytest.raises(RuntimeException):
+        write_binary_set(str(tmpdir.join("a.sset")), values)
+
+
+@pytest.mark.parametrize("encoding", tuple(Encoding))
+def test_truncated_binary_set_file_should_raise(tmpdir, encoding: Encoding):
+    file_name = str(tmpdir.join("a.sset"))
+    write_binary_set(file_name, _VALUES, encoding=encoding, block_size=3)
+    with open(file_name, "rb") as f:
+        data = f.read()
+
+    for size in (40, len(data) - 1):
+        with open(file_name, "wb") as f:
+            f.write(data[:size])
+        for load in (PythonSetEngine().load, lambda name: list(SortedStreamEngine().iterate(name))):
+            with pytest.raises(RuntimeException, match="is not a valid binary set file"):
+                load(file_name)
+
+
+def test_truncated_binary_set_file_should_raise_in_numpy_engine(tmpdir):
+    pytest.importorskip("numpy")
+    from scalc.numpy_engine import NumpySetEngine
+
+    file_name = str(tmpdir.join("a.sset"))
+    write_binary_set(file_name, [1, 2, 3])
+    with open(file_name, "rb+") as f:
+        f.truncate(40)
+
+    with pytest.raises(RuntimeException, match="is not a valid binary set file"):
+        NumpySetEngine().load(file_name)
+
+
+def test_is_binary_set_file_for_text_file_should_return_false():
+    assert not is_binary_set_file("tests/resources/valid/a.txt")
+    assert not is_binary_set_file("tests/resources/unexistent")
+
+
+@pytest.mark.parametrize("encoding", tuple(Encoding))
+def test_engines_should_load_binary_set_files(tmpdir, encoding: Encoding):
+    file_name = str(tmpdir.join("a.sset"))
+    write_binary_set(file_name, _VALUES, encoding=encoding)
+
+    assert PythonSetEngine().load(file_name) == set(_VALUES)
+    assert list(SortedStreamEngine().iterate(file_name)) == list(_VALUES)
+
+
+def test_numpy_engine_should_map_raw_binary_set_file(tmpdir):
+    pytest.importorskip("numpy")
+    from scalc.numpy_engine import NumpySetEngine
+
+    file_name = str(tmpdir.join("a.sset"))
+    write_binary_set(file_name, _VALUES)
+
+    result = NumpySetEngine().load(file_name)
+    assert not result.values.flags.owndata
+    assert list(result) == list(_VALUES)
+
+
+@pytest.mark.parametrize("block_size", ("0", "-1", "x", "5000000000"))
+def test_convert_with_invalid_block_size_should_exit(tmpdir, block_size: str):
+    with pytest.raises(SystemExit):
+        main([
+            "--convert", "tests/resources/valid/a.txt", str(tmpdir.join("a.sset")),
+            "--compress", "--block-size", block_size,
+        ])
+
+
+@pytest.mark.parametrize("block_size", (0, -1, 2 ** 32))
+def test_binary_set_writer_with_invalid_block_size_should_raise(tmpdir, block_size: int):
+    output_file = tmpdir.join("a.sset")
+    output_file.write("1\n")
+
+    with pytest.raises(RuntimeException, match="Block size"):
+        write_binary_set(str(output_file), (1, 2), encoding=Encoding.DELTA_VARINT, block_size=block_size)
+    # Existing file is not touched.
+    assert output_file.read() == "1\n"
+
+
+def test_convert_of_missing_file_should_not_create_output(tmpdir, capsys):
+    output_file = tmpdir.join("a.sset")
+
+    assert main(["--convert", str(tmpdir.join("missing.txt")), str(output_file)]) == 0
+    assert "not found" in capsys.readouterr().out
+    assert not output_file.exists()
+
+    with pytest.raises(RuntimeException):
+        write_binary_set(str(output_file), (2, 1))
+    assert not output_file.exists()
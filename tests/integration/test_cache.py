@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from scalc.cache import CachingEngine, FileCache
+from scalc.engines import PythonSetEngine, SortedStreamEngine
+from tests.conftest import write_values
+
+
+@pytest.fixture
+def cache(tmpdir) -> FileCache:
+    return FileCache(cache_dir=str(tmpdir.join("cache")))
+
+
+def test_load_should_serve_unchanged_files_from_cache(tmpdir, cache: FileCache):
+    file_name = str(tmpdir.join("a.txt"))
+    write_values(file_name, (3, 1, 2))
+    engine = CachingEngine(engine=PythonSetEngine(), cache=cache)
+
+    assert engine.load(file_name) == {1, 2, 3}
+    assert engine.load(file_name) == {1, 2, 3}
+    assert cache.cache_stats.misses_count == 1
+    assert cache.cache_stats.hits_count == 1
+
+    write_values(file_name, (3, 1, 2, 10))
+    os.utime(file_name, ns=(0, 0))
+    assert engine.load(file_name) == {1, 2, 3, 10}
+    assert cache.cache_stats.misses_count == 2
+
+
+def test_store_should_evict_least_recently_used_entries(tmpdir):
+    file_names = [str(tmpdir.join(f"{idx}.txt")) for idx in range(3)]
+    for file_name in file_names:
+        write_values(file_name, range(100))
+    cache = FileCache(cache_dir=str(tmpdir.join("cache")), max_size=2000)
+    engine = CachingEngine(engine=PythonSetEngine(), cache=cache)
+
+    engine.load(file_names[0])
+    engine.load(file_names[1])
+    engine.load(file_names[0])
+    engine.load(file_names[2])
+
+    assert cache.cache_stats.evictions_count == 1
+    assert cache.size() <= 2000
+    assert cache.lookup(file_names[0]) is not None
+    assert cache.lookup(file_names[1]) is None
+
+
+def test_iterate_should_store_only_fully_consumed_files(tmpdir, cache: FileCache):
+    file_name = str(tmpdir.join("a.txt"))
+    write_values(file_name, range(10))
+    engine = CachingEngine(engine=SortedStreamEngine(), cache=cache)
+
+    values = engine.iterate(file_name)
+    assert next(values) == 0
+    values.close()
+    assert cache.cache_stats.stores_count == 0
+    assert os.listdir(cache.cache_dir) == []
+
+    assert list(engine.iterate(file_name)) == list(range(10))
+    assert list(engine.iterate(file_name)) == list(range(10))
+    assert cache.cache_stats.stores_count == 1
+    assert cache.cache_stats.hits_count == 1
+
+
+def test_load_values_out_of_int64_should_not_be_cached(tmpdir, cache: FileCache):
+    file_name = str(tmpdir.join("a.txt"))
+    write_values(file_name, (1, 2 ** 70))
+    engine = CachingEngine(engine=PythonSetEngine(), cache=cache)
+
+    assert engine.load(file_name) == {1, 2 ** 70}
+    assert cache.cache_stats.stores_count == 0
+    assert os.listdir(cache.cache_dir) == []
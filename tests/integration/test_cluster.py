@@ -0,0 +1,324 @@
+import json
+import os
+import random
+import socket
+import socketserver
+import threading
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.binary import write_binary_set
+from scalc.cluster import (
+    ClusterExecutor,
+    ClusterPartition,
+    LocalCluster,
+    WorkerService,
+    create_worker_server,
+    load_cluster_config,
+    save_cluster_config,
+)
+from scalc.engines import PythonSetEngine
+from scalc.exceptions import RuntimeException
+from scalc.executor import Executor
+from scalc.plans import serialize_plan
+from scalc.restrictions import Restriction
+from tests.conftest import FUNCTIONS_MAPPING, compile_source
+
+
+_SOURCE_STRS = (
+    "[ INT f0.txt f1.txt ]",
+    "[ SUM [ INT f0.txt f1.txt ] [ DIF f0.txt f2.sset ] ]",
+)
+_BOUNDARIES = (-300, 400)
+
+
+def _write_shard(shard_dir: str, seed: int):
+    os.makedirs(shard_dir, exist_ok=True)
+    rnd = random.Random(seed)
+    for idx in range(2):
+        with open(os.path.join(shard_dir, f"f{idx}.txt"), "w") as f:
+            for _ in range(1000):
+                f.write(f"{rnd.randrange(-1000, 1000)}\n")
+    write_binary_set(
+        os.path.join(shard_dir, "f2.sset"),
+        sorted({rnd.randrange(-1000, 1000) for _ in range(300)}),
+    )
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    _write_shard(".", seed=42)
+    _write_shard("s1", seed=43)
+
+
+def _expected(source_str: str, shard_dir: str = ".") -> t.List[int]:
+    cwd = os.getcwd()
+    os.chdir(shard_dir)
+    try:
+        executor = Executor(
+            root_expression=compile_source(source_str),
+            functions_mapping=FUNCTIONS_MAPPING,
+            engine=PythonSetEngine(),
+        )
+        return list(executor.execute_sorted())
+    finally:
+        os.chdir(cwd)
+
+
+def _request_line(source_str: str, **kwargs) -> str:
+    return json.dumps({
+        "version": 1,
+        "plan": serialize_plan(compile_source(source_str), FUNCTIONS_MAPPING),
+        **kwargs,
+    })
+
+
+def _range_partitions(workers: t.Sequence[str], shard: str = "") -> t.List[ClusterPartition]:
+    bounds = [None, *_BOUNDARIES, None]
+    return [
+        ClusterPartition(workers=tuple(workers), shard=shard, lower=lower, upper=upper)
+        for lower, upper in zip(bounds, bounds[1:])
+    ]
+
+
+def _cluster_executor(source_str: str, partitions: t.Sequence[ClusterPartition], **kwargs):
+    return ClusterExecutor(
+        root_expression=compile_source(source_str),
+        functions_mapping=FUNCTIONS_MAPPING,
+        partitions=partitions,
+        timeout=10.0,
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def worker_service() -> WorkerService:
+    return WorkerService(functions_mapping=FUNCTIONS_MAPPING, engine=PythonSetEngine())
+
+
+@pytest.fixture
+def worker(worker_service: WorkerService) -> t.Iterator[str]:
+    with create_worker_server("127.0.0.1:0", worker_service) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            yield server.address
+        finally:
+            server.shutdown()
+            thread.join()
+
+
+def _dead_address() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        host, port = sock.getsockname()
+    return f"{host}:{port}"
+
+
+class _BrokenWorkerHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        # Responds with a few values of the real response and fails,
+        # possibly in the middle of the next value.
+        request_line = self.rfile.readline().decode()
+        lines = list(self.server.worker_service.respond(request_line))
+        for line in lines[:3]:
+            self.wfile.write(line + b"\n")
+        if self.server.cut_line:
+            self.wfile.write(lines[3][:-1])
+
+
+@pytest.mark.parametrize("source_str", _SOURCE_STRS)
+def test_worker_service_should_respond_with_values_of_range(
+    source_str: str,
+    worker_service: WorkerService,
+):
+    expected = [value for value in _expected(source_str, "s1") if -300 <= value < 400]
+
+    lines = list(worker_service.respond(_request_line(source_str, shard="s1", lower=-300, upper=400)))
+    assert lines == [str(value).encode() for value in expected] + [b"END"]
+
+    lines = list(worker_service.respond(_request_line(source_str, lower=-300, upper=400, count=True)))
+    assert lines == [
+        str(len([value for value in _expected(source_str) if -300 <= value < 400])).encode(),
+        b"END",
+    ]
+
+
+def test_worker_service_should_push_range_into_loading():
+    class RecordingEngine(PythonSetEngine):
+        def __init__(self):
+            super().__init__()
+            self.restrictions = []
+
+        def load_restricted(self, file_name: str, restriction: Restriction) -> t.AbstractSet[int]:
+            self.restrictions.append(restriction)
+            return super().load_restricted(file_name, restriction)
+
+    engine = RecordingEngine()
+    worker_service = WorkerService(functions_mapping=FUNCTIONS_MAPPING, engine=engine)
+
+    lines = list(worker_service.respond(_request_line(_SOURCE_STRS[1], lower=-300, upper=400)))
+    assert lines[:-1] == [str(value).encode() for value in _expected(_SOURCE_STRS[1]) if -300 <= value < 400]
+    # Every file (f0.txt is shared) is loaded restricted to range of partition.
+    assert engine.restrictions == [Restriction(lower=-300, upper=400)] * 3
+
+
+@pytest.mark.parametrize(
+    "request_line, reason",
+    [
+        ("not json", "Invalid request."),
+        (json.dumps({"version": 1}), "Invalid request."),
+        (json.dumps({"version": 2, "plan": {}}), "Unsupported protocol version: 2."),
+        (_request_line("f0.txt", lower="0"), "Invalid request."),
+    ],
+)
+def test_worker_service_should_respond_with_error_to_invalid_request(
+    request_line: str,
+    reason: str,
+    worker_service: WorkerService,
+):
+    assert list(worker_service.respond(request_line)) == [f"ERROR {reason}".encode()]
+
+
+def test_worker_service_should_respond_with_error_of_expression(worker_service: WorkerService):
+    assert list(worker_service.respond(_request_line("[ SUM f0.txt missing.txt ]", shard="s1"))) == [
+        f"ERROR File '{os.path.join('.', 's1', 'missing.txt')}' not found.".encode(),
+    ]
+    assert list(worker_service.respond(_request_line("f0.txt", shard="../s1"))) == [
+        b"ERROR Invalid shard: '../s1'.",
+    ]
+
+
+@pytest.mark.parametrize("file_name", ("/etc/passwd", "../f0.txt", "s1/../../f0.txt", ".."))
+def test_worker_service_should_reject_file_names_outside_of_shard(
+    file_name: str,
+    worker_service: WorkerService,
+):
+    request = json.loads(_request_line("f0.txt", shard="s1"))
+    request["plan"] = json.loads(json.dumps(request["plan"]).replace('"f0.txt"', json.dumps(file_name)))
+
+    assert list(worker_service.respond(json.dumps(request))) == [
+        f"ERROR Invalid file name: '{file_name}'.".encode(),
+    ]
+
+
+@pytest.mark.parametrize("source_str", _SOURCE_STRS)
+def test_cluster_executor_should_combine_results_of_partitions(source_str: str, worker: str):
+    executor = _cluster_executor(source_str, _range_partitions([worker]))
+
+    assert executor.is_ordered
+    assert list(executor.execute_sorted()) == _expected(source_str)
+    assert executor.execute() == set(_expected(source_str))
+    assert executor.count() == len(_expected(source_str))
+    assert executor.stats() == {"cluster_requests_count": 9, "cluster_worker_failures_count": 0}
+
+
+@pytest.mark.parametrize("source_str", _SOURCE_STRS)
+def test_cluster_executor_should_merge_results_of_shards(source_str: str, worker: str):
+    # Partitions of different shards with the same range.
+    executor = _cluster_executor(
+        source_str,
+        [ClusterPartition(workers=(worker, )), ClusterPartition(workers=(worker, ), shard="s1")],
+    )
+
+    expected = sorted(set(_expected(source_str)) | set(_expected(source_str, "s1")))
+    assert not executor.is_ordered
+    assert list(executor.execute_sorted()) == expected
+    assert executor.count() == len(expected)
+
+
+def test_cluster_executor_should_retry_partition_by_next_worker(worker: str):
+    executor = _cluster_executor(_SOURCE_STRS[0], _range_partitions([_dead_address(), worker]))
+
+    assert list(executor.execute_sorted()) == _expected(_SOURCE_STRS[0])
+    assert executor.cluster_stats.worker_failures_count == 3
+    assert executor.cluster_stats.requests_count == 6
+
+
+@pytest.mark.parametrize("cut_line", (False, True))
+def test_cluster_executor_should_not_request_received_values_again(
+    worker: str,
+    worker_service: WorkerService,
+    cut_line: bool,
+):
+    with socketserver.TCPServer(("127.0.0.1", 0), _BrokenWorkerHandler) as broken_server:
+        broken_server.worker_service = worker_service
+        broken_server.cut_line = cut_line
+        thread = threading.Thread(target=broken_server.serve_forever)
+        thread.start()
+        try:
+            host, port = broken_server.server_address
+            executor = _cluster_executor(
+                _SOURCE_STRS[0],
+                [ClusterPartition(workers=(f"{host}:{port}", worker))],
+            )
+            assert list(executor.execute_sorted()) == _expected(_SOURCE_STRS[0])
+        finally:
+            broken_server.shutdown()
+            thread.join()
+
+    assert executor.cluster_stats.worker_failures_count == 1
+
+
+def test_cluster_executor_should_fail_after_max_attempts():
+    executor = _cluster_executor(
+        _SOURCE_STRS[0],
+        [ClusterPartition(workers=(_dead_address(), ))],
+        max_attempts=2,
+    )
+
+    with pytest.raises(RuntimeException, match="failed after 2 attempts"):
+        executor.execute()
+    assert executor.cluster_stats.worker_failures_count == 2
+
+
+def test_cluster_executor_should_not_retry_errors_of_expression(worker: str):
+    executor = _cluster_executor(
+        "[ SUM f0.txt missing.txt ]",
+        [ClusterPartition(workers=(worker, worker))],
+    )
+
+    with pytest.raises(RuntimeException, match="missing.txt"):
+        executor.execute()
+    assert executor.cluster_stats.requests_count == 1
+
+
+def test_cluster_config_should_be_saved_and_loaded():
+    partitions = _range_partitions(["127.0.0.1:1", "unix:/tmp/worker.sock"], shard="s1")
+    save_cluster_config("cluster.json", partitions)
+
+    assert load_cluster_config("cluster.json") == partitions
+
+    with open("invalid.json", "w") as f:
+        f.write("{}")
+    with pytest.raises(RuntimeException):
+        load_cluster_config("invalid.json")
+
+
+def test_local_cluster_should_survive_killed_worker():
+    with LocalCluster(data_dir=".", workers_count=2, start_timeout=10.0) as cluster:
+        partitions = cluster.partitions(_BOUNDARIES)
+        assert len(cluster.addresses) == 2
+
+        cluster.kill(0)
+        executor = _cluster_executor(_SOURCE_STRS[1], partitions)
+
+        assert list(executor.execute_sorted()) == _expected(_SOURCE_STRS[1])
+        assert executor.cluster_stats.worker_failures_count > 0
+
+
+def test_main_should_evaluate_expression_by_cluster(worker: str, capsys):
+    save_cluster_config("cluster.json", _range_partitions([worker]))
+    expected = _expected(_SOURCE_STRS[1])
+
+    assert main(["--cluster", "cluster.json", _SOURCE_STRS[1]]) == 0
+    assert capsys.readouterr().out == "".join(f"{value}\n" for value in expected)
+
+    assert main(["--cluster", "cluster.json", "--count", _SOURCE_STRS[1]]) == 0
+    assert capsys.readouterr().out == f"{len(expected)}\n"
+
+    with pytest.raises(SystemExit):
+        main(["--cluster", "cluster.json", "--watch", _SOURCE_STRS[1]])
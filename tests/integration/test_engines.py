@@ -0,0 +1,177 @@
+import gzip
+import lzma
+import typing as t
+
+import pytest
+
+from scalc.bitmap import BitmapEngine, AdaptiveEngine
+from scalc.engines import SetEngine, PythonSetEngine, SortedStreamEngine
+from scalc.exceptions import RuntimeException
+from scalc.sorted_sets import SortedListSet
+
+
+_PATH_TO_RESOURCES = "tests/resources"
+
+_PATH_TO_VALID_FILES = f"{_PATH_TO_RESOURCES}/valid"
+_PATH_TO_VALID_FILE_A = f"{_PATH_TO_VALID_FILES}/a.txt"
+_PATH_TO_VALID_FILE_B = f"{_PATH_TO_VALID_FILES}/b.txt"
+
+_PATH_TO_INVALID_FILES = f"{_PATH_TO_RESOURCES}/invalid"
+_PATH_TO_INVALID_FILE_A = f"{_PATH_TO_INVALID_FILES}/a.txt"
+_PATH_TO_UNSORTED_FILE = f"{_PATH_TO_INVALID_FILES}/unsorted.txt"
+
+_PATH_TO_UNEXISTENT_FILE = f"{_PATH_TO_RESOURCES}/unexistent"
+
+
+def _numpy_engine() -> SetEngine:
+    pytest.importorskip("numpy")
+    from scalc.numpy_engine import NumpySetEngine
+    return NumpySetEngine()
+
+
+_ENGINE_FACTORIES = (
+    PythonSetEngine,
+    _numpy_engine,
+    SortedStreamEngine,
+    BitmapEngine,
+    AdaptiveEngine,
+)
+
+
+@pytest.mark.parametrize("engine_factory", _ENGINE_FACTORIES)
+@pytest.mark.parametrize(
+    ("file_name", "expected_result"),
+    (
+        (_PATH_TO_VALID_FILE_A, {1, 2, 3}),
+        (_PATH_TO_VALID_FILE_B, {2, 3, 4}),
+    ),
+)
+def test_load_valid_file_should_return_valid_result(
+    engine_factory: t.Callable[[], SetEngine],
+    file_name: str,
+    expected_result: t.AbstractSet[int],
+):
+    engine = engine_factory()
+    assert engine.load(file_name) == expected_result
+
+
+@pytest.mark.parametrize("engine_factory", _ENGINE_FACTORIES)
+@pytest.mark.parametrize(
+    ("file_name", "expected_reason"),
+    (
+        (
+            _PATH_TO_INVALID_FILE_A,
+            (
+                f"Invalid integer: 'invalid number'"
+                f" in file: '{_PATH_TO_INVALID_FILE_A}' at line: 2."
+            ),
+        ),
+        (
+            _PATH_TO_UNEXISTENT_FILE,
+            f"File '{_PATH_TO_UNEXISTENT_FILE}' not found.",
+        ),
+    ),
+)
+def test_load_invalid_file_should_raise(
+    engine_factory: t.Callable[[], SetEngine],
+    file_name: str,
+    expected_reason: str,
+):
+    engine = engine_factory()
+    with pytest.raises(RuntimeException) as exc_info:
+        engine.load(file_name)
+    assert exc_info.value.reason == expected_reason
+
+
+@pytest.mark.parametrize("engine_factory", _ENGINE_FACTORIES)
+def test_iterate_valid_file_should_return_sorted_values(
+    engine_factory: t.Callable[[], SetEngine],
+):
+    engine = engine_factory()
+    assert list(engine.iterate(_PATH_TO_VALID_FILE_A)) == [1, 2, 3]
+
+
+def test_sorted_stream_engine_iterate_unsorted_file_should_raise():
+    engine = SortedStreamEngine()
+    with pytest.raises(RuntimeException):
+        list(engine.iterate(_PATH_TO_UNSORTED_FILE))
+
+
+@pytest.mark.parametrize(
+    ("density_threshold", "expected_stats"),
+    (
+        (0.5, {"bitmap_files_count": 1, "set_files_count": 0}),
+        (1.5, {"bitmap_files_count": 0, "set_files_count": 1}),
+    ),
+)
+def test_adaptive_engine_should_choose_representation_by_density(
+    density_threshold: float,
+    expected_stats: t.Mapping[str, int],
+):
+    engine = AdaptiveEngine(density_threshold=density_threshold)
+    assert engine.load(_PATH_TO_VALID_FILE_A) == {1, 2, 3}
+    assert engine.stats() == expected_stats
+
+
+@pytest.mark.parametrize("engine_factory", _ENGINE_FACTORIES)
+@pytest.mark.parametrize(("suffix", "compress"), ((".gz", gzip.compress), (".xz", lzma.compress)))
+def test_load_compressed_file_should_return_valid_result(
+    tmpdir,
+    engine_factory: t.Callable[[], SetEngine],
+    suffix: str,
+    compress: t.Callable[[bytes], bytes],
+):
+    path = tmpdir.join(f"a.txt{suffix}")
+    path.write_binary(compress(b"1\n2\n2\n3\n"))
+
+    engine = engine_factory()
+    assert engine.load(str(path)) == {1, 2, 3}
+    assert list(engine.iterate(str(path))) == [1, 2, 3]
+
+
+def test_python_set_engine_should_remember_order_of_files(tmpdir):
+    path = tmpdir.join("a.txt")
+    path.write("1\n2\n2\n3\n")
+    engine = PythonSetEngine()
+
+    assert engine.is_sorted(str(path)) is None
+    assert isinstance(engine.load(str(path)), SortedListSet)
+    assert isinstance(engine.load(_PATH_TO_UNSORTED_FILE), set)
+    assert engine.is_sorted(str(path)) is True
+    assert engine.is_sorted(_PATH_TO_UNSORTED_FILE) is False
+    assert engine.stats() == {"sorted_files_count": 1, "unsorted_files_count": 1, "seeks_count": 0}
+
+    path.write("3\n1\n2\n10\n")
+    assert engine.is_sorted(str(path)) is None
+    assert engine.load(str(path)) == {1, 2, 3, 10}
+    assert engine.is_sorted(str(path)) is False
+
+
+@pytest.mark.parametrize("engine_factory", _ENGINE_FACTORIES)
+def test_load_file_with_unicode_digits_should_return_valid_result(
+    tmpdir,
+    engine_factory: t.Callable[[], SetEngine],
+):
+    path = tmpdir.join("a.txt")
+    # Arabic-Indic digit three is parsed by `int`, but not by NumPy.
+    path.write_binary("1\n٣\n".encode())
+
+    assert engine_factory().load(str(path)) == {1, 3}
+
+
+def test_numpy_engine_should_parse_file_in_blocks(tmpdir):
+    pytest.importorskip("numpy")
+    from scalc.numpy_engine import NumpySetEngine
+    path = tmpdir.join("a.txt")
+    path.write("".join(f"{value}\n" for value in range(1000, 0, -1)) + "1001")
+
+    assert NumpySetEngine(chunk_size=64).load(str(path)) == set(range(1, 1002))
+
+    path.write("1\n2\n" * 100 + "x\n")
+    with pytest.raises(RuntimeException) as exc_info:
+        NumpySetEngine(chunk_size=64).load(str(path))
+    assert exc_info.value.reason == f"Invalid integer: 'x' in file: '{path}' at line: 200."
+
+    path.write(f"1\n{2 ** 64}\n")
+    with pytest.raises(RuntimeException, match="out of int64 range"):
+        NumpySetEngine(chunk_size=64).load(str(path))
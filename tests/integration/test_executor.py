@@ -2,6 +2,8 @@ import typing as t
 
 import pytest
 
+from scalc.engines import PythonSetEngine, SetEngine, SortedStreamEngine
+from scalc.external import ExternalSortEngine
 from scalc.executor import Executor
 from scalc.functions import load_functions
 from scalc.expressions import FunctionCallExpression, LoadFromFileExpression, Expression
@@ -103,3 +105,124 @@ def test_execute_should_return_valid_result(
 
     execute_result = executor.execute()
     assert execute_result == execute_result
+
+
+def test_execute_sorted_with_streaming_engine_should_return_sorted_result():
+    root_expression = FunctionCallExpression(
+        func=_FUNCTIONS_MAPPING["SUM"],
+        func_args=(
+            FunctionCallExpression(
+                func=_FUNCTIONS_MAPPING["DIF"],
+                func_args=(
+                    LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_A),
+                    LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_B),
+                ),
+            ),
+            FunctionCallExpression(
+                func=_FUNCTIONS_MAPPING["INT"],
+                func_args=(
+                    LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_B),
+                    LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_C),
+                ),
+            ),
+        ),
+    )
+    executor = Executor(
+        root_expression=root_expression,
+        functions_mapping=_FUNCTIONS_MAPPING,
+        engine=SortedStreamEngine(),
+    )
+
+    assert list(executor.execute_sorted()) == [1, 3, 4]
+
+
+class _CountingEngine(PythonSetEngine):
+
+    def __init__(self):
+        super().__init__()
+        self.loaded_file_names = []
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        self.loaded_file_names.append(file_name)
+        return super().load(file_name)
+
+
+def test_execute_shared_expression_should_load_each_file_once():
+    load_a = LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_A)
+    load_b = LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_B)
+    int_expression = FunctionCallExpression(
+        func=_FUNCTIONS_MAPPING["INT"],
+        func_args=(load_a, load_b),
+    )
+    root_expression = FunctionCallExpression(
+        func=_FUNCTIONS_MAPPING["SUM"],
+        func_args=(
+            int_expression,
+            FunctionCallExpression(
+                func=_FUNCTIONS_MAPPING["DIF"],
+                func_args=(load_a, load_b),
+            ),
+            int_expression,
+        ),
+    )
+    engine = _CountingEngine()
+    executor = Executor(
+        root_expression=root_expression,
+        functions_mapping=_FUNCTIONS_MAPPING,
+        engine=engine,
+    )
+
+    assert executor.execute() == {1, 2, 3}
+    assert engine.loaded_file_names == [_PATH_TO_VALID_FILE_A, _PATH_TO_VALID_FILE_B]
+
+
+def test_execute_short_circuited_expression_should_skip_remaining_args():
+    root_expression = FunctionCallExpression(
+        func=_FUNCTIONS_MAPPING["DIF"],
+        func_args=(
+            FunctionCallExpression(
+                func=_FUNCTIONS_MAPPING["INT"],
+                func_args=(
+                    LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_A),
+                    FunctionCallExpression(
+                        func=_FUNCTIONS_MAPPING["DIF"],
+                        func_args=(
+                            LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_B),
+                            LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_B),
+                        ),
+                    ),
+                    LoadFromFileExpression(file_name=_PATH_TO_UNEXISTENT_FILE),
+                ),
+                short_circuit=True,
+            ),
+            LoadFromFileExpression(file_name=_PATH_TO_UNEXISTENT_FILE),
+        ),
+        short_circuit=True,
+    )
+    executor = Executor(
+        root_expression=root_expression,
+        functions_mapping=_FUNCTIONS_MAPPING,
+    )
+
+    assert executor.execute() == set()
+    assert root_expression.evaluate() == set()
+
+
+@pytest.mark.parametrize("engine_factory", (PythonSetEngine, SortedStreamEngine, ExternalSortEngine))
+def test_execute_sorted_deeply_nested_expression_should_return_sorted_result(
+    engine_factory: t.Callable[[], SetEngine],
+):
+    root_expression = LoadFromFileExpression(file_name=_PATH_TO_VALID_FILE_A)
+    for idx in range(20_000):
+        func_name, file_name = (("SUM", _PATH_TO_VALID_FILE_B), ("DIF", _PATH_TO_VALID_FILE_C))[idx % 2]
+        root_expression = FunctionCallExpression(
+            func=_FUNCTIONS_MAPPING[func_name],
+            func_args=(root_expression, LoadFromFileExpression(file_name=file_name)),
+        )
+    executor = Executor(
+        root_expression=root_expression,
+        functions_mapping=_FUNCTIONS_MAPPING,
+        engine=engine_factory(),
+    )
+
+    assert list(executor.execute_sorted()) == [1, 2]
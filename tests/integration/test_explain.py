@@ -0,0 +1,98 @@
+import json
+import tracemalloc
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.engines import PythonSetEngine, SortedStreamEngine, SetEngine
+from scalc.executor import Executor
+from scalc.explain import analyze_expression, build_plan, format_plan, plan_to_json
+from scalc.optimizer import Optimizer
+from tests.conftest import FUNCTIONS_MAPPING, compile_source, write_values
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    for file_name, values in (("a.txt", (1, 2, 3)), ("b.txt", (2, 3, 4)), ("c.txt", (3, 4, 5))):
+        write_values(file_name, values)
+
+
+def test_format_plan_should_describe_shared_nodes_once():
+    plan = build_plan(compile_source("[ SUM [ INT a.txt b.txt ] [ DIF b.txt a.txt ] ]"), FUNCTIONS_MAPPING)
+
+    assert format_plan(plan) == "\n".join((
+        "SUM",
+        "  INT",
+        "    LOAD a.txt",
+        "    LOAD b.txt",
+        "  DIF",
+        "    LOAD b.txt (shared, see above)",
+        "    LOAD a.txt (shared, see above)",
+    ))
+
+
+@pytest.mark.parametrize(
+    "engine, expected_int_input_rows",
+    [
+        (PythonSetEngine(), [3, 3]),
+        # Streaming intersection reads all inputs, so their errors are not skipped.
+        (SortedStreamEngine(), [3, 3]),
+    ],
+)
+def test_analyze_expression_should_record_cardinalities(engine: SetEngine, expected_int_input_rows):
+    root_expression = analyze_expression(compile_source("[ SUM [ INT a.txt b.txt ] c.txt ]"))
+    executor = Executor(
+        root_expression=root_expression,
+        functions_mapping=FUNCTIONS_MAPPING,
+        engine=engine,
+    )
+
+    assert list(executor.execute_sorted()) == [2, 3, 4, 5]
+    plan = plan_to_json(build_plan(root_expression, FUNCTIONS_MAPPING))
+    assert plan["label"] == "SUM"
+    assert plan["input_rows"] == [2, 3]
+    assert plan["output_rows"] == 4
+    assert plan["children"][0]["input_rows"] == expected_int_input_rows
+    assert all(child["time"] > 0 for child in plan["children"])
+
+
+def test_analyze_expression_should_mark_skipped_nodes():
+    root_expression = Optimizer().optimize(compile_source("[ INT [ DIF a.txt a.txt ] b.txt ]"))
+    root_expression = analyze_expression(root_expression)
+    tracemalloc.start()
+    try:
+        Executor(
+            root_expression=root_expression,
+            functions_mapping=FUNCTIONS_MAPPING,
+        ).execute()
+    finally:
+        tracemalloc.stop()
+
+    plan = build_plan(root_expression, FUNCTIONS_MAPPING)
+    assert "LOAD b.txt  [skipped]" in format_plan(plan)
+    assert [child["evaluated"] for child in plan_to_json(plan)["children"]] == [True, False]
+
+
+def test_main_should_print_analyzed_plan_as_json(capsys):
+    assert main(["[ INT a.txt b.txt ]", "--analyze", "--plan-format", "json"]) == 0
+
+    plan = json.loads(capsys.readouterr().out)
+    assert plan["output_rows"] == 2
+    assert [child["label"] for child in plan["children"]] == ["LOAD a.txt", "LOAD b.txt"]
+
+
+def test_analyze_expression_should_record_paths_of_functions():
+    with open("d.txt", "w") as f:
+        f.write("".join(f"{value}\n" for value in range(100)))
+    with open("e.txt", "w") as f:
+        f.write("4\n3\n")
+    root_expression = analyze_expression(compile_source("[ SUM [ INT a.txt d.txt ] [ DIF e.txt a.txt ] ]"))
+    Executor(
+        root_expression=root_expression,
+        functions_mapping=FUNCTIONS_MAPPING,
+        engine=PythonSetEngine(),
+    ).execute()
+
+    plan = build_plan(root_expression, FUNCTIONS_MAPPING)
+    assert [child["path"] for child in plan_to_json(plan)["children"]] == ["gallop", "hash"]
+    assert "path=hash" in format_plan(plan).splitlines()[0]
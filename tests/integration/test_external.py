@@ -0,0 +1,84 @@
+import os
+import random
+import typing as t
+
+import pytest
+
+from scalc.external import ExternalSortEngine
+from scalc.functions import IntFunc
+from tests.conftest import write_values
+
+
+@pytest.fixture
+def unsorted_files(tmpdir) -> t.Tuple[str, str]:
+    rnd = random.Random(42)
+    values_a = [rnd.randrange(0, 5000) for _ in range(3000)]
+    values_b = [rnd.randrange(2500, 7500) for _ in range(3000)]
+    path_a = str(tmpdir.join("a.txt"))
+    path_b = str(tmpdir.join("b.txt"))
+    write_values(path_a, values_a)
+    write_values(path_b, values_b)
+    return path_a, path_b
+
+
+def test_iterate_should_spill_runs_and_return_sorted_values(unsorted_files, tmpdir):
+    path_a, _ = unsorted_files
+    spill_dir = tmpdir.mkdir("spill")
+    engine = ExternalSortEngine(memory_budget=64 * 100, temp_dir=str(spill_dir))
+
+    with open(path_a) as f:
+        expected_values = sorted({int(line) for line in f})
+
+    assert list(engine.iterate(path_a)) == expected_values
+    assert engine.spill_stats.spilled_files_count == 1
+    assert engine.spill_stats.runs_count > 1
+    assert os.listdir(str(spill_dir)) == []
+
+
+def test_iterate_should_merge_runs_in_several_passes(unsorted_files, monkeypatch):
+    monkeypatch.setattr("scalc.external._MAX_MERGE_FAN_IN", 4)
+    path_a, _ = unsorted_files
+    engine = ExternalSortEngine(memory_budget=64 * 100)
+
+    with open(path_a) as f:
+        expected_values = sorted({int(line) for line in f})
+
+    assert list(engine.iterate(path_a)) == expected_values
+    assert engine.spill_stats.merge_passes_count > 0
+
+
+def test_int_of_spilled_files_should_return_valid_result(unsorted_files):
+    path_a, path_b = unsorted_files
+    engine = ExternalSortEngine(memory_budget=64 * 100)
+
+    with open(path_a) as f_a, open(path_b) as f_b:
+        expected_values = sorted({int(line) for line in f_a} & {int(line) for line in f_b})
+
+    result = IntFunc().merge(args=[engine.iterate(path_a), engine.iterate(path_b)])
+    assert list(result) == expected_values
+
+
+def test_iterate_small_file_should_not_spill():
+    engine = ExternalSortEngine()
+    assert list(engine.iterate("tests/resources/valid/a.txt")) == [1, 2, 3]
+    assert engine.spill_stats.spilled_files_count == 0
+
+
+def test_streams_should_share_memory_budget(tmpdir):
+    path_a = str(tmpdir.join("a.txt"))
+    path_b = str(tmpdir.join("b.txt"))
+    write_values(path_a, range(40, 0, -1))
+    write_values(path_b, range(20, 60))
+    # Half of budget (50 values) is shared by files kept in memory.
+    engine = ExternalSortEngine(memory_budget=64 * 100)
+
+    stream_a, stream_b = engine.iterate(path_a), engine.iterate(path_b)
+    # Both streams are open at once.
+    assert (next(stream_a), next(stream_b)) == (1, 20)
+    assert list(stream_a) == list(range(2, 41))
+    assert list(stream_b) == list(range(21, 60))
+    assert engine.spill_stats.spilled_files_count == 1
+
+    # Memory of exhausted streams is released.
+    assert list(engine.iterate(path_b)) == list(range(20, 60))
+    assert engine.spill_stats.spilled_files_count == 1
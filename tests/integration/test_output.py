@@ -0,0 +1,118 @@
+import io
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.binary import BinarySetFile
+from scalc.bitmap import BitmapEngine
+from scalc.engines import PythonSetEngine, SortedStreamEngine, SetEngine
+from scalc.exceptions import RuntimeException
+from scalc.executor import Executor
+from scalc.output import count_result, iter_result, write_result, write_text
+from tests.conftest import create_executor, write_values
+
+
+_SOURCE_STR = "[ DIF [ SUM a.txt b.txt ] c.txt ]"
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    for file_name, values in (("a.txt", (1, 2, 3)), ("b.txt", (2, 3, 4)), ("c.txt", (3, 4, 5))):
+        write_values(file_name, values)
+
+
+def _executor(engine: SetEngine) -> Executor:
+    return create_executor(_SOURCE_STR, engine)
+
+
+@pytest.mark.parametrize("engine", [PythonSetEngine(), SortedStreamEngine(), BitmapEngine()])
+def test_result_helpers_should_agree_with_executor(engine: SetEngine):
+    assert list(iter_result(_executor(engine))) == [1, 2]
+    assert sorted(iter_result(_executor(engine), sort=False)) == [1, 2]
+    assert count_result(_executor(engine)) == 2
+
+
+def test_execute_sorted_should_not_sort_sorted_sets(monkeypatch):
+    monkeypatch.setattr("scalc.executor.sorted", pytest.fail, raising=False)
+
+    assert list(_executor(BitmapEngine()).execute_sorted()) == [1, 2]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1024])
+def test_write_text_should_write_values_in_chunks(chunk_size: int):
+    output = io.BytesIO()
+
+    assert write_text(range(-2, 3), output, chunk_size=chunk_size) == 5
+    assert output.getvalue() == b"-2\n-1\n0\n1\n2\n"
+
+
+def test_write_text_should_write_values_produced_before_error():
+    def values() -> t.Iterator[int]:
+        yield 1
+        yield 2
+        raise RuntimeException(reason="error")
+
+    output = io.BytesIO()
+    with pytest.raises(RuntimeException):
+        write_text(values(), output)
+    assert output.getvalue() == b"1\n2\n"
+
+
+def test_write_result_should_write_binary_set_file():
+    assert write_result(_executor(PythonSetEngine()), io.BytesIO(), output_file="r.sset") == 2
+
+    with BinarySetFile("r.sset") as set_file:
+        assert list(set_file) == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "args, expected",
+    [
+        ([], b"1\n2\n"),
+        (["--count"], b"2\n"),
+        (["--engine", "stream", "--unsorted"], b"1\n2\n"),
+        (["--output", "r.txt"], b""),
+    ],
+)
+def test_main_should_write_result(capsysbinary, args, expected):
+    assert main([_SOURCE_STR, *args]) == 0
+    assert capsysbinary.readouterr().out == expected
+
+
+@pytest.mark.parametrize("engine", ["set", "stream"])
+def test_main_should_report_invalid_line(capsys, engine: str):
+    with open("x.txt", "wb") as f:
+        f.write(b"1\n2\nabc\r\n4\n")
+
+    assert main(["--engine", engine, "x.txt"]) == 0
+    # Line is reported without its line separator, line numbers start from 0.
+    assert capsys.readouterr().out == "RUNTIME ERROR: Invalid integer: 'abc' in file: 'x.txt' at line: 2.\n"
+
+
+def test_main_should_report_error_after_partial_result_to_stderr(capsys):
+    # Unsorted value is far behind values of the other input.
+    write_values("u.txt", (*range(1, 5000), 0))
+    error = "RUNTIME ERROR: File 'u.txt' is not sorted: '0' follows '4999' at line: 4999.\n"
+
+    assert main(["--engine", "stream", "[ INT u.txt a.txt ]"]) == 1
+    captured = capsys.readouterr()
+    assert captured.out == "1\n2\n3\n"
+    assert captured.err == error
+
+    # Error before any value is written is printed as usual.
+    assert main(["--engine", "stream", "[ INT u.txt [ DIF a.txt a.txt ] ]"]) == 0
+    assert capsys.readouterr().out == error
+
+
+@pytest.mark.parametrize("file_name", ("convert", "index", "batch", "serve", "worker", "cluster"))
+def test_main_should_load_file_named_as_mode(capsys, file_name: str):
+    write_values(file_name, (2, 1))
+
+    assert main([file_name]) == 0
+    assert capsys.readouterr().out == "1\n2\n"
+
+
+def test_main_without_arguments_should_print_usage(capsys):
+    assert main([]) == 0
+    assert capsys.readouterr().out.startswith("Invalid arguments.")
@@ -0,0 +1,131 @@
+import random
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.executor import Executor
+from scalc.exceptions import RuntimeException
+from scalc.optimizer import Optimizer
+from scalc.functions import SumFunc
+from scalc.parallel import ParallelExecutor
+from tests.conftest import FUNCTIONS_MAPPING, compile_source
+
+
+@pytest.fixture
+def files(workdir) -> t.Sequence[str]:
+    rnd = random.Random(42)
+    file_names = []
+    for idx in range(8):
+        file_name = f"f{idx}.txt"
+        with open(file_name, "w") as f:
+            for _ in range(200):
+                f.write(f"{rnd.randrange(0, 300)}\n")
+        file_names.append(file_name)
+    return file_names
+
+
+_SOURCE_TEMPLATES = (
+    "[ SUM {0} {1} {2} {3} {4} {5} {6} {7} ]",
+    "[ INT {0} {1} {2} ]",
+    "[ DIF {0} {1} [ INT {2} {3} ] {4} ]",
+    "[ SUM [ INT {0} {1} ] [ DIF {2} {3} ] [ INT {0} {1} ] [ SUM {4} [ DIF {5} {6} {7} ] ] ]",
+    "[ INT [ DIF {0} {0} ] {1} ]",
+    "{0}",
+)
+
+
+@pytest.mark.parametrize("use_processes", (True, False))
+@pytest.mark.parametrize("optimize", (True, False))
+@pytest.mark.parametrize("source_template", _SOURCE_TEMPLATES)
+def test_parallel_execute_should_return_same_result_as_sequential(
+    files: t.Sequence[str],
+    source_template: str,
+    optimize: bool,
+    use_processes: bool,
+):
+    root_expression = compile_source(source_template.format(*files))
+    if optimize:
+        root_expression = Optimizer().optimize(root_expression)
+
+    expected_result = Executor(
+        root_expression=root_expression,
+        functions_mapping=FUNCTIONS_MAPPING,
+    ).execute()
+    result = ParallelExecutor(
+        root_expression=root_expression,
+        functions_mapping=FUNCTIONS_MAPPING,
+        jobs=4,
+        use_processes=use_processes,
+    ).execute()
+
+    assert result == expected_result
+
+
+def test_parallel_execute_with_missing_file_should_raise(files: t.Sequence[str]):
+    root_expression = compile_source(f"[ SUM {files[0]} unexistent.txt ]")
+    executor = ParallelExecutor(
+        root_expression=root_expression,
+        functions_mapping=FUNCTIONS_MAPPING,
+        jobs=2,
+    )
+
+    with pytest.raises(RuntimeException):
+        executor.execute()
+
+
+@pytest.mark.parametrize("use_processes", (True, False))
+def test_parallel_execute_should_count_loads_of_worker_processes(files: t.Sequence[str], use_processes: bool):
+    executor = ParallelExecutor(
+        root_expression=compile_source(_SOURCE_TEMPLATES[0].format(*files)),
+        functions_mapping=FUNCTIONS_MAPPING,
+        jobs=4,
+        use_processes=use_processes,
+    )
+    executor.execute()
+
+    # Files are parsed by copies of engine in worker processes, or by engine itself in threads.
+    files_count = executor.engine.stats()["unsorted_files_count"] + executor.stats().get("unsorted_files_count", 0)
+    assert files_count == len(files)
+    assert bool(executor.stats()) == use_processes
+
+
+def test_main_should_print_stats_of_worker_processes(files: t.Sequence[str], capsys):
+    assert main(["--stats", "--jobs", "4", _SOURCE_TEMPLATES[0].format(*files)]) == 0
+
+    assert f"unsorted_files_count: {len(files)}" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("engine", ("stream", "external"))
+def test_main_should_reject_jobs_with_streaming_engine(files: t.Sequence[str], engine: str):
+    with pytest.raises(SystemExit):
+        main(["--engine", engine, "--jobs", "2", files[0]])
+
+
+def test_parallel_execute_should_reduce_groups_of_arguments_in_worker_processes(
+    files: t.Sequence[str],
+    monkeypatch,
+):
+    root_expression = compile_source(_SOURCE_TEMPLATES[0].format(*files))
+    expected_result = Executor(root_expression=root_expression, functions_mapping=FUNCTIONS_MAPPING).execute()
+    # Calls in worker processes are not recorded, since they are made by copies of the list.
+    calls = []
+    call = SumFunc.call
+    monkeypatch.setattr(SumFunc, "call", lambda self, args: calls.append(args) or call(self, args))
+    executor = ParallelExecutor(
+        root_expression=root_expression,
+        functions_mapping=FUNCTIONS_MAPPING,
+        jobs=4,
+    )
+
+    assert executor.execute() == expected_result
+    # 8 files are loaded and reduced in 4 groups, only results of groups are merged by the parent.
+    assert len(calls) == 3
+    assert executor.stats()["unsorted_files_count"] == len(files)
+    assert executor.engine.stats()["unsorted_files_count"] == 0
+
+
+@pytest.mark.parametrize("jobs", ("0", "-1"))
+def test_main_should_reject_invalid_jobs(files: t.Sequence[str], jobs: str):
+    with pytest.raises(SystemExit):
+        main(["--jobs", jobs, files[0]])
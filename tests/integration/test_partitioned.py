@@ -0,0 +1,190 @@
+import gzip
+import random
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.binary import write_binary_set
+from scalc.engines import PythonSetEngine, SortedStreamEngine, SetEngine
+from scalc.exceptions import RuntimeException
+from scalc.executor import Executor
+from scalc.partitioned import (
+    Partitioner,
+    PartitionedExecutor,
+    PartitionStrategy,
+    build_range_partitioner,
+)
+from tests.conftest import FUNCTIONS_MAPPING, compile_source, write_values
+
+
+_SOURCE_STRS = (
+    "[ INT f0.txt f1.txt ]",
+    "[ SUM [ INT f0.txt f1.txt ] [ DIF f2.txt f3.sset ] ]",
+    "[ DIF f0.txt [ SUM f1.txt f2.txt ] f3.sset ]",
+)
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    rnd = random.Random(42)
+    for idx in range(3):
+        with open(f"f{idx}.txt", "w") as f:
+            for _ in range(2000):
+                f.write(f"{rnd.randrange(-1000, 1000)}\n")
+    write_binary_set("f3.sset", sorted({rnd.randrange(-1000, 1000) for _ in range(500)}))
+
+
+def _sort_text_files():
+    """
+        Sorts text files for engines which require sorted input, duplicates are kept.
+    """
+    for idx in range(3):
+        with open(f"f{idx}.txt") as f:
+            values = sorted(map(int, f))
+        write_values(f"f{idx}.txt", values)
+
+
+def _partitioned_executor(source_str: str, engine: SetEngine, **kwargs) -> PartitionedExecutor:
+    return PartitionedExecutor(
+        root_expression=compile_source(source_str),
+        functions_mapping=FUNCTIONS_MAPPING,
+        engine=engine,
+        # Small splits, so every text file is parsed by several tasks.
+        split_size=1024,
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize("source_str", _SOURCE_STRS)
+@pytest.mark.parametrize("strategy", list(PartitionStrategy))
+@pytest.mark.parametrize("engine", [PythonSetEngine(), SortedStreamEngine()])
+@pytest.mark.parametrize("jobs, partitions", [(1, 1), (1, 3), (2, 4)])
+def test_partitioned_executor_should_agree_with_executor(
+    source_str: str,
+    strategy: PartitionStrategy,
+    engine: SetEngine,
+    jobs: int,
+    partitions: int,
+):
+    if engine.sorted_input:
+        _sort_text_files()
+    expected = sorted(Executor(
+        root_expression=compile_source(source_str),
+        functions_mapping=FUNCTIONS_MAPPING,
+    ).execute())
+    executor = _partitioned_executor(
+        source_str,
+        engine,
+        jobs=jobs,
+        partitions=partitions,
+        strategy=strategy,
+    )
+
+    assert list(executor.execute_sorted()) == expected
+    assert executor.execute() == set(expected)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_partitioned_executor_should_decompress_compressed_inputs(jobs: int):
+    expected = sorted(Executor(
+        root_expression=compile_source(_SOURCE_STRS[1]),
+        functions_mapping=FUNCTIONS_MAPPING,
+    ).execute())
+    for file_name in ("f0.txt", "f1.txt"):
+        with open(file_name, "rb") as f:
+            data = f.read()
+        with gzip.open(file_name, "wb") as f:
+            f.write(data)
+
+    executor = _partitioned_executor(_SOURCE_STRS[1], PythonSetEngine(), jobs=jobs, partitions=3)
+
+    assert list(executor.execute_sorted()) == expected
+
+
+def test_partitioned_executor_should_report_invalid_line_number():
+    with open("f1.txt", "a") as f:
+        f.write("x\n")
+    executor = _partitioned_executor(_SOURCE_STRS[0], PythonSetEngine(), jobs=1, partitions=2)
+
+    with pytest.raises(RuntimeException) as e:
+        executor.execute()
+    assert e.value.reason == "Invalid integer: 'x' in file: 'f1.txt' at line: 2000."
+
+
+@pytest.mark.parametrize(
+    "values, expected_reason",
+    (
+        # Unsorted values inside of split.
+        ([*range(1, 600), 0], "File 'u.txt' is not sorted: '0' follows '599' at line: 599."),
+        # Both splits are sorted, but the second one starts with smaller values.
+        (
+            [*range(20000, 20500), *range(10000, 10500)],
+            "File 'u.txt' is not sorted: '10000' follows '20499' at line: 500.",
+        ),
+    ),
+)
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_partitioned_executor_should_report_unsorted_file_of_sorted_engine(
+    values: t.List[int],
+    expected_reason: str,
+    jobs: int,
+):
+    write_values("u.txt", values)
+    executor = _partitioned_executor("[ INT u.txt f3.sset ]", SortedStreamEngine(), jobs=jobs, partitions=2)
+
+    with pytest.raises(RuntimeException) as e:
+        executor.execute()
+    assert e.value.reason == expected_reason
+
+    # Engines which accept unsorted files do not check order.
+    executor = _partitioned_executor("[ INT u.txt f3.sset ]", PythonSetEngine(), jobs=jobs, partitions=2)
+    assert executor.execute() == set(values) & set(Executor(
+        root_expression=compile_source("f3.sset"),
+        functions_mapping=FUNCTIONS_MAPPING,
+    ).execute())
+
+
+def test_partitioned_executor_should_raise_on_missing_file():
+    executor = _partitioned_executor("[ INT f0.txt missing.txt ]", PythonSetEngine(), jobs=1)
+
+    with pytest.raises(RuntimeException) as e:
+        executor.execute()
+    assert e.value.reason == "File 'missing.txt' not found."
+
+
+def test_build_range_partitioner_should_balance_partitions():
+    partitioner = build_range_partitioner(["f0.txt", "f3.sset"], partitions_count=4)
+
+    assert partitioner.is_ordered
+    assert partitioner.boundaries == sorted(partitioner.boundaries)
+    with open("f0.txt") as f:
+        sizes = [len(partition) for partition in partitioner.split(map(int, f))]
+    assert min(sizes) > 300
+
+
+@pytest.mark.parametrize(
+    "partitioner, expected",
+    (
+        (Partitioner(partitions_count=3, boundaries=[0, 10]), [[-5], [0, 5], [10, 15]]),
+        (Partitioner(partitions_count=1), [[-5, 0, 5, 10, 15]]),
+    ),
+)
+def test_partitioner_split_should_keep_order_of_values(
+    partitioner: Partitioner,
+    expected: t.List[t.List[int]],
+):
+    assert partitioner.split([-5, 0, 5, 10, 15]) == expected
+
+
+def test_main_should_evaluate_partitions(capsys):
+    source_str = _SOURCE_STRS[1]
+    assert main([source_str]) == 0
+    expected = capsys.readouterr().out
+
+    assert main([source_str, "--partitions", "3", "--partition-by", "hash"]) == 0
+    assert capsys.readouterr().out == expected
+
+    # The same error as without partitions.
+    assert main(["--engine", "stream", "--partitions", "2", "[ INT f0.txt f3.sset ]"]) == 0
+    assert capsys.readouterr().out.startswith("RUNTIME ERROR: File 'f0.txt' is not sorted: ")
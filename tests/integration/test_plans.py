@@ -0,0 +1,67 @@
+import os
+
+from scalc.__main__ import main
+from scalc.expressions import format_expression
+from scalc.functions import load_functions
+from scalc.plans import PlanCache
+from tests.conftest import FUNCTIONS_MAPPING, compile_source, write_values
+
+
+_SOURCE_STR = "[ SUM a.txt [ INT b.txt c.txt ] ]"
+
+
+def test_plan_cache_should_share_stored_plans_between_instances(tmpdir):
+    cache_dir = str(tmpdir.join("plans"))
+    plan = compile_source(_SOURCE_STR)
+    PlanCache(functions_mapping=FUNCTIONS_MAPPING, cache_dir=cache_dir).store(_SOURCE_STR, plan)
+
+    plan_cache_functions_mapping = load_functions()
+    plan_cache = PlanCache(functions_mapping=plan_cache_functions_mapping, cache_dir=cache_dir)
+    assert plan_cache.lookup(_SOURCE_STR, variant="optimized") is None
+    assert format_expression(plan_cache.lookup(_SOURCE_STR), plan_cache_functions_mapping) == _SOURCE_STR
+    assert plan_cache.lookup(_SOURCE_STR) is not None
+    assert plan_cache.stats() == {
+        "plan_cache_hits_count": 2,
+        "plan_cache_misses_count": 1,
+        "plan_cache_stores_count": 0,
+    }
+
+
+def test_plan_cache_should_evict_least_recently_used_stored_plans(tmpdir):
+    cache_dir = str(tmpdir.join("plans"))
+    plan_cache = PlanCache(
+        functions_mapping=FUNCTIONS_MAPPING,
+        cache_dir=cache_dir,
+        max_entries=1,
+        max_stored_entries=2,
+    )
+    for idx in range(3):
+        plan_cache.store(f"a{idx}.txt", compile_source(f"a{idx}.txt"))
+
+    assert len(os.listdir(cache_dir)) == 2
+    assert plan_cache.lookup("a2.txt") is not None
+
+
+def test_plan_cache_should_ignore_corrupted_plans(tmpdir):
+    cache_dir = str(tmpdir.join("plans"))
+    plan_cache = PlanCache(functions_mapping=FUNCTIONS_MAPPING, cache_dir=cache_dir)
+    plan_cache.store(_SOURCE_STR, compile_source(_SOURCE_STR))
+    for entry_name in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, entry_name), "w") as f:
+            f.write("{")
+
+    plan_cache = PlanCache(functions_mapping=FUNCTIONS_MAPPING, cache_dir=cache_dir)
+    assert plan_cache.lookup(_SOURCE_STR) is None
+
+
+def test_main_should_reuse_cached_plans(workdir, capsys):
+    for file_name in ("a.txt", "b.txt", "c.txt"):
+        write_values(file_name, (1, 2))
+    args = [_SOURCE_STR, "--cache-dir", "cache", "--optimize", "--stats"]
+
+    assert main(args) == 0
+    assert "plan_cache_stores_count: 1" in capsys.readouterr().err
+    assert main(args) == 0
+    captured = capsys.readouterr()
+    assert captured.out == "1\n2\n"
+    assert "plan_cache_hits_count: 1" in captured.err
@@ -0,0 +1,142 @@
+import os
+import threading
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.cache import CachingEngine, FileCache
+from scalc.engines import PythonSetEngine, SortedStreamEngine, SetEngine, EngineWrapper
+from scalc.exceptions import RuntimeException
+from scalc.executor import Executor
+from scalc.optimizer import Optimizer
+from scalc.prefetch import PrefetchingEngine
+from tests.conftest import FUNCTIONS_MAPPING, create_executor, write_values
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    write_values("a.txt", range(0, 1000))
+    write_values("b.txt", range(500, 1500))
+    write_values("c.txt", range(900, 1100))
+
+
+class _RecordingEngine(EngineWrapper):
+
+    def __init__(self, engine: SetEngine):
+        super().__init__(engine=engine)
+        self.prefetched = []
+        self.loaded = []
+
+    def prefetch(self, file_names: t.Sequence[str]):
+        self.prefetched.extend(file_names)
+
+    def load(self, file_name: str) -> t.AbstractSet[int]:
+        self.loaded.append(file_name)
+        return self.engine.load(file_name)
+
+
+def test_executor_should_prefetch_files_in_load_order():
+    engine = _RecordingEngine(engine=PythonSetEngine())
+
+    create_executor("[ SUM [ INT c.txt a.txt ] [ DIF b.txt c.txt ] ]", engine).execute()
+
+    assert engine.prefetched == ["c.txt", "a.txt", "b.txt"]
+    assert engine.loaded == engine.prefetched
+
+
+@pytest.mark.parametrize("wrapped_engine", [PythonSetEngine(), SortedStreamEngine()])
+def test_prefetching_engine_should_read_files_ahead(wrapped_engine: SetEngine):
+    engine = PrefetchingEngine(engine=wrapped_engine, max_concurrent_reads=2)
+    try:
+        result = list(create_executor("[ INT [ SUM a.txt b.txt ] c.txt ]", engine).execute_sorted())
+    finally:
+        engine.close()
+
+    assert result == list(range(900, 1100))
+    stats = engine.stats()
+    assert stats["prefetch_files_count"] == 3
+    assert stats["prefetch_hits_count"] == 3
+    assert stats["prefetch_bytes_count"] == sum(
+        os.path.getsize(file_name) for file_name in ("a.txt", "b.txt", "c.txt")
+    )
+    assert set(engine.read_times) == {"a.txt", "b.txt", "c.txt"}
+    assert "prefetch_read_us[a.txt]" in stats
+
+
+def test_prefetching_engine_should_report_errors_when_file_is_loaded():
+    engine = PrefetchingEngine(engine=PythonSetEngine())
+    try:
+        engine.prefetch(["missing.txt"])
+        with pytest.raises(RuntimeException, match="missing.txt"):
+            engine.load("missing.txt")
+    finally:
+        engine.close()
+
+    assert engine.prefetch_stats.files_count == 0
+    assert engine.prefetch_stats.hits_count == 0
+
+
+def test_prefetching_engine_should_read_again_files_which_were_not_loaded():
+    write_values("b.txt", range(0, 5000))
+    engine = PrefetchingEngine(engine=PythonSetEngine(), max_concurrent_reads=1)
+    executor = create_executor("[ SUM [ INT [ DIF a.txt a.txt ] b.txt ] c.txt ]", engine)
+    try:
+        # b.txt is not loaded, since INT of empty set is short-circuited. Files are read one by one,
+        # so read of b.txt is finished when c.txt is loaded.
+        assert Executor(
+            root_expression=Optimizer().optimize(executor.root_expression),
+            functions_mapping=FUNCTIONS_MAPPING,
+            engine=engine,
+        ).execute() == set(range(900, 1100))
+        assert engine.prefetch_stats.files_count == 3
+
+        assert create_executor("[ INT b.txt c.txt ]", engine).execute() == set(range(900, 1100))
+    finally:
+        engine.close()
+
+    assert engine.prefetch_stats.files_count == 5
+    assert engine.prefetch_stats.hits_count == 4
+
+
+def test_prefetching_engine_should_cancel_reads_when_closed():
+    blocker = threading.Event()
+
+    class _BlockingEngine(PrefetchingEngine):
+
+        def _read(self, file_name: str):
+            blocker.wait()
+            return super()._read(file_name)
+
+    engine = _BlockingEngine(engine=PythonSetEngine(), max_concurrent_reads=1)
+    engine.prefetch(["a.txt", "b.txt"])
+    # Read of a.txt is in progress when engine is closed, read of b.txt is pending.
+    threading.Timer(0.1, blocker.set).start()
+    engine.close()
+    engine.prefetch(["c.txt"])
+
+    assert set(engine.read_times) <= {"a.txt"}
+    assert engine.load("c.txt") == set(range(900, 1100))
+
+
+def test_caching_engine_should_prefetch_cache_entries(tmpdir):
+    recording_engine = _RecordingEngine(engine=PythonSetEngine())
+    cache = FileCache(cache_dir=str(tmpdir.join("cache")))
+    engine = CachingEngine(engine=recording_engine, cache=cache)
+    engine.load("a.txt")
+
+    engine.prefetch(["a.txt", "b.txt"])
+
+    assert recording_engine.prefetched == [cache.lookup("a.txt"), "b.txt"]
+
+
+def test_main_should_print_prefetch_stats(capsys):
+    assert main(["--prefetch", "2", "--stats", "--count", "[ INT a.txt b.txt ]"]) == 0
+
+    captured = capsys.readouterr()
+    assert captured.out == "500\n"
+    assert "prefetch_files_count: 2" in captured.err
+    assert "prefetch_read_us[b.txt]: " in captured.err
+
+    with pytest.raises(SystemExit):
+        main(["--prefetch", "2", "--jobs", "2", "[ INT a.txt b.txt ]"])
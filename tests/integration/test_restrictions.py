@@ -0,0 +1,167 @@
+import random
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.binary import Encoding, write_binary_set
+from scalc.bitmap import BitmapEngine
+from scalc.cache import CachingEngine, FileCache
+from scalc.engines import PythonSetEngine, SortedStreamEngine, SetEngine
+from scalc.restrictions import Restriction
+from scalc.watch import IncrementalEvaluator, ResultUpdate
+from tests.conftest import compile_source, create_executor, write_values
+
+
+_VALUES = {
+    "a.txt": sorted(random.Random(1).sample(range(-1000, 1000), 800)),
+    "b.txt": sorted(random.Random(2).sample(range(-1000, 1000), 600)),
+    "c.txt": random.Random(3).sample(range(-1000, 1000), 700),
+}
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    for file_name, values in _VALUES.items():
+        write_values(file_name, values)
+
+
+def _numpy_engine() -> SetEngine:
+    pytest.importorskip("numpy")
+    from scalc.numpy_engine import NumpySetEngine
+    return NumpySetEngine()
+
+
+def _sorted_stream_engine() -> SetEngine:
+    # Values of c.txt are not sorted, so it is read from binary set file.
+    write_binary_set("c.txt", sorted(_VALUES["c.txt"]))
+    return SortedStreamEngine()
+
+
+a, b, c = (set(_VALUES[file_name]) for file_name in ("a.txt", "b.txt", "c.txt"))
+
+
+@pytest.mark.parametrize(
+    "engine_factory",
+    (PythonSetEngine, _numpy_engine, _sorted_stream_engine, BitmapEngine),
+)
+@pytest.mark.parametrize(
+    ("source_str", "expected_values"),
+    (
+        ("[ RANGE -100 100 a.txt ]", sorted(v for v in a if -100 <= v < 100)),
+        ("[ RANGE 0 500 [ SUM a.txt c.txt ] ]", sorted(v for v in a | c if 0 <= v < 500)),
+        ("[ RANGE 0 500 [ DIF c.txt [ INT a.txt b.txt ] ] ]", sorted(v for v in c - (a & b) if 0 <= v < 500)),
+        ("[ LIMIT 10 [ SUM b.txt c.txt ] ]", sorted(b | c)[:10]),
+        ("[ LIMIT 10 [ INT a.txt c.txt ] ]", sorted(a & c)[:10]),
+        ("[ LIMIT 10 [ RANGE 100 2000 [ DIF a.txt c.txt ] ] ]", sorted(v for v in a - c if v >= 100)[:10]),
+        ("[ RANGE -10 10 [ LIMIT 100 c.txt ] ]", [v for v in sorted(c)[:100] if -10 <= v < 10]),
+        ("[ SUM [ RANGE -1000 0 a.txt ] [ LIMIT 5 b.txt ] ]", sorted({v for v in a if v < 0} | set(sorted(b)[:5]))),
+    ),
+)
+def test_restricted_expression_should_return_restricted_values(
+    engine_factory: t.Callable[[], SetEngine],
+    source_str: str,
+    expected_values: t.List[int],
+):
+    executor = create_executor(source_str, engine_factory())
+
+    assert list(executor.execute_sorted()) == expected_values
+    if not executor.engine.streaming:
+        assert executor.execute() == set(expected_values)
+
+
+def test_python_set_engine_should_seek_to_range_of_sorted_file():
+    values = range(0, 3_000_000, 7)
+    write_values("large.txt", values)
+    engine = PythonSetEngine()
+    restriction = Restriction(lower=1_000_000, upper=1_000_100)
+    expected_values = [value for value in values if value in restriction]
+
+    assert list(engine.load_restricted("large.txt", restriction)) == expected_values
+    assert engine.stats()["seeks_count"] == 0
+    # Order and index of file are known after the first load.
+    assert len(engine.file_index("large.txt").blocks) > 1
+    assert list(engine.load_restricted("large.txt", restriction)) == expected_values
+    assert list(engine.load_restricted("large.txt", Restriction(limit=3))) == [0, 7, 14]
+    assert engine.stats()["seeks_count"] == 2
+
+    # Unsorted file is never seeked.
+    assert engine.load_restricted("c.txt", Restriction(lower=0, upper=10)) == {v for v in c if 0 <= v < 10}
+    assert engine.load_restricted("c.txt", Restriction(limit=3)) == set(sorted(c)[:3])
+    assert engine.stats()["seeks_count"] == 2
+
+
+@pytest.mark.parametrize("encoding", tuple(Encoding))
+def test_python_set_engine_should_seek_to_range_of_binary_set_file(encoding: Encoding):
+    write_binary_set("a.sset", range(0, 100_000, 3), encoding=encoding, block_size=128)
+    engine = PythonSetEngine()
+
+    assert list(engine.load_restricted("a.sset", Restriction(lower=50_000, upper=50_010))) == [50_001, 50_004, 50_007]
+    assert list(SortedStreamEngine().iterate_restricted("a.sset", Restriction(lower=99_990))) == [99_990, 99_993, 99_996, 99_999]
+    assert engine.stats()["seeks_count"] == 1
+
+
+def test_caching_engine_should_load_range_of_cache_entry(tmpdir):
+    engine = CachingEngine(engine=PythonSetEngine(), cache=FileCache(cache_dir=str(tmpdir.join("cache"))))
+    restriction = Restriction(lower=0, upper=100)
+    expected_values = {v for v in c if v in restriction}
+
+    assert engine.load_restricted("c.txt", restriction) == expected_values
+    assert engine.load_restricted("c.txt", restriction) == expected_values
+    stats = engine.stats()
+    assert stats["cache_hits_count"] == 1
+    assert stats["seeks_count"] == 1
+
+
+def test_incremental_evaluator_should_filter_appended_values():
+    evaluator = IncrementalEvaluator(
+        root_expression=compile_source("[ RANGE 2000 3000 [ SUM a.txt b.txt ] ]"),
+        engine=PythonSetEngine(),
+    )
+    assert evaluator.refresh() == ResultUpdate(added=set(), removed=frozenset())
+
+    with open("a.txt", "a") as f:
+        f.write("1000\n2000\n")
+    assert evaluator.refresh() == ResultUpdate(added={2000}, removed=frozenset())
+
+
+def test_main_should_print_restricted_result(capsys):
+    assert main(["[ LIMIT 3 [ RANGE 0 1000 [ SUM a.txt c.txt ] ] ]"]) == 0
+    assert capsys.readouterr().out == "".join(f"{v}\n" for v in sorted(v for v in a | c if v >= 0)[:3])
+
+    assert main(["--explain", "[ LIMIT 3 [ INT a.txt [ RANGE 0 1000 c.txt ] ] ]"]) == 0
+    assert capsys.readouterr().out == "\n".join((
+        "LIMIT 3",
+        "  INT",
+        # Range of INT result restricts all of its arguments.
+        "    LOAD a.txt RANGE 0 1000",
+        "    LOAD c.txt RANGE 0 1000",
+        "",
+    ))
+
+    assert main(["--partitions", "2", "[ LIMIT 3 a.txt ]"]) == 0
+    assert capsys.readouterr().out == "RUNTIME ERROR: LIMIT can not be evaluated by partitions.\n"
+
+
+@pytest.mark.parametrize(
+    "source_str",
+    ("[ RANGE 0 100 u.txt ]", "[ LIMIT 1 u.txt ]", "[ LIMIT 1 [ INT u.txt u.txt ] ]"),
+)
+@pytest.mark.parametrize("extra_args", ([], ["--optimize"], ["--cache-dir", "cache"]))
+def test_sorted_stream_engine_should_report_unsorted_file_out_of_range(
+    capsys,
+    source_str: str,
+    extra_args: t.List[str],
+):
+    write_values("u.txt", (200, 5, 10))
+
+    exit_code = main(["--engine", "stream", *extra_args, source_str])
+    captured = capsys.readouterr()
+    error = "RUNTIME ERROR: File 'u.txt' is not sorted: '5' follows '200' at line: 1.\n"
+    # Error after streamed values is reported to stderr with non-zero exit code.
+    if exit_code:
+        assert exit_code == 1
+        assert captured.err == error
+        assert error not in captured.out
+    else:
+        assert captured.out == error
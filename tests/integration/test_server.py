@@ -0,0 +1,108 @@
+import io
+import os
+import socket
+import threading
+
+import pytest
+
+from scalc import client
+from scalc.__main__ import main
+from scalc.engines import PythonSetEngine
+from scalc.exceptions import RuntimeException
+from scalc.server import MemoryCachingEngine, QueryServer, QueryService, create_query_server
+from tests.conftest import FUNCTIONS_MAPPING, write_values
+
+
+@pytest.fixture
+def files(workdir):
+    write_values("a.txt", (1, 2, 3))
+    write_values("b.txt", (2, 3, 4))
+
+
+@pytest.fixture
+def query_service(files) -> QueryService:
+    return QueryService(
+        functions_mapping=FUNCTIONS_MAPPING,
+        engine=MemoryCachingEngine(engine=PythonSetEngine()),
+    )
+
+
+def test_serve_lines_should_respond_to_every_expression(query_service: QueryService):
+    output = io.StringIO()
+    query_service.serve_lines(
+        ["[ SUM a.txt b.txt ]\n", "\n", "[ INT a.txt missing.txt ]\n", "[ DIF a.txt b.txt ]\n"],
+        output,
+    )
+
+    assert output.getvalue() == (
+        "1\n2\n3\n4\n\n"
+        "RUNTIME ERROR: File 'missing.txt' not found.\n\n"
+        "1\n\n"
+    )
+
+
+def test_compile_should_reuse_plans(query_service: QueryService):
+    assert query_service.compile("[ SUM a.txt b.txt ]") is query_service.compile("[ SUM a.txt b.txt ]")
+
+
+def test_memory_caching_engine_should_invalidate_changed_files(files):
+    engine = MemoryCachingEngine(engine=PythonSetEngine())
+
+    assert engine.load("a.txt") == {1, 2, 3}
+    assert engine.load("a.txt") == {1, 2, 3}
+    assert engine.stats()["memory_cache_hits_count"] == 1
+
+    write_values("a.txt", (1, 2, 3, 10))
+    os.utime("a.txt", ns=(0, 0))
+    assert engine.load("a.txt") == {1, 2, 3, 10}
+    assert engine.stats()["memory_cache_misses_count"] == 2
+
+
+def test_memory_caching_engine_should_evict_least_recently_used_sets(files):
+    engine = MemoryCachingEngine(engine=PythonSetEngine(), max_entries=1)
+
+    engine.load("a.txt")
+    engine.load("b.txt")
+    engine.load("a.txt")
+
+    assert engine.stats()["memory_cache_misses_count"] == 3
+    assert engine.stats()["memory_cache_entries_count"] == 1
+
+
+def test_client_should_query_server(query_service: QueryService):
+    socket_path = "scalc.sock"
+    with QueryServer(socket_path=socket_path, query_service=query_service) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            assert list(client.query(socket_path, "[ INT a.txt b.txt ]")) == ["2", "3"]
+            assert list(client.query(socket_path, "[ SUM a.txt")) != []
+        finally:
+            server.shutdown()
+            thread.join()
+
+
+def test_create_query_server_should_replace_socket_of_killed_server(query_service: QueryService, capsys):
+    socket_path = "scalc.sock"
+    # Socket file is left behind, as if server was killed.
+    dead_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    dead_socket.bind(socket_path)
+    dead_socket.close()
+
+    with create_query_server(socket_path, query_service) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with pytest.raises(RuntimeException, match="already listening"):
+                create_query_server(socket_path, query_service)
+            assert main(["--serve", "--socket", socket_path]) == 0
+            assert capsys.readouterr().out == f"RUNTIME ERROR: Server is already listening on socket '{socket_path}'.\n"
+            assert list(client.query(socket_path, "[ INT a.txt b.txt ]")) == ["2", "3"]
+        finally:
+            server.shutdown()
+            thread.join()
+
+
+def test_create_query_server_should_report_invalid_socket_path(query_service: QueryService):
+    with pytest.raises(RuntimeException, match="Can not listen on socket 'missing/scalc.sock'"):
+        create_query_server("missing/scalc.sock", query_service)
@@ -0,0 +1,47 @@
+import pytest
+
+from scalc.binary import write_binary_set
+from scalc.cache import FileCache
+from scalc.exceptions import RuntimeException
+from scalc.sketch import SketchEngine
+
+
+@pytest.fixture
+def file_name(tmpdir) -> str:
+    path = tmpdir.join("a.txt")
+    path.write("".join(f"{value}\n" for value in range(5000)))
+    return str(path)
+
+
+def test_load_should_sketch_text_and_binary_files(tmpdir, file_name: str):
+    binary_file_name = str(tmpdir.join("a.sset"))
+    write_binary_set(binary_file_name, range(5000))
+    engine = SketchEngine(sketch_size=256)
+
+    sketch = engine.load(file_name)
+
+    assert not sketch.is_exact
+    assert engine.load(binary_file_name).hashes == sketch.hashes
+    assert engine.stats()["sketched_files_count"] == 2
+
+
+@pytest.mark.parametrize("sketch_size", [256, 10_000])
+def test_load_should_serve_sketches_from_cache(tmpdir, file_name: str, sketch_size: int):
+    cache = FileCache(cache_dir=str(tmpdir.join("cache")))
+    engine = SketchEngine(sketch_size=sketch_size, cache=cache)
+
+    sketch = engine.load(file_name)
+    cached_sketch = engine.load(file_name)
+
+    assert engine.stats()["sketched_files_count"] == 1
+    assert engine.stats()["sketch_cache_hits_count"] == 1
+    assert cached_sketch.hashes == sketch.hashes
+    assert cached_sketch.theta == sketch.theta
+    # Sketches of other size are cached separately.
+    SketchEngine(sketch_size=sketch_size + 1, cache=cache).load(file_name)
+    assert cache.cache_stats.misses_count == 2
+
+
+def test_iterate_should_raise(file_name: str):
+    with pytest.raises(RuntimeException):
+        SketchEngine().iterate(file_name)
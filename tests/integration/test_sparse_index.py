@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.binary import write_binary_set
+from scalc.engines import PythonSetEngine, SortedStreamEngine
+from scalc.exceptions import RuntimeException
+from scalc.restrictions import Restriction
+from scalc.sparse_index import (
+    build_sparse_index,
+    index_file_name,
+    load_sparse_index,
+    save_sparse_index,
+    stored_file_bounds,
+)
+from tests.conftest import write_values
+
+
+def _index(file_name: str, block_size: int = 1024):
+    save_sparse_index(file_name, build_sparse_index(file_name, block_size=block_size))
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    write_values("sorted.txt", range(0, 100_000, 2))
+    write_values("unsorted.txt", (5, -3, 8, 1))
+
+
+def test_stored_index_should_be_loaded_until_file_is_changed():
+    _index("sorted.txt")
+    _index("unsorted.txt")
+
+    index = load_sparse_index("sorted.txt")
+    assert index.is_sorted
+    assert len(index.blocks) > 100
+    assert (index.count, index.bounds) == (50_000, (0, 99_998))
+    offset, line_number = index.seek(50_000)
+    assert 0 < line_number <= 25_000
+    with open("sorted.txt", "rb") as f:
+        f.seek(offset)
+        assert int(f.readline()) == line_number * 2
+
+    index = load_sparse_index("unsorted.txt")
+    assert not index.is_sorted
+    assert (index.blocks, index.count, index.bounds) == ([], 4, (-3, 8))
+
+    with open("sorted.txt", "a") as f:
+        f.write("100000\n")
+    assert load_sparse_index("sorted.txt") is None
+    assert stored_file_bounds("sorted.txt") is None
+    assert stored_file_bounds("unsorted.txt") == (-3, 8)
+
+
+def test_corrupted_or_missing_index_should_be_ignored():
+    assert load_sparse_index("sorted.txt") is None
+    assert load_sparse_index("missing.txt") is None
+
+    with open(index_file_name("sorted.txt"), "w") as f:
+        f.write("{")
+    assert load_sparse_index("sorted.txt") is None
+
+
+def test_binary_set_file_should_not_be_indexed():
+    write_binary_set("a.sset", [1, 2, 3])
+
+    with pytest.raises(RuntimeException):
+        build_sparse_index("a.sset")
+
+
+def test_python_set_engine_should_seek_with_stored_index():
+    _index("sorted.txt")
+    _index("unsorted.txt")
+    engine = PythonSetEngine()
+
+    assert list(engine.load_restricted("sorted.txt", Restriction(lower=50_001, upper=50_010))) == [
+        50_002, 50_004, 50_006, 50_008,
+    ]
+    assert engine.load_restricted("sorted.txt", Restriction(lower=200_000, upper=300_000)) == set()
+    assert engine.load_restricted("unsorted.txt", Restriction(lower=10, upper=20)) == set()
+    assert engine.load_restricted("unsorted.txt", Restriction(lower=0, upper=6)) == {1, 5}
+    assert engine.stats()["seeks_count"] == 3
+    # Stored index is not replaced with coarser index of parsed file.
+    assert len(engine.load("sorted.txt")) == 50_000
+    assert engine.file_index("sorted.txt") == load_sparse_index("sorted.txt")
+
+
+def test_python_set_engine_should_ignore_stale_index():
+    _index("sorted.txt")
+    write_values("sorted.txt", range(0, 100_000, 3))
+    engine = PythonSetEngine()
+
+    assert list(engine.load_restricted("sorted.txt", Restriction(lower=50_001, upper=50_010))) == [
+        50_001, 50_004, 50_007,
+    ]
+    assert engine.stats()["seeks_count"] == 0
+
+
+def test_sorted_stream_engine_should_seek_with_stored_index():
+    write_values("repeated.txt", [1, 1, 2, 5, 5, 5, 8, 9])
+    _index("repeated.txt", block_size=4)
+
+    assert list(SortedStreamEngine().iterate_restricted("repeated.txt", Restriction(lower=5, upper=9))) == [5, 8]
+    assert list(SortedStreamEngine().iterate_restricted("repeated.txt", Restriction(lower=10, upper=20))) == []
+
+
+def test_main_should_index_files_and_skip_values_out_of_bounds(capsys):
+    write_values("high.txt", range(99_990, 200_000, 5))
+
+    assert main(["--index", "--block-size", "1K", "sorted.txt", "high.txt"]) == 0
+    assert capsys.readouterr().out == ""
+    assert os.path.exists(index_file_name("high.txt"))
+
+    assert main(["--explain", "[ INT sorted.txt high.txt ]"]) == 0
+    assert capsys.readouterr().out == "\n".join((
+        "INT",
+        "  LOAD sorted.txt RANGE 99990 99999",
+        "  LOAD high.txt RANGE 99990 99999",
+        "",
+    ))
+
+    assert main(["[ INT sorted.txt high.txt ]"]) == 0
+    assert capsys.readouterr().out == "99990\n"
+
+    assert main(["--index", "missing.txt"]) == 0
+    assert capsys.readouterr().out == "RUNTIME ERROR: File 'missing.txt' not found.\n"
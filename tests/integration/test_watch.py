@@ -0,0 +1,155 @@
+import io
+import typing as t
+
+import pytest
+
+from scalc.__main__ import main
+from scalc.bitmap import BitmapEngine
+from scalc.engines import PythonSetEngine, SetEngine
+from scalc.exceptions import RuntimeException
+from scalc.watch import IncrementalEvaluator, ResultUpdate, write_update
+from tests.conftest import compile_source
+
+
+_SOURCE_STR = "[ SUM a.txt [ DIF b.txt c.txt ] ]"
+
+
+def _write(file_name: str, content: str, mode: str = "w"):
+    with open(file_name, mode) as f:
+        f.write(content)
+
+
+@pytest.fixture(autouse=True)
+def files(workdir):
+    _write("a.txt", "1\n2\n")
+    _write("b.txt", "2\n3\n4\n")
+    _write("c.txt", "4\n")
+
+
+def _evaluator(engine: t.Optional[SetEngine] = None) -> IncrementalEvaluator:
+    evaluator = IncrementalEvaluator(
+        root_expression=compile_source(_SOURCE_STR),
+        engine=engine if engine is not None else PythonSetEngine(),
+    )
+    evaluator.evaluate()
+    return evaluator
+
+
+def test_refresh_should_add_appended_values_without_reloading_files():
+    evaluator = _evaluator()
+    _write("a.txt", "2\n5\n", mode="a")
+
+    assert evaluator.refresh() == ResultUpdate(added={5}, removed=frozenset())
+    assert evaluator.result == {1, 2, 3, 5}
+    # Appended values are added to SUM directly.
+    assert evaluator.watch_stats.recomputed_nodes_count == 0
+
+    _write("b.txt", "6\n", mode="a")
+
+    assert evaluator.refresh() == ResultUpdate(added={6}, removed=frozenset())
+    assert evaluator.result == {1, 2, 3, 5, 6}
+    assert evaluator.watch_stats.appended_files_count == 2
+    assert evaluator.watch_stats.reloaded_files_count == 0
+    # DIF of appended file and SUM above it are recomputed from kept results.
+    assert evaluator.watch_stats.recomputed_nodes_count == 2
+
+
+def test_refresh_should_add_whole_result_on_first_evaluation():
+    evaluator = IncrementalEvaluator(
+        root_expression=_evaluator().root_expression,
+        engine=PythonSetEngine(),
+    )
+
+    assert evaluator.refresh() == ResultUpdate(added={1, 2, 3}, removed=frozenset())
+
+
+def test_refresh_should_return_none_if_result_is_not_changed():
+    evaluator = _evaluator()
+    assert evaluator.refresh() is None
+
+    _write("a.txt", "3\n", mode="a")
+    _write("c.txt", "1\n", mode="a")
+    assert evaluator.refresh() is None
+    assert evaluator.result == {1, 2, 3}
+
+
+def test_refresh_should_parse_unterminated_line_when_it_is_complete():
+    evaluator = _evaluator()
+    _write("a.txt", "1", mode="a")
+    assert evaluator.refresh() is None
+
+    _write("a.txt", "0\n", mode="a")
+    assert evaluator.refresh() == ResultUpdate(added={10}, removed=frozenset())
+    assert evaluator.watch_stats.reloaded_files_count == 0
+
+
+def test_refresh_should_reload_replaced_files():
+    evaluator = _evaluator()
+    _write("c.txt", "2\n3\n")
+
+    assert evaluator.refresh() == ResultUpdate(added={4}, removed={3})
+    assert evaluator.result == {1, 2, 4}
+    assert evaluator.watch_stats.reloaded_files_count == 1
+    assert evaluator.watch_stats.recomputed_nodes_count == 2
+
+
+@pytest.mark.parametrize("engine", [PythonSetEngine(), BitmapEngine()])
+def test_refresh_should_agree_with_full_evaluation(engine: SetEngine):
+    evaluator = _evaluator(engine)
+    _write("a.txt", "7\n", mode="a")
+    _write("b.txt", "8\n9\n")
+    evaluator.refresh()
+    _write("c.txt", "9\n", mode="a")
+    evaluator.refresh()
+
+    assert set(evaluator.result) == {1, 2, 7, 8}
+    assert set(evaluator.result) == set(_evaluator(engine).result)
+
+
+def test_refresh_should_evaluate_from_scratch_after_error():
+    evaluator = _evaluator()
+    _write("b.txt", "x\n", mode="a")
+    with pytest.raises(RuntimeException):
+        evaluator.refresh()
+    assert evaluator.result is None
+
+    _write("b.txt", "5\n")
+    assert evaluator.refresh() == ResultUpdate(added={5}, removed={3})
+
+
+def test_write_update_should_write_removed_and_added_values():
+    output = io.BytesIO()
+    write_update(ResultUpdate(added={5, 1}, removed={3}), output)
+
+    assert output.getvalue() == b"-3\n+1\n+5\n"
+
+
+@pytest.mark.parametrize(
+    "args, expected_output",
+    (
+        ([], "1\n2\n3\n\n1\n2\n3\n5\n\n"),
+        (["--diff"], "+1\n+2\n+3\n\n+5\n\n"),
+        (["--count"], "3\n4\n"),
+    ),
+)
+def test_main_watch_should_print_result_on_every_change(
+    monkeypatch,
+    capfd,
+    args: t.List[str],
+    expected_output: str,
+):
+    sleeps = iter((
+        lambda: _write("a.txt", "5\n", mode="a"),
+        lambda: None,
+    ))
+
+    def sleep(_: float):
+        action = next(sleeps, None)
+        if action is None:
+            raise KeyboardInterrupt()
+        action()
+
+    monkeypatch.setattr("scalc.__main__.time.sleep", sleep)
+
+    assert main([_SOURCE_STR, "--watch", *args]) == 0
+    assert capfd.readouterr().out == expected_output
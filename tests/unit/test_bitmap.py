@@ -0,0 +1,74 @@
+import random
+import typing as t
+
+import pytest
+
+from scalc.bitmap import (
+    RoaringSet,
+    ArrayContainer,
+    BitmapContainer,
+    RunContainer,
+)
+from scalc.functions import (
+    SetCalcFunc,
+    SumFunc,
+    IntFunc,
+    DifFunc,
+)
+
+
+_RANDOM = random.Random(42)
+
+_SPARSE_VALUES = frozenset(_RANDOM.randrange(-10 ** 6, 10 ** 6) for _ in range(2000))
+_DENSE_VALUES = frozenset(_RANDOM.randrange(0, 3 * 2 ** 16) for _ in range(100000))
+_RANGE_VALUES = frozenset(range(2 ** 16 - 100, 2 ** 17 + 100))
+
+
+@pytest.mark.parametrize(
+    ("values", "expected_container_type"),
+    (
+        (range(0, 1000, 3), ArrayContainer),
+        (range(0, 2 ** 16, 2), BitmapContainer),
+        (range(10, 5000), RunContainer),
+    ),
+)
+def test_from_sorted_should_choose_compact_container(
+    values: t.Iterable[int],
+    expected_container_type: type,
+):
+    roaring_set = RoaringSet.from_sorted(values)
+    assert list(roaring_set) == list(values)
+    (container, ) = roaring_set.containers.values()
+    assert isinstance(container, expected_container_type)
+
+
+@pytest.mark.parametrize("func", (SumFunc(), IntFunc(), DifFunc()))
+@pytest.mark.parametrize(
+    "args",
+    (
+        (_SPARSE_VALUES, _DENSE_VALUES),
+        (_DENSE_VALUES, _RANGE_VALUES),
+        (_RANGE_VALUES, _SPARSE_VALUES, _DENSE_VALUES),
+        (_DENSE_VALUES, frozenset()),
+    ),
+)
+def test_set_calc_func_with_roaring_sets_should_return_valid_result(
+    func: SetCalcFunc,
+    args: t.Sequence[t.AbstractSet[int]],
+):
+    roaring_args = [RoaringSet.from_sorted(sorted(arg)) for arg in args]
+    expected_result = func.call(args=[set(arg) for arg in args])
+
+    result = func.call(args=roaring_args)
+    assert isinstance(result, RoaringSet)
+    assert len(result) == len(expected_result)
+    assert list(result) == sorted(expected_result)
+
+
+def test_roaring_set_mixed_with_builtin_set():
+    roaring_set = RoaringSet.from_sorted(range(10))
+    assert {5, 20} | roaring_set == set(range(10)) | {20}
+    assert {5, 20} - roaring_set == {20}
+    assert 5 in roaring_set
+    assert 10 not in roaring_set
+    assert -1 not in roaring_set
@@ -2,12 +2,19 @@ import typing as t
 
 import pytest
 
-from scalc.tokens import Token, TokenType
+from scalc.tokens import Token, TokenType, TokenParser
 from scalc.functions import SetCalcFunc
 from scalc.compiler import Compiler
-from scalc.expressions import Expression, FunctionCallExpression, LoadFromFileExpression
+from scalc.expressions import (
+    Expression,
+    FunctionCallExpression,
+    LoadFromFileExpression,
+    RestrictExpression,
+)
 from scalc.exceptions import CompileException
 from scalc.functions import load_functions
+from scalc.restrictions import Restriction
+from tests.conftest import FUNCTIONS_MAPPING, compile_source
 
 
 _FUNCTIONS_MAPPING = load_functions()
@@ -128,3 +135,146 @@ def test_compile_with_invalid_tokens_should_raise(
 
     with pytest.raises(CompileException):
         compiler.compile()
+
+
+def test_compile_should_share_equal_subexpressions():
+    tokens = TokenParser(
+        source_str="[ SUM [ INT a.txt b.txt ] [ DIF a.txt b.txt ] [ INT a.txt b.txt ] ]",
+    ).parse()
+    compiler = Compiler(
+        tokens=tokens,
+        functions_mapping=_FUNCTIONS_MAPPING,
+    )
+
+    compiled_expression = compiler.compile()
+    int_expression, dif_expression, other_int_expression = compiled_expression.func_args
+    assert int_expression is other_int_expression
+    assert int_expression.func_args[0] is dif_expression.func_args[0]
+    assert int_expression.func_args[1] is dif_expression.func_args[1]
+
+
+def test_compile_without_sharing_should_return_tree():
+    tokens = TokenParser(source_str="[ SUM a.txt a.txt ]").parse()
+    compiler = Compiler(
+        tokens=tokens,
+        functions_mapping=_FUNCTIONS_MAPPING,
+        share_subexpressions=False,
+    )
+
+    first_arg, second_arg = compiler.compile().func_args
+    assert first_arg == second_arg
+    assert first_arg is not second_arg
+
+
+@pytest.mark.parametrize(
+    ("invalid_source_str", "expected_reason_prefix"),
+    (
+        ("SUM", "Unexpected token."),
+        ("[ a.txt ]", "Unexpected token."),
+        ("[ SUM ]", "Function call expects at least one argument"),
+        ("[ SUM a.txt", "Unexpected EOF"),
+        ("[", "Unexpected EOF"),
+        ("", "Unexpected EOF"),
+        ("]", "Unexpected token."),
+        ("a.txt ]", "Unexpected extra tokens after root expression"),
+        ("[ RANGE 1 a.txt ]", "Unexpected token."),
+        ("[ RANGE 2 1 a.txt ]", "Invalid range: 2 is greater than 1"),
+        ("[ LIMIT -1 a.txt ]", "Invalid limit: -1"),
+        ("[ LIMIT 1 a.txt b.txt ]", "RANGE and LIMIT expect exactly one argument"),
+        ("[ SUM 1 a.txt ]", "Unexpected token."),
+    ),
+)
+def test_compile_with_invalid_source_str_should_raise_with_reason(
+    invalid_source_str: str,
+    expected_reason_prefix: str,
+):
+    compiler = Compiler(
+        tokens=TokenParser(source_str=invalid_source_str).iter_tokens(),
+        functions_mapping=_FUNCTIONS_MAPPING,
+    )
+
+    with pytest.raises(CompileException) as e:
+        compiler.compile()
+    assert e.value.reason.startswith(expected_reason_prefix)
+
+
+def test_compile_should_handle_deeply_nested_expressions():
+    depth = 50_000
+    source_str = "[SUM " * depth + "a.txt" + " b.txt]" * depth
+    compiler = Compiler(
+        tokens=TokenParser(source_str=source_str).iter_tokens(),
+        functions_mapping=_FUNCTIONS_MAPPING,
+    )
+
+    expression = compiler.compile()
+    for _ in range(depth):
+        assert expression.func_args[1] == LoadFromFileExpression(file_name="b.txt")
+        expression = expression.func_args[0]
+    assert expression == LoadFromFileExpression(file_name="a.txt")
+
+
+def _load(file_name: str, **restriction) -> LoadFromFileExpression:
+    return LoadFromFileExpression(file_name=file_name, restriction=Restriction(**restriction))
+
+
+def _call(func_name: str, *func_args: Expression) -> FunctionCallExpression:
+    return FunctionCallExpression(func=FUNCTIONS_MAPPING[func_name], func_args=func_args)
+
+
+@pytest.mark.parametrize(
+    ("source_str", "expected_expression"),
+    (
+        ("[ RANGE -10 10 a.txt ]", _load("a.txt", lower=-10, upper=10)),
+        (
+            "[ RANGE 0 10 [ SUM a.txt [ DIF b.txt [ INT a.txt c.txt ] ] ] ]",
+            _call(
+                "SUM",
+                _load("a.txt", lower=0, upper=10),
+                _call(
+                    "DIF",
+                    _load("b.txt", lower=0, upper=10),
+                    _call("INT", _load("a.txt", lower=0, upper=10), _load("c.txt", lower=0, upper=10)),
+                ),
+            ),
+        ),
+        (
+            "[ LIMIT 5 [ SUM a.txt [ RANGE 0 10 b.txt ] ] ]",
+            RestrictExpression(
+                restriction=Restriction(limit=5),
+                arg=_call("SUM", _load("a.txt", limit=5), _load("b.txt", lower=0, upper=10, limit=5)),
+            ),
+        ),
+        (
+            "[ LIMIT 5 [ RANGE 0 10 [ INT a.txt b.txt ] ] ]",
+            RestrictExpression(
+                restriction=Restriction(limit=5),
+                arg=_call("INT", _load("a.txt", lower=0, upper=10), _load("b.txt", lower=0, upper=10)),
+            ),
+        ),
+        (
+            "[ LIMIT 5 [ INT a.txt b.txt ] ]",
+            RestrictExpression(
+                restriction=Restriction(limit=5),
+                arg=_call("INT", LoadFromFileExpression(file_name="a.txt"), LoadFromFileExpression(file_name="b.txt")),
+            ),
+        ),
+        ("[ LIMIT 3 [ RANGE 0 10 [ RANGE 5 20 a.txt ] ] ]", _load("a.txt", lower=5, upper=10, limit=3)),
+        (
+            "[ RANGE 0 10 [ RANGE 5 20 [ LIMIT 3 a.txt ] ] ]",
+            RestrictExpression(restriction=Restriction(lower=5, upper=10), arg=_load("a.txt", limit=3)),
+        ),
+    ),
+)
+def test_compile_should_push_restrictions_down_to_loads(
+    source_str: str,
+    expected_expression: Expression,
+):
+    assert compile_source(source_str) == expected_expression
+
+
+def test_compile_should_share_restricted_subexpressions():
+    compiled_expression = compile_source("[ RANGE 0 10 [ SUM [ INT a.txt b.txt ] [ DIF b.txt a.txt ] ] ]")
+
+    int_expression, dif_expression = compiled_expression.func_args
+    assert int_expression.func_args[0] is dif_expression.func_args[1]
+    assert int_expression.func_args[1] is dif_expression.func_args[0]
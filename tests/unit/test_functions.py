@@ -8,6 +8,7 @@ from scalc.functions import (
     IntFunc,
     DifFunc,
 )
+from scalc.exceptions import RuntimeException
 
 
 @pytest.mark.parametrize(
@@ -37,3 +38,57 @@ def test_set_calc_func_should_return_valid_result(
     assert func.call(args=args) == expected_result
 
 
+@pytest.mark.parametrize(
+    ("func", "args", "expected_result"),
+    (
+        (SumFunc(), [[1, 2], [2, 3], [3, 4]], [1, 2, 3, 4]),
+        (SumFunc(), [[1, 2]], [1, 2]),
+        (SumFunc(), [[1, 2], []], [1, 2]),
+
+        (IntFunc(), [[1, 2], [2, 3], [3, 4]], []),
+        (IntFunc(), [[1, 2, 3], [2, 3], [3, 4, 5]], [3]),
+        (IntFunc(), [[1, 5, 9, 12], [0, 5, 12, 13], [-1, 5, 7, 12]], [5, 12]),
+        (IntFunc(), [[1, 2], []], []),
+        (IntFunc(), [[1, 2]], [1, 2]),
+        # Inputs which span many blocks and skip long runs of each other.
+        (IntFunc(), [range(0, 10000, 3), range(0, 10000, 7)], list(range(0, 10000, 21))),
+        (IntFunc(), [range(10000), [-5, 0, 4999, 9999, 20000], range(0, 10000, 9)], [0, 9999]),
+        (IntFunc(), [range(5000), range(5000, 10000)], []),
+
+        (DifFunc(), [[0, 1, 2, 3], [2, 3], [3, 4]], [0, 1]),
+        (DifFunc(), [[1, 2, 3], [1, 2], [2, 3]], []),
+        (DifFunc(), [[1, 2, 5, 6], [2]], [1, 5, 6]),
+        (DifFunc(), [[1, 2], []], [1, 2]),
+        (DifFunc(), [[1, 2]], [1, 2]),
+    ),
+)
+def test_set_calc_func_merge_should_return_valid_result(
+    func: SetCalcFunc,
+    args: t.Sequence[t.Sequence[int]],
+    expected_result: t.Sequence[int],
+):
+    iterators = [iter(arg) for arg in args]
+    assert list(func.merge(args=iterators)) == expected_result
+
+
+def _values_then_raise(values: t.Iterable[int]) -> t.Iterator[int]:
+    yield from values
+    raise RuntimeException("Unsorted input.")
+
+
+@pytest.mark.parametrize(
+    ("func", "args"),
+    (
+        (IntFunc(), [[], _values_then_raise([1, 2])]),
+        (IntFunc(), [range(3000), _values_then_raise(range(5000, 5001))]),
+        (IntFunc(), [_values_then_raise(range(0, 3000, 2)), [1, 3]]),
+        (DifFunc(), [[1, 2], _values_then_raise([0, 5])]),
+    ),
+)
+def test_set_calc_func_merge_should_read_all_inputs(
+    func: SetCalcFunc,
+    args: t.Sequence[t.Iterable[int]],
+):
+    # Errors of inputs are raised even if result is known before their end.
+    with pytest.raises(RuntimeException):
+        list(func.merge(args=[iter(arg) for arg in args]))
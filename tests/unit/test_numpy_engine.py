@@ -0,0 +1,52 @@
+import typing as t
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from scalc.functions import (
+    SetCalcFunc,
+    SumFunc,
+    IntFunc,
+    DifFunc,
+)
+from scalc.numpy_engine import SortedArraySet
+
+
+def _sorted_array_set(*values: int) -> SortedArraySet:
+    return SortedArraySet(values=np.array(sorted(values), dtype=np.int64))
+
+
+@pytest.mark.parametrize(
+    ("func", "args", "expected_result"),
+    (
+        (SumFunc(), [_sorted_array_set(1, 2), _sorted_array_set(2, 3), _sorted_array_set(3, 4)], {1, 2, 3, 4}),
+        (SumFunc(), [_sorted_array_set(1, 2), _sorted_array_set()], {1, 2}),
+        (SumFunc(), [_sorted_array_set(5, 9), {1, 7}], {1, 5, 7, 9}),
+
+        (IntFunc(), [_sorted_array_set(1, 2), _sorted_array_set(2, 3), _sorted_array_set(3, 4)], set()),
+        (IntFunc(), [_sorted_array_set(1, 2, 3), _sorted_array_set(2, 3), _sorted_array_set(3, 4, 5)], {3}),
+        (IntFunc(), [_sorted_array_set(1, 2), _sorted_array_set()], set()),
+
+        (DifFunc(), [_sorted_array_set(0, 1, 2, 3), _sorted_array_set(2, 3), _sorted_array_set(3, 4)], {0, 1}),
+        (DifFunc(), [_sorted_array_set(1, 2), _sorted_array_set()], {1, 2}),
+        (DifFunc(), [{1, 2, 3}, _sorted_array_set(2)], {1, 3}),
+    ),
+)
+def test_set_calc_func_with_sorted_array_sets_should_return_valid_result(
+    func: SetCalcFunc,
+    args: t.Sequence[t.AbstractSet[int]],
+    expected_result: t.AbstractSet[int],
+):
+    result = func.call(args=args)
+    assert isinstance(result, SortedArraySet)
+    assert result == expected_result
+    assert list(result) == sorted(expected_result)
+
+
+def test_sorted_array_set_contains():
+    s = _sorted_array_set(-5, 0, 10)
+    assert -5 in s
+    assert 10 in s
+    assert 11 not in s
+    assert "10" not in s
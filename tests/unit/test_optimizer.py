@@ -0,0 +1,64 @@
+import typing as t
+
+import pytest
+
+from scalc.expressions import format_expression
+from scalc.optimizer import Optimizer
+from tests.conftest import FUNCTIONS_MAPPING, compile_source
+
+
+_FILE_SIZES = {
+    "a.txt": 30,
+    "b.txt": 20,
+    "c.txt": 10,
+}
+
+
+@pytest.mark.parametrize(
+    ("source_str", "expected_source_str"),
+    (
+        (
+            "[ SUM a.txt [ SUM b.txt [ SUM c.txt a.txt ] ] ]",
+            "[ SUM a.txt b.txt c.txt ]",
+        ),
+        (
+            "[ INT a.txt [ INT b.txt c.txt ] b.txt ]",
+            "[ INT c.txt b.txt a.txt ]",
+        ),
+        (
+            "[ INT [ SUM a.txt b.txt ] c.txt ]",
+            "[ INT c.txt [ SUM a.txt b.txt ] ]",
+        ),
+        (
+            "[ DIF a.txt [ SUM b.txt c.txt ] b.txt ]",
+            "[ DIF a.txt b.txt c.txt ]",
+        ),
+        (
+            "[ SUM [ INT a.txt a.txt ] ]",
+            "a.txt",
+        ),
+        (
+            "[ DIF [ SUM a.txt b.txt ] c.txt ]",
+            "[ DIF [ SUM a.txt b.txt ] c.txt ]",
+        ),
+    ),
+)
+def test_optimize_should_return_rewritten_expression(
+    source_str: str,
+    expected_source_str: str,
+):
+    optimizer = Optimizer(size_estimator=_FILE_SIZES.__getitem__)
+    optimized_expression = optimizer.optimize(compile_source(source_str))
+    assert format_expression(optimized_expression, FUNCTIONS_MAPPING) == expected_source_str
+
+
+def test_optimize_should_mark_int_and_dif_as_short_circuited():
+    optimizer = Optimizer(size_estimator=_FILE_SIZES.__getitem__)
+    optimized_expression = optimizer.optimize(
+        compile_source("[ SUM [ INT a.txt b.txt ] [ DIF a.txt b.txt ] ]"),
+    )
+
+    int_expression, dif_expression = optimized_expression.func_args
+    assert not optimized_expression.short_circuit
+    assert int_expression.short_circuit
+    assert dif_expression.short_circuit
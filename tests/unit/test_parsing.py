@@ -0,0 +1,113 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from scalc.exceptions import RuntimeException
+from scalc.parsing import (
+    is_compressed_file,
+    iter_int_blocks_or_raise,
+    parse_int_bytes_or_raise,
+    parse_int_file_or_raise,
+)
+
+
+def _write(tmpdir, content: str) -> str:
+    path = tmpdir.join("a.txt")
+    path.write_binary(content.encode())
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1024])
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        ("", []),
+        ("1\n", [1]),
+        ("1\n-20\n300", [1, -20, 300]),
+        ("1\r\n 22 \r\n333\r\n", [1, 22, 333]),
+        ("١٢\n3\n", [12, 3]),
+    ],
+)
+def test_parse_int_file_or_raise_should_parse_file_in_order(tmpdir, chunk_size, content, expected):
+    file_name = _write(tmpdir, content)
+
+    assert list(parse_int_file_or_raise(file_name, chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1024])
+@pytest.mark.parametrize(
+    "content, expected_line, expected_number",
+    [
+        ("1\n2\nx\n4\n", "x", 2),
+        ("1\n\n3\n", "", 1),
+        ("1\n2\n3 4", "3 4", 2),
+    ],
+)
+def test_parse_int_file_or_raise_should_report_invalid_line(
+    tmpdir,
+    chunk_size,
+    content,
+    expected_line,
+    expected_number,
+):
+    file_name = _write(tmpdir, content)
+
+    with pytest.raises(RuntimeException) as e:
+        list(parse_int_file_or_raise(file_name, chunk_size=chunk_size))
+    assert e.value.reason == (
+        f"Invalid integer: '{expected_line}' in file: '{file_name}' at line: {expected_number}."
+    )
+
+
+def test_iter_int_blocks_or_raise_should_parse_whole_chunks(tmpdir):
+    file_name = _write(tmpdir, "".join(f"{i}\n" for i in range(1000)))
+
+    blocks = list(iter_int_blocks_or_raise(file_name, chunk_size=1024))
+
+    assert len(blocks) < 10
+    assert [i for block in blocks for i in block] == list(range(1000))
+
+
+def test_iter_int_blocks_or_raise_should_raise_on_missing_file():
+    with pytest.raises(RuntimeException) as e:
+        list(iter_int_blocks_or_raise("missing.txt"))
+    assert e.value.reason == "File 'missing.txt' not found."
+
+
+def test_parse_int_bytes_or_raise_should_parse_complete_lines():
+    assert parse_int_bytes_or_raise("a.txt", b"") == []
+    assert parse_int_bytes_or_raise("a.txt", b"1\n-2\n") == [1, -2]
+
+    with pytest.raises(RuntimeException) as e:
+        parse_int_bytes_or_raise("a.txt", b"1\nx\n", first_line_number=3)
+    assert e.value.reason == "Invalid integer: 'x' in file: 'a.txt' at line: 4."
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, bz2.compress, lzma.compress])
+@pytest.mark.parametrize("chunk_size", [3, 1024])
+def test_parse_int_file_or_raise_should_decompress_compressed_file(tmpdir, compress, chunk_size):
+    path = tmpdir.join("a.txt.z")
+    content = "".join(f"{i}\n" for i in range(-500, 500)).encode()
+    # Concatenated streams are decompressed as a single file.
+    path.write_binary(compress(content) + compress(b"1000\nx\n"))
+
+    assert is_compressed_file(str(path))
+    with pytest.raises(RuntimeException) as e:
+        list(parse_int_file_or_raise(str(path), chunk_size=chunk_size))
+    assert e.value.reason == f"Invalid integer: 'x' in file: '{path}' at line: 1001."
+
+    path.write_binary(compress(content))
+    assert list(parse_int_file_or_raise(str(path), chunk_size=chunk_size)) == list(range(-500, 500))
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, bz2.compress, lzma.compress])
+def test_parse_int_file_or_raise_should_raise_on_corrupted_compressed_file(tmpdir, compress):
+    path = tmpdir.join("a.txt.z")
+    data = compress("".join(f"{i}\n" for i in range(1000)).encode())
+    path.write_binary(data[:len(data) // 2])
+
+    with pytest.raises(RuntimeException) as e:
+        list(parse_int_file_or_raise(str(path)))
+    assert e.value.reason == f"File '{path}' is corrupted and can not be decompressed."
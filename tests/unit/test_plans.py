@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from scalc.functions import load_functions, SumFunc
+from scalc.optimizer import Optimizer
+from scalc.plans import (
+    PLAN_FORMAT_VERSION,
+    deserialize_plan,
+    functions_registry_version,
+    serialize_plan,
+)
+from tests.conftest import FUNCTIONS_MAPPING, compile_source
+
+
+@pytest.mark.parametrize(
+    "source_str",
+    (
+        "a.txt",
+        "[ SUM a.txt b.txt ]",
+        "[ SUM [ INT a.txt b.txt ] [ DIF a.txt [ INT a.txt b.txt ] ] ]",
+        "[ LIMIT 10 [ RANGE -5 100 [ INT a.txt [ SUM b.txt c.txt ] ] ] ]",
+    ),
+)
+def test_deserialize_plan_should_restore_serialized_plan(source_str: str):
+    root_expression = Optimizer(size_estimator=len).optimize(compile_source(source_str))
+
+    serialized_plan = json.loads(json.dumps(serialize_plan(root_expression, FUNCTIONS_MAPPING)))
+
+    assert deserialize_plan(serialized_plan, FUNCTIONS_MAPPING) == root_expression
+
+
+def test_deserialize_plan_should_keep_shared_nodes_shared():
+    serialized_plan = serialize_plan(compile_source("[ SUM [ INT a.txt b.txt ] [ INT a.txt b.txt ] ]"), FUNCTIONS_MAPPING)
+
+    assert len(serialized_plan["nodes"]) == 4
+    first_arg, second_arg = deserialize_plan(serialized_plan, FUNCTIONS_MAPPING).func_args
+    assert first_arg is second_arg
+
+
+@pytest.mark.parametrize(
+    "invalid_plan",
+    (
+        [],
+        {"version": -1, "nodes": []},
+        {"version": PLAN_FORMAT_VERSION, "nodes": []},
+        {"version": PLAN_FORMAT_VERSION, "nodes": [{"func": "UNKNOWN", "args": [], "short_circuit": False}]},
+        {"version": PLAN_FORMAT_VERSION, "nodes": [{"func": "SUM", "args": [10], "short_circuit": False}]},
+        {"version": PLAN_FORMAT_VERSION, "nodes": [{"file_name": "a.txt", "restriction": {"size": 1}}]},
+    ),
+)
+def test_deserialize_plan_with_invalid_plan_should_return_none(invalid_plan):
+    assert deserialize_plan(invalid_plan, FUNCTIONS_MAPPING) is None
+
+
+def test_functions_registry_version_should_change_with_registry():
+    version = functions_registry_version(FUNCTIONS_MAPPING)
+
+    assert version == functions_registry_version(load_functions())
+    assert version != functions_registry_version({**FUNCTIONS_MAPPING, "UNION": SumFunc()})
@@ -0,0 +1,91 @@
+import typing as t
+
+import pytest
+
+from scalc.expressions import format_expression, restrict_to_file_bounds
+from scalc.restrictions import Restriction
+from scalc.sorted_sets import SortedListSet
+from tests.conftest import FUNCTIONS_MAPPING, compile_source
+
+
+_VALUES = (-5, 0, 1, 3, 7, 10, 12)
+_FILE_BOUNDS = {
+    "a.txt": (0, 100),
+    "b.txt": (50, 200),
+    "c.txt": (300, 400),
+}
+
+
+@pytest.mark.parametrize(
+    ("restriction", "expected_values"),
+    (
+        (Restriction(), list(_VALUES)),
+        (Restriction(lower=0, upper=10), [0, 1, 3, 7]),
+        (Restriction(lower=2), [3, 7, 10, 12]),
+        (Restriction(upper=-5), []),
+        (Restriction(limit=2), [-5, 0]),
+        (Restriction(lower=1, upper=100, limit=3), [1, 3, 7]),
+        (Restriction(limit=0), []),
+    ),
+)
+def test_restriction_should_restrict_values(restriction: Restriction, expected_values: t.List[int]):
+    assert sorted(restriction.restrict_set(set(_VALUES))) == expected_values
+    assert list(restriction.restrict_set(SortedListSet(values=list(_VALUES)))) == expected_values
+    assert list(restriction.restrict_sorted(_VALUES)) == expected_values
+    assert restriction.restrict_sorted_list([-5, -5, 0, 1, 1, 3, 7, 10, 12]) == expected_values
+
+    blocks = [[-5, -5, 0, 1], [1, 3], [7, 10, 10], [10, 12]]
+    assert restriction.restrict_sorted_blocks(blocks) == expected_values
+
+
+def test_restrict_sorted_blocks_should_stop_after_upper_bound():
+    blocks = iter([[0, 1], [2, 3], [4, 5]])
+
+    assert Restriction(lower=1, upper=3).restrict_sorted_blocks(blocks) == [1, 2]
+    assert list(blocks) == [[4, 5]]
+
+
+@pytest.mark.parametrize(
+    ("restriction", "next_restriction", "expected_restriction"),
+    (
+        (Restriction(lower=0, upper=10), Restriction(lower=5, upper=20), Restriction(lower=5, upper=10)),
+        (Restriction(lower=0, upper=10), Restriction(limit=5), Restriction(lower=0, upper=10, limit=5)),
+        (Restriction(limit=5), Restriction(limit=3), Restriction(limit=3)),
+        (Restriction(lower=0, limit=5), Restriction(limit=10), Restriction(lower=0, limit=5)),
+        (Restriction(limit=5), Restriction(lower=0, upper=10), None),
+    ),
+)
+def test_then_should_combine_restrictions(
+    restriction: Restriction,
+    next_restriction: Restriction,
+    expected_restriction: t.Optional[Restriction],
+):
+    assert restriction.then(next_restriction) == expected_restriction
+
+
+def test_restriction_should_be_formatted_as_keywords():
+    assert str(Restriction(lower=-1, upper=10, limit=3)) == "RANGE -1 10 LIMIT 3"
+    assert str(Restriction(limit=3)) == "LIMIT 3"
+
+
+@pytest.mark.parametrize(
+    ("source_str", "expected_source_str"),
+    (
+        ("[ SUM a.txt b.txt ]", "[ SUM a.txt b.txt ]"),
+        ("[ INT a.txt b.txt ]", "[ INT [ RANGE 50 101 a.txt ] [ RANGE 50 101 b.txt ] ]"),
+        ("[ INT a.txt c.txt d.txt ]", "[ INT [ RANGE 300 300 a.txt ] [ RANGE 300 300 c.txt ] [ RANGE 300 300 d.txt ] ]"),
+        ("[ DIF a.txt [ SUM b.txt d.txt ] ]", "[ DIF a.txt [ SUM [ RANGE 0 101 b.txt ] [ RANGE 0 101 d.txt ] ] ]"),
+        ("[ INT [ SUM a.txt c.txt ] b.txt ]", "[ INT [ SUM [ RANGE 50 201 a.txt ] [ RANGE 50 201 c.txt ] ] b.txt ]"),
+        ("[ INT [ RANGE 0 10 d.txt ] a.txt ]", "[ INT [ RANGE 0 10 d.txt ] [ RANGE 0 10 a.txt ] ]"),
+        ("[ LIMIT 5 [ INT a.txt d.txt ] ]", "[ LIMIT 5 [ INT a.txt [ RANGE 0 101 d.txt ] ] ]"),
+        ("[ INT d.txt e.txt ]", "[ INT d.txt e.txt ]"),
+    ),
+)
+def test_restrict_to_file_bounds_should_restrict_arguments_which_can_not_contribute(
+    source_str: str,
+    expected_source_str: str,
+):
+    root_expression = compile_source(source_str)
+
+    restricted_expression = restrict_to_file_bounds(root_expression, _FILE_BOUNDS.get)
+    assert format_expression(restricted_expression, FUNCTIONS_MAPPING) == expected_source_str
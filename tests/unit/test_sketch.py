@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from scalc.exceptions import RuntimeException
+from scalc.sketch import ThetaSketch, hash_value, sketch_size_for_error
+
+
+_SKETCH_SIZE = 1024
+
+
+def _sketch(values) -> ThetaSketch:
+    return ThetaSketch.from_hashes(map(hash_value, values), _SKETCH_SIZE)
+
+
+def test_small_sets_should_be_counted_exactly():
+    s1, s2 = _sketch(range(100)), _sketch(range(50, 300))
+
+    assert s1.is_exact
+    assert len(s1 | s2) == 300
+    assert len(s1 & s2) == 50
+    assert len(s1 - s2) == 50
+    assert (s1 & s2).bounds() == (50.0, 50.0)
+
+
+def test_large_sets_should_be_estimated_within_bounds():
+    rnd = random.Random(42)
+    values1 = set(rnd.sample(range(10 ** 7), 50_000))
+    values2 = set(rnd.sample(range(10 ** 7), 50_000)) | set(list(values1)[:20_000])
+    s1, s2 = _sketch(values1), _sketch(values2)
+
+    for sketch, expected in (
+        (s1, len(values1)),
+        (s1 | s2, len(values1 | values2)),
+        (s1 & s2, len(values1 & values2)),
+        (s1 - s2, len(values1 - values2)),
+    ):
+        assert not sketch.is_exact
+        lower_bound, upper_bound = sketch.bounds()
+        assert lower_bound <= expected <= upper_bound
+        assert abs(len(sketch) - expected) / expected < 0.15
+
+
+def test_sketch_should_keep_at_most_sketch_size_hashes():
+    sketch = _sketch(range(10_000)) | _sketch(range(5_000, 20_000))
+
+    assert len(sketch.hashes) == _SKETCH_SIZE
+    assert max(sketch.hashes) < sketch.theta
+
+
+def test_empty_intersection_should_be_empty():
+    assert len(_sketch(range(0, 5000)) & _sketch(range(5000, 10000))) == 0
+
+
+def test_sketch_size_for_error():
+    assert sketch_size_for_error(0.1) == 102
+    with pytest.raises(RuntimeException):
+        sketch_size_for_error(0)
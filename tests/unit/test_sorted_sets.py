@@ -0,0 +1,84 @@
+import random
+import typing as t
+
+import pytest
+
+from scalc.functions import SetCalcFunc, SumFunc, IntFunc, DifFunc
+from scalc.sorted_sets import (
+    GALLOP_PATH,
+    HASH_PATH,
+    MERGE_PATH,
+    PROBE_PATH,
+    SortedListSet,
+    unique_ascending,
+)
+
+
+def _sorted_list_set(values: t.Iterable[int]) -> SortedListSet:
+    return SortedListSet(values=sorted(set(values)))
+
+
+def _random_values(rnd: random.Random, size: int) -> t.Set[int]:
+    return {rnd.randrange(-size * 2, size * 2) for _ in range(size)}
+
+
+@pytest.mark.parametrize(
+    ("func", "sizes", "expected_path"),
+    (
+        (SumFunc(), (100, 120, 80), MERGE_PATH),
+        (IntFunc(), (100, 120, 80), PROBE_PATH),
+        (IntFunc(), (1000, 10, 500), GALLOP_PATH),
+        (IntFunc(), (10, 0), GALLOP_PATH),
+        (DifFunc(), (100, 120), PROBE_PATH),
+        (DifFunc(), (1000, 10, 20), GALLOP_PATH),
+        (DifFunc(), (10, 1000), GALLOP_PATH),
+        (DifFunc(), (10, 1000, 10), PROBE_PATH),
+    ),
+)
+def test_sorted_arguments_should_be_combined_without_hashing(
+    func: SetCalcFunc,
+    sizes: t.Sequence[int],
+    expected_path: str,
+):
+    rnd = random.Random(42)
+    sets = [_random_values(rnd, size) for size in sizes]
+    args = [_sorted_list_set(values) for values in sets]
+
+    assert func.evaluation_path(args) == expected_path
+    result = func.call(args)
+    assert isinstance(result, SortedListSet)
+    assert result.values == sorted(func.call(sets))
+
+
+def test_mixed_arguments_should_be_hashed():
+    args = [_sorted_list_set([1, 2, 3]), {2, 3, 4}]
+
+    for func, expected_result in ((SumFunc(), {1, 2, 3, 4}), (IntFunc(), {2, 3}), (DifFunc(), {1})):
+        assert func.evaluation_path(args) == HASH_PATH
+        assert func.call(args) == expected_result
+        assert func.call(args[::-1]) == func.call([set(arg) for arg in args[::-1]])
+
+
+def test_sorted_list_set_should_behave_as_set():
+    values = _sorted_list_set([5, 1, 3])
+
+    assert values == {1, 3, 5}
+    assert values == _sorted_list_set([1, 3, 5])
+    assert 3 in values and 4 not in values and 6 not in values
+    assert list(values) == [1, 3, 5]
+    assert values | {6} == {1, 3, 5, 6}
+    assert {0, 1} & values == {1}
+    assert {0, 1} - values == {0}
+    assert values - _sorted_list_set([3]) == _sorted_list_set([1, 5])
+
+
+@pytest.mark.parametrize(
+    ("values", "expected_values"),
+    (
+        ([], []),
+        ([1, 2, 3], [1, 2, 3]),
+        ([1, 1, 2, 3, 3], [1, 2, 3]),
+    ),
+)
+def test_unique_ascending_should_remove_duplicates(values, expected_values):
+    assert unique_ascending(values) == expected_values
@@ -21,11 +21,22 @@ _VALID_FILE_NAME_TOKEN_VALUES = (
     "some_very_very_long_file_name.very_long_file_extension",
     "a",
     "some/path/to/file.txt",
+    "ids.txt.gz",
+    "ids.txt.bz2",
+    "ids.txt.xz",
+)
+
+_VALID_NUMBER_TOKEN_VALUES = (
+    "0",
+    "42",
+    "-42",
+    "100000000000000000000",
 )
 
 _VALID_TOKEN_VALUES = (
     _VALID_FUNC_NAME_TOKEN_VALUES
     + _VALID_FILE_NAME_TOKEN_VALUES
+    + _VALID_NUMBER_TOKEN_VALUES
     + ("[", "]")
 )
 
@@ -55,6 +66,10 @@ _INVALID_SOURCE_STRS = (
             (token_value, (Token(token_type=TokenType.FILE_NAME, token_value=token_value), ))
             for token_value in _VALID_FILE_NAME_TOKEN_VALUES
         ),
+        *tuple(
+            (token_value, (Token(token_type=TokenType.NUMBER, token_value=token_value), ))
+            for token_value in _VALID_NUMBER_TOKEN_VALUES
+        ),
         (
             "[ ] SUM a.txt ",
             (
@@ -88,3 +103,37 @@ def test_parse_with_invalid_source_str_should_raise(
     with pytest.raises(SyntaxException):
         token_parser.parse()
 
+
+
+@pytest.mark.parametrize(
+    "source_str",
+    (
+        "[SUM a.txt[INT b.txt c.txt]]",
+        " [ SUM a.txt [ INT b.txt c.txt ] ] ",
+        "[SUM\ta.txt\n[INT b.txt c.txt] ]",
+    ),
+)
+def test_parse_should_not_require_whitespaces_around_brackets(source_str: str):
+    token_parser = TokenParser(source_str=source_str)
+    assert [token.token_value for token in token_parser.parse()] == [
+        "[", "SUM", "a.txt", "[", "INT", "b.txt", "c.txt", "]", "]",
+    ]
+
+
+@pytest.mark.parametrize(
+    "invalid_source_str",
+    ("SUMa.txt", "a.txtSUM", "[ SUM a.txt$ ]", "[ LIMIT 10a.txt ]", "[ RANGE 1-2 a.txt ]"),
+)
+def test_parse_with_glued_tokens_should_raise(invalid_source_str: str):
+    token_parser = TokenParser(source_str=invalid_source_str)
+    with pytest.raises(SyntaxException):
+        token_parser.parse()
+
+
+def test_iter_tokens_should_yield_tokens_lazily():
+    tokens = TokenParser(source_str="[ SUM a.txt $ ]").iter_tokens()
+
+    assert [next(tokens).token_value for _ in range(3)] == ["[", "SUM", "a.txt"]
+    with pytest.raises(SyntaxException) as e:
+        next(tokens)
+    assert e.value.reason == "Unknown token: $"